@@ -4,31 +4,47 @@ A multi-agent system for comprehensive data science workflows
 """
 
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.tools import built_in_code_execution, WebSearchTool
-from typing import List, Dict, Any
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterator, Optional, Tuple
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import asyncio
+import hashlib
 import json
+import queue
+import re
+import threading
+import time
 
+from call_policy import CallPolicy
+from code_executor_pool import CodeWorkerPool, PooledCodeExecutor, get_code_worker_pool
+from context_handoff import ContextHandoff
+from dataset_fingerprint import DatasetFingerprinter, get_fingerprinter
+from dataset_profile import DatasetProfiler
+from fake_llm import is_fake_model
+from history_store import HistoryStore
+from instrumentation import CallMetrics, Instrumentation, get_instrumentation
+from llm_cache import PlanCache, ResponseCache
+from model_clients import ModelClientPool, get_client_pool
+from model_router import ModelRoute, ModelRouter
+from pipeline_checkpoint import CheckpointStore
+from prompt_prefix import LEGACY, PROMPT_MODES, STABLE_PREFIX, get_prefix_tracker
+from single_flight import SingleFlight, get_single_flight
+from utils import load_config
 
-class DataScienceAgentOrchestrator:
-    """Orchestrates multiple specialized data science agents"""
-    
-    def __init__(self, model_name: str = "ollama_chat/qwen2.5:7b"):
-        self.model_name = model_name
-        self.agents = {}
-        self.conversation_history = []
-        
-        # Initialize all specialized agents
-        self._initialize_agents()
-    
-    def _initialize_agents(self):
-        """Initialize all specialized agents"""
-        
-        # Root/Orchestrator Agent
-        self.agents['orchestrator'] = Agent(
-            model=LiteLlm(model=self.model_name),
-            name="Data Science Orchestrator",
-            instruction="""You are a senior data science orchestrator. You coordinate multiple specialized agents to solve data science problems.
+
+DEFAULT_MODEL = "ollama_chat/qwen2.5:7b"
+
+DEFAULT_AGENT_SEQUENCE = ['data_analyst', 'visualization_specialist', 'ml_engineer']
+
+AGENT_SPECS = {
+    # Root/Orchestrator Agent
+    'orchestrator': {
+        "name": "Data Science Orchestrator",
+        "instruction": """You are a senior data science orchestrator. You coordinate multiple specialized agents to solve data science problems.
             
 When a task comes in:
 1. Analyze the problem requirements
@@ -44,16 +60,13 @@ Available agents:
 - data_engineer: Data pipelines, ETL, data processing
 - deployment_engineer: Model deployment and serving
 
-Always think step-by-step and provide clear reasoning."""
-,
-            tools=[built_in_code_execution, WebSearchTool()],
-        )
-        
-        # Data Analyst Agent
-        self.agents['data_analyst'] = Agent(
-            model=LiteLlm(model=self.model_name),
-            name="Data Analyst",
-            instruction="""You are a data analyst specializing in exploratory data analysis and statistics.
+Always think step-by-step and provide clear reasoning.""",
+    },
+    
+    # Data Analyst Agent
+    'data_analyst': {
+        "name": "Data Analyst",
+        "instruction": """You are a data analyst specializing in exploratory data analysis and statistics.
 
 Your responsibilities include:
 - Loading and examining datasets
@@ -67,14 +80,12 @@ Your responsibilities include:
 Always provide clear, interpretable analysis with statistical rigor.
 Use pandas, numpy, scipy for statistical analysis.
 Include data quality reports with your findings.""",
-            tools=[built_in_code_execution, WebSearchTool()],
-        )
-        
-        # ML Engineer Agent
-        self.agents['ml_engineer'] = Agent(
-            model=LiteLlm(model=self.model_name),
-            name="Machine Learning Engineer",
-            instruction="""You are a machine learning engineer specializing in model development and training.
+    },
+    
+    # ML Engineer Agent
+    'ml_engineer': {
+        "name": "Machine Learning Engineer",
+        "instruction": """You are a machine learning engineer specializing in model development and training.
 
 Your responsibilities include:
 - Selecting appropriate ML algorithms for the problem
@@ -88,14 +99,12 @@ Your responsibilities include:
 Use scikit-learn, xgboost, tensorflow, pytorch as needed.
 Always provide evaluation metrics, confusion matrices, and feature importance.
 Ensure models are reproducible with random seeds.""",
-            tools=[built_in_code_execution, WebSearchTool()],
-        )
-        
-        # Visualization Specialist
-        self.agents['visualization_specialist'] = Agent(
-            model=LiteLlm(model=self.model_name),
-            name="Visualization Specialist",
-            instruction="""You are a data visualization specialist creating compelling visualizations.
+    },
+    
+    # Visualization Specialist
+    'visualization_specialist': {
+        "name": "Visualization Specialist",
+        "instruction": """You are a data visualization specialist creating compelling visualizations.
 
 Your responsibilities include:
 - Creating publication-quality plots using matplotlib and seaborn
@@ -108,14 +117,12 @@ Your responsibilities include:
 Use matplotlib, seaborn, plotly for static and interactive visualizations.
 Create clean, informative, and aesthetically pleasing visualizations.
 Always include proper labels, titles, and legends.""",
-            tools=[built_in_code_execution, WebSearchTool()],
-        )
-        
-        # Data Engineer
-        self.agents['data_engineer'] = Agent(
-            model=LiteLlm(model=self.model_name),
-            name="Data Engineer",
-            instruction="""You are a data engineer specializing in data pipelines and ETL processes.
+    },
+    
+    # Data Engineer
+    'data_engineer': {
+        "name": "Data Engineer",
+        "instruction": """You are a data engineer specializing in data pipelines and ETL processes.
 
 Your responsibilities include:
 - Building ETL pipelines
@@ -129,14 +136,12 @@ Your responsibilities include:
 Use pandas, polars, dask for data manipulation.
 Write efficient, scalable code for data processing.
 Handle memory constraints and optimize for performance.""",
-            tools=[built_in_code_execution, WebSearchTool()],
-        )
-        
-        # Deployment Engineer
-        self.agents['deployment_engineer'] = Agent(
-            model=LiteLlm(model=self.model_name),
-            name="Deployment Engineer",
-            instruction="""You are a deployment engineer specializing in ML model deployment and serving.
+    },
+    
+    # Deployment Engineer
+    'deployment_engineer': {
+        "name": "Deployment Engineer",
+        "instruction": """You are a deployment engineer specializing in ML model deployment and serving.
 
 Your responsibilities include:
 - Creating model APIs with Flask/FastAPI
@@ -150,10 +155,227 @@ Your responsibilities include:
 Use Flask, FastAPI for APIs.
 Create production-ready, scalable deployments.
 Include proper error handling and logging.""",
-            tools=[built_in_code_execution, WebSearchTool()],
+    },
+}
+
+
+# Tiny prompt used to load a model and prime an agent's prompt prefix
+WARMUP_PROMPT = "Reply with only the word OK."
+
+APP_NAME = "data_science_agents"
+USER_ID = "data_science_user"
+
+
+class AgentRegistry(Mapping):
+    """Read-only mapping of agent names to agents that builds each agent on first access"""
+    
+    def __init__(self, names: List[str], factory: Callable[[str], Agent]):
+        self._names = list(names)
+        self._factory = factory
+        self._agents = {}
+        self._lock = threading.Lock()
+    
+    def __getitem__(self, name: str) -> Agent:
+        if name not in self._names:
+            raise KeyError(name)
+        if name not in self._agents:
+            with self._lock:
+                if name not in self._agents:
+                    self._agents[name] = self._factory(name)
+        return self._agents[name]
+    
+    def __contains__(self, name) -> bool:
+        # Membership must not build the agent
+        return name in self._names
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+    
+    def __len__(self) -> int:
+        return len(self._names)
+    
+    def built(self) -> List[str]:
+        """Names of the agents that have been constructed so far"""
+        return [name for name in self._names if name in self._agents]
+
+
+class PipelineStageError(RuntimeError):
+    """A pipeline stage failed; carries the outputs of the stages that finished"""
+    
+    def __init__(self, stage: str, error: BaseException, results: Dict[str, Any], skipped: List[str],
+                 pipeline_id: str = None):
+        super().__init__(f"Stage '{stage}' failed: {type(error).__name__}: {error}")
+        self.stage = stage
+        self.error = error
+        self.results = results
+        self.skipped = skipped
+        # Pass to resume_pipeline to rerun only the stages that did not finish
+        self.pipeline_id = pipeline_id
+
+
+class PipelineRun:
+    """State shared by the stages of one pipeline execution"""
+    
+    def __init__(self, user_query: str, graph: Dict[str, List[str]], max_workers: int = 1,
+                 use_cache: bool = True, on_event: Callable[[Dict[str, Any]], None] = None,
+                 pipeline_id: str = None, dataset_path: str = None, dataset_fingerprint: str = None):
+        self.pipeline_id = pipeline_id
+        self.user_query = user_query
+        self.dataset_path = dataset_path
+        self.dataset_fingerprint = dataset_fingerprint
+        self.dataset_profile = None
+        self.graph = graph
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.on_event = on_event
+        self.results = {}
+        self.failures = {}
+    
+    def emit(self, event_type: str, **fields):
+        """Send a progress event to the listener, if there is one"""
+        if self.on_event is not None:
+            self.on_event({"type": event_type, "timestamp": time.time(), **fields})
+
+
+class _AttemptStream:
+    """Forwards the chunks of one call's attempts, announcing a restart when a retry follows sent output"""
+    
+    def __init__(self, on_chunk: Callable[[str], None], on_restart: Callable[[], None] = None):
+        self.on_chunk = on_chunk
+        self.on_restart = on_restart
+        self.sent = False
+    
+    def start_attempt(self):
+        if self.sent and self.on_restart is not None:
+            self.on_restart()
+        self.sent = False
+    
+    def chunk(self, text: str):
+        self.sent = True
+        self.on_chunk(text)
+
+
+class DataScienceAgentOrchestrator:
+    """Orchestrates multiple specialized data science agents"""
+    
+    def __init__(self, model_name: str = None, config_path: str = None,
+                 cache: ResponseCache = None, client_pool: ModelClientPool = None,
+                 instrumentation: Instrumentation = None, call_policy: CallPolicy = None,
+                 single_flight: SingleFlight = None, checkpoints: CheckpointStore = None,
+                 stage_memo: ResponseCache = None, code_pool: CodeWorkerPool = None,
+                 profiler: DatasetProfiler = None, fingerprinter: DatasetFingerprinter = None):
+        self.config = load_config(config_path)
+        self.model_config = self.config.get('model') or {}
+        # "fake/<name>" selects the simulated backend in fake_llm.py
+        self.model_name = model_name or self.model_config.get('name') or DEFAULT_MODEL
+        # Per-agent models and settings; an explicit model_name applies to every agent
+        self.router = ModelRouter.from_config(self.config, self.model_name, fixed_model=model_name is not None)
+        self.settings = self.config.get('settings') or {}
+        self.stage_dependencies = self.config.get('stage_dependencies') or {}
+        self.cache = cache if cache is not None else ResponseCache.from_config(self.config.get('cache'))
+        cache_config = self.config.get('cache') or {}
+        self.plan_cache = PlanCache(cache_config.get('plan_file', "./cache/plans.json"),
+                                    enabled=cache_config.get('enabled', True))
+        self.checkpoints = checkpoints or CheckpointStore.from_config(self.config.get('checkpoints'))
+        # Stage outputs keyed by input, agent configuration and dataset fingerprint
+        self.stage_memo = stage_memo if stage_memo is not None else ResponseCache.from_config(
+            {'directory': "./cache/stages", **(self.config.get('stage_memo') or {})}
         )
+        # Content fingerprints of pipeline datasets, part of every stage memo key
+        self.fingerprinter = fingerprinter or get_fingerprinter(self.config.get('fingerprint'))
+        # Profile of a pipeline's dataset given to its first stages
+        self.profiler = profiler or DatasetProfiler.from_config(self.config.get('dataset_profile'),
+                                                                self.config.get('csv_inspection'),
+                                                                fingerprinter=self.fingerprinter)
+        self.client_pool = client_pool or get_client_pool(self.config.get('connection_pool'))
+        # Opt-in; worker processes are only started when code first runs or at warm-up
+        code_config = self.config.get('code_execution') or {}
+        self.code_pool = code_pool
+        if self.code_pool is None and code_config.get('enabled', False):
+            self.code_pool = get_code_worker_pool(code_config, self.config.get('dataset_cache'))
+        self.code_agents = code_config.get('agents', list(AGENT_SPECS))
+        self.handoff = ContextHandoff.from_config(self.config.get('context_handoff'))
+        prompt_config = self.config.get('prompt_assembly') or {}
+        self.prompt_mode = prompt_config.get('mode', STABLE_PREFIX)
+        if self.prompt_mode not in PROMPT_MODES:
+            raise ValueError(f"Unknown prompt_assembly.mode '{self.prompt_mode}', expected one of {PROMPT_MODES}")
+        self.prefix_tracker = get_prefix_tracker(prompt_config.get('server_slots', 4))
+        self.instrumentation = instrumentation or get_instrumentation(self.config.get('instrumentation'))
+        self.call_policy = call_policy or CallPolicy.from_config(self.config.get('call_policy'))
+        # Shared by every orchestrator in the process, e.g. one per Streamlit session
+        self.single_flight = single_flight or get_single_flight()
+        self.coalesce_calls = self.settings.get('coalesce_identical_calls', True)
+        self.conversation_history = HistoryStore.from_config(self.config.get('history'), "conversation")
+        self._runners = {}
+        self._routed_agents = {}
+        self._tool_names = None
+        
+        # Agents are built on first use; disabled agents are never built
+        self.agents = AgentRegistry(self._enabled_agent_names(), self._build_agent)
+    
+    def _enabled_agent_names(self) -> List[str]:
+        """Agents not disabled in config.yaml, in spec order"""
+        agents_config = self.config.get('agents') or {}
+        return [
+            name for name in AGENT_SPECS
+            if (agents_config.get(name) or {}).get('enabled', True)
+        ]
     
-    def run_data_science_pipeline(self, user_query: str, agent_sequence: List[str] = None) -> Dict[str, Any]:
+    def _build_agent(self, agent_name: str, route: ModelRoute = None) -> Agent:
+        """Build one specialized agent from its spec, with its configured model unless a route is given"""
+        spec = AGENT_SPECS[agent_name]
+        agent_config = (self.config.get('agents') or {}).get(agent_name) or {}
+        route = route or self.router.agent_route(agent_name)
+        executor = {'code_executor': PooledCodeExecutor(pool=self.code_pool)} \
+            if self._uses_code_pool(agent_name, route) else {}
+        
+        return Agent(
+            model=self.client_pool.get_model(
+                route.model,
+                api_base=self.model_config.get('api_base'),
+                fake_backend=self.config.get('fake_backend'),
+                **route.params()
+            ),
+            name=agent_config.get('name', spec['name']),
+            instruction=spec['instruction'],
+            tools=self._build_tools(),
+            **executor
+        )
+    
+    def _uses_code_pool(self, agent_name: str, route: ModelRoute = None) -> bool:
+        """Whether code blocks in the agent's responses run on the worker pool"""
+        route = route or self.router.agent_route(agent_name)
+        # Simulated responses always contain a code block, so executing them would never end the turn
+        return self.code_pool is not None and agent_name in self.code_agents and not is_fake_model(route.model)
+    
+    def start_code_pool(self) -> bool:
+        """Start the code workers in the background if an enabled agent runs code on them"""
+        if not any(self._uses_code_pool(agent_name) for agent_name in self.agents):
+            return False
+        self.code_pool.start()
+        return True
+    
+    def _agent_for(self, agent_name: str, route: ModelRoute = None) -> Agent:
+        """The agent to call for a route; routes other than the agent's own settings get their own copy"""
+        if route is None or route.key == self.router.agent_route(agent_name).key:
+            return self.agents[agent_name]
+        
+        key = (agent_name, route.key)
+        if key not in self._routed_agents:
+            if agent_name not in self.agents:
+                raise KeyError(agent_name)
+            self._routed_agents[key] = self._build_agent(agent_name, route)
+        return self._routed_agents[key]
+    
+    @staticmethod
+    def _build_tools() -> list:
+        """Tools given to every agent"""
+        return [built_in_code_execution, WebSearchTool()]
+    
+    def run_data_science_pipeline(self, user_query: str, agent_sequence: List[str] = None,
+                                  dependencies: Dict[str, List[str]] = None,
+                                  parallel: bool = None, bypass_cache: bool = False,
+                                  pipeline_id: str = None, dataset_path: str = None) -> Dict[str, Any]:
         """
         Run a data science pipeline with multiple agents
         
@@ -161,75 +383,879 @@ Include proper error handling and logging.""",
             user_query: The user's data science task
             agent_sequence: List of agent names to use in sequence
                            If None, orchestrator decides
+            dependencies: Optional mapping of agent name to the upstream agents
+                          whose outputs it needs. Stages without upstream agents
+                          start from the user query.
+            parallel: Run independent stages at the same time. Defaults to
+                      settings.enable_parallel_execution in config.yaml
+            bypass_cache: Always call the model, ignoring cached responses
+            pipeline_id: Id under which stage outputs are checkpointed. Reusing
+                         the id of an earlier run skips its finished stages
+                         whose input is unchanged; a new id is made if None
+            dataset_path: Dataset the pipeline works on. Stage outputs are
+                          reused from earlier runs only while its fingerprint
+                          is unchanged
         
         Returns:
             Results from the pipeline
+        
+        Raises:
+            PipelineStageError: A stage still failed after the call policy's
+                                retries; its .results holds the finished stages
+                                and its .pipeline_id can be resumed
+        """
+        self._print_pipeline_banner(user_query)
+        
+        # If no sequence specified, let orchestrator decide
+        if agent_sequence is None:
+            plan = None if bypass_cache else self.plan_cache.get(user_query)
+            if plan is None and 'orchestrator' in self.agents:
+                response = self._call_agent('orchestrator', self._planning_query(user_query),
+                                            use_cache=not bypass_cache, task="planning")
+                plan = self._resolve_plan(user_query, response)
+            agent_sequence, dependencies = self._apply_plan(plan, dependencies)
+        
+        graph, max_workers = self._prepare_stage_graph(agent_sequence, dependencies, parallel)
+        run = self._start_run(user_query, graph, max_workers, bypass_cache, pipeline_id=pipeline_id,
+                              dataset_path=dataset_path, dataset=self._inspect_dataset(dataset_path))
+        return self._run_stage_graph(run)
+    
+    def resume_pipeline(self, pipeline_id: str, bypass_cache: bool = False) -> Dict[str, Any]:
+        """
+        Resume a checkpointed pipeline from its first unfinished stage
+        
+        The query and stage graph come from the checkpoint manifest. Stages
+        whose checkpoint matches their input are restored instead of run, so a
+        pipeline that failed at its third stage only pays for the third stage
+        onwards.
+        
+        Args:
+            pipeline_id: Id of the earlier run (PipelineStageError.pipeline_id)
+            bypass_cache: Ignore cached responses for the stages that do run
+        
+        Returns:
+            Results from the pipeline
+        
+        Raises:
+            KeyError: No checkpoints were kept for pipeline_id
+            PipelineStageError: A stage failed again
+        """
+        manifest = self._resume_manifest(pipeline_id)
+        dataset = self._inspect_dataset(manifest.get('dataset_path'))
+        return self._run_stage_graph(self._resume_run(manifest, bypass_cache, dataset))
+    
+    async def aresume_pipeline(self, pipeline_id: str, bypass_cache: bool = False) -> Dict[str, Any]:
+        """Async version of resume_pipeline"""
+        manifest = self._resume_manifest(pipeline_id)
+        dataset = await asyncio.to_thread(self._inspect_dataset, manifest.get('dataset_path'))
+        return await self._arun_stage_graph(self._resume_run(manifest, bypass_cache, dataset))
+    
+    async def arun_data_science_pipeline(self, user_query: str, agent_sequence: List[str] = None,
+                                         dependencies: Dict[str, List[str]] = None,
+                                         parallel: bool = None, bypass_cache: bool = False,
+                                         pipeline_id: str = None, dataset_path: str = None) -> Dict[str, Any]:
+        """
+        Async version of run_data_science_pipeline
+        
+        Agent calls go through ADK's async runner, so many pipelines can share
+        one event loop instead of blocking a thread each.
+        """
+        return await self._arun_pipeline(user_query, agent_sequence, dependencies, parallel, bypass_cache,
+                                         pipeline_id=pipeline_id, dataset_path=dataset_path)
+    
+    async def astream_data_science_pipeline(self, user_query: str, agent_sequence: List[str] = None,
+                                            dependencies: Dict[str, List[str]] = None,
+                                            parallel: bool = None, bypass_cache: bool = False,
+                                            pipeline_id: str = None,
+                                            dataset_path: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run a pipeline and yield progress events as they happen
+        
+        Every event is a dict with 'type' and 'timestamp':
+            plan:              orchestrator plan ('plan')
+            pipeline_started:  stages are about to run ('pipeline_id', 'stages',
+                               'dataset_fingerprint')
+            stage_started:     an agent began ('agent')
+            token:             a chunk of model output ('agent', 'text')
+            attempt_restarted: a failed call is retried and streams again from the
+                               start; drop the agent's tokens so far ('agent')
+            stage_finished:    an agent is done ('agent', 'output', 'elapsed', 'restored':
+                               "checkpoint" or "memo" if the output was reused, else None)
+            stage_failed:      an agent gave up after retries ('agent', 'error', 'elapsed')
+            pipeline_finished: all stages are done ('results', 'elapsed', 'dataset_fingerprint')
+        """
+        events = asyncio.Queue()
+        started = time.time()
+        task = asyncio.ensure_future(self._arun_pipeline(
+            user_query, agent_sequence, dependencies, parallel, bypass_cache,
+            on_event=events.put_nowait, pipeline_id=pipeline_id, dataset_path=dataset_path
+        ))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        
+        fingerprint = None
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                if event['type'] == "pipeline_started":
+                    fingerprint = event['dataset_fingerprint']
+                yield event
+            
+            results = task.result()
+            yield {"type": "pipeline_finished", "timestamp": time.time(),
+                   "results": results, "elapsed": time.time() - started, "dataset_fingerprint": fingerprint}
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    def stream_data_science_pipeline(self, user_query: str, agent_sequence: List[str] = None,
+                                     dependencies: Dict[str, List[str]] = None,
+                                     parallel: bool = None, bypass_cache: bool = False,
+                                     pipeline_id: str = None, dataset_path: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        Synchronous version of astream_data_science_pipeline
+        
+        The pipeline runs on its own event loop in a background thread, so the
+        CLI and Streamlit can consume events with a plain for loop.
         """
+        events = queue.Queue()
+        stop = threading.Event()
+        finished = object()
+        
+        async def pump():
+            stream = self.astream_data_science_pipeline(user_query, agent_sequence, dependencies,
+                                                        parallel, bypass_cache, pipeline_id, dataset_path)
+            try:
+                async for event in stream:
+                    if stop.is_set():
+                        break
+                    events.put(event)
+            finally:
+                await stream.aclose()
+        
+        def produce():
+            try:
+                asyncio.run(pump())
+            except BaseException as e:
+                events.put(e)
+            finally:
+                events.put(finished)
+        
+        threading.Thread(target=produce, name="pipeline-stream", daemon=True).start()
+        try:
+            while True:
+                event = events.get()
+                if event is finished:
+                    break
+                if isinstance(event, BaseException):
+                    raise event
+                yield event
+        finally:
+            stop.set()
+    
+    async def _arun_pipeline(self, user_query: str, agent_sequence: List[str] = None,
+                             dependencies: Dict[str, List[str]] = None, parallel: bool = None,
+                             bypass_cache: bool = False, on_event: Callable[[Dict[str, Any]], None] = None,
+                             pipeline_id: str = None, dataset_path: str = None) -> Dict[str, Any]:
+        """Shared implementation of the async pipeline entry points"""
+        self._print_pipeline_banner(user_query)
+        
+        if agent_sequence is None:
+            plan = None if bypass_cache else self.plan_cache.get(user_query)
+            if plan is None and 'orchestrator' in self.agents:
+                response = await self._acall_agent('orchestrator', self._planning_query(user_query),
+                                                   use_cache=not bypass_cache, task="planning")
+                plan = self._resolve_plan(user_query, response)
+            if on_event is not None:
+                on_event({"type": "plan", "timestamp": time.time(), "plan": plan})
+            agent_sequence, dependencies = self._apply_plan(plan, dependencies)
+        
+        graph, max_workers = self._prepare_stage_graph(agent_sequence, dependencies, parallel)
+        # Fingerprinting and profiling read the whole dataset, so they run off the event loop
+        dataset = await asyncio.to_thread(self._inspect_dataset, dataset_path)
+        run = self._start_run(user_query, graph, max_workers, bypass_cache, on_event, pipeline_id, dataset_path,
+                              dataset)
+        return await self._arun_stage_graph(run)
+    
+    def _inspect_dataset(self, dataset_path: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """(fingerprint, profile for the first stages' context) of a pipeline's dataset"""
+        if not dataset_path:
+            return None, None
+        try:
+            return self.fingerprinter.fingerprint(dataset_path), self.profiler.describe(dataset_path)
+        except OSError as e:
+            # The pipeline runs without dataset reuse or a profile rather than failing
+            print(f"Warning: could not inspect dataset {dataset_path}: {e}")
+            return None, None
+    
+    def _start_run(self, user_query: str, graph: Dict[str, List[str]], max_workers: int,
+                   bypass_cache: bool = False, on_event: Callable[[Dict[str, Any]], None] = None,
+                   pipeline_id: str = None, dataset_path: str = None,
+                   dataset: Tuple[Optional[str], Optional[str]] = (None, None)) -> "PipelineRun":
+        """Create a run and record its manifest so it can be resumed; dataset comes from _inspect_dataset"""
+        pipeline_id = pipeline_id or self.checkpoints.new_pipeline_id()
+        fingerprint, profile = dataset
+        run = PipelineRun(user_query, graph, max_workers, use_cache=not bypass_cache, on_event=on_event,
+                          pipeline_id=pipeline_id, dataset_path=dataset_path, dataset_fingerprint=fingerprint)
+        self.checkpoints.start(pipeline_id, user_query, graph, max_workers, dataset_path=dataset_path)
+        run.dataset_profile = profile
+        run.emit("pipeline_started", pipeline_id=pipeline_id, stages=list(graph),
+                 dataset_fingerprint=run.dataset_fingerprint)
+        # Workers load the dataset while the first stages wait for their models
+        if dataset_path and any(self._uses_code_pool(stage) for stage in graph):
+            self.code_pool.warm_dataset(dataset_path)
+        return run
+    
+    def _resume_manifest(self, pipeline_id: str) -> Dict[str, Any]:
+        """The checkpoint manifest of a pipeline that can be resumed"""
+        manifest = self.checkpoints.manifest(pipeline_id)
+        if manifest is None:
+            raise KeyError(f"No checkpoints for pipeline '{pipeline_id}'")
+        for stage in manifest['graph']:
+            if stage not in self.agents:
+                raise ValueError(f"Pipeline '{pipeline_id}' uses agent '{stage}', which is not enabled")
+        return manifest
+    
+    def _resume_run(self, manifest: Dict[str, Any], bypass_cache: bool = False,
+                    dataset: Tuple[Optional[str], Optional[str]] = (None, None)) -> "PipelineRun":
+        """Rebuild a run from its checkpoint manifest"""
+        self._print_pipeline_banner(manifest['user_query'])
+        print(f"Resuming pipeline {manifest['pipeline_id']}\n")
+        return self._start_run(manifest['user_query'], manifest['graph'], manifest.get('max_workers', 1),
+                               bypass_cache, pipeline_id=manifest['pipeline_id'],
+                               dataset_path=manifest.get('dataset_path'), dataset=dataset)
+    
+    @staticmethod
+    def _print_pipeline_banner(user_query: str):
+        """Print the pipeline start banner"""
         print(f"\n{'='*60}")
         print(f"Data Science Pipeline Starting")
         print(f"{'='*60}\n")
         print(f"User Query: {user_query}\n")
+    
+    def _planning_agents(self) -> List[str]:
+        """Agents the orchestrator may put in a plan"""
+        return [name for name in self.agents if name != 'orchestrator']
+    
+    def _planning_query(self, user_query: str) -> str:
+        """Prompt asking the orchestrator for a machine-readable plan"""
+        if self.prompt_mode == STABLE_PREFIX:
+            # Everything before the task is the same for every plan
+            return (
+                "Decide which agents should be involved in the data science task below, and in what order.\n"
+                f"Available agents: {', '.join(self._planning_agents())}\n"
+                "\n"
+                "Respond with only a JSON object in this format:\n"
+                '{"stages": [{"agent": "data_analyst", "depends_on": []}, '
+                '{"agent": "ml_engineer", "depends_on": ["data_analyst"]}]}\n'
+                'List each agent at most once. "depends_on" names the agents whose output it needs.\n'
+                "\n"
+                f"Task: {user_query}\n"
+            )
         
-        # If no sequence specified, let orchestrator decide
-        if agent_sequence is None:
-            # Ask orchestrator for the plan
-            planning_query = f"""
+        return f"""
             Analyze this data science task: {user_query}
             
-            Suggest which agents should be involved and in what order.
-            Return your analysis as a structured plan.
-            """
+            Decide which agents should be involved and in what order.
+            Available agents: {', '.join(self._planning_agents())}
             
-            orchestrator_plan = self.agents['orchestrator'].run(planning_query)
-            print(f"Orchestrator Plan:\n{orchestrator_plan}\n")
+            Respond with only a JSON object in this format:
+            {{"stages": [{{"agent": "data_analyst", "depends_on": []}},
+                        {{"agent": "ml_engineer", "depends_on": ["data_analyst"]}}]}}
+            List each agent at most once. "depends_on" names the agents whose output it needs.
+            """
+    
+    def _resolve_plan(self, user_query: str, response: Any) -> Dict[str, Any]:
+        """Validate the orchestrator's plan and cache it; None if it is unusable"""
+        plan = self._parse_plan(response)
+        if plan is None:
+            print(f"Warning: could not use the orchestrator plan, falling back to {DEFAULT_AGENT_SEQUENCE}")
+            print(f"Orchestrator Plan:\n{response}\n")
+            return None
         
-        # For now, use default sequence or provided one
-        if agent_sequence is None:
-            agent_sequence = ['data_analyst', 'visualization_specialist', 'ml_engineer']
+        print(f"Orchestrator Plan: {' -> '.join(plan['sequence'])}\n")
+        self.plan_cache.set(user_query, plan)
+        return plan
+    
+    def _parse_plan(self, response: Any) -> Dict[str, Any]:
+        """
+        Extract a plan from the orchestrator's response
+        
+        Accepts {"stages": [...]} or a bare list, where each stage is an agent
+        name or {"agent": ..., "depends_on": [...]}. Unknown and repeated
+        agents are dropped; a plan with no usable stages or with circular
+        dependencies is rejected.
+        """
+        data = self._extract_json(str(response))
+        stages = data.get('stages') if isinstance(data, dict) else data
+        if not isinstance(stages, list):
+            return None
+        
+        available = self._planning_agents()
+        sequence = []
+        declared = {}
+        for stage in stages:
+            if isinstance(stage, str):
+                name, deps = stage, None
+            elif isinstance(stage, dict):
+                name, deps = stage.get('agent'), stage.get('depends_on')
+            else:
+                continue
+            if name not in available or name in sequence:
+                continue
+            sequence.append(name)
+            if isinstance(deps, list):
+                declared[name] = deps
         
-        results = {}
-        previous_output = user_query
+        if not sequence:
+            return None
         
-        # Run agents in sequence
+        dependencies = None
+        if declared:
+            dependencies = {
+                name: [dep for dep in declared.get(name, []) if dep in sequence and dep != name]
+                for name in sequence
+            }
+            try:
+                self._topological_order(dependencies)
+            except ValueError:
+                return None
+        
+        return {"sequence": sequence, "dependencies": dependencies}
+    
+    @staticmethod
+    def _extract_json(text: str) -> Any:
+        """First JSON object or array in the text, preferring fenced json blocks"""
+        candidates = re.findall(r"```(?:json)?\s*(.*?)```", text, re.S) + [text]
+        decoder = json.JSONDecoder()
+        for candidate in candidates:
+            for match in re.finditer(r"[\[{]", candidate):
+                try:
+                    return decoder.raw_decode(candidate[match.start():])[0]
+                except ValueError:
+                    continue
+        return None
+    
+    @staticmethod
+    def _apply_plan(plan: Dict[str, Any], dependencies: Dict[str, List[str]] = None):
+        """Agent sequence and dependencies to run, explicit dependencies winning over the plan's"""
+        if plan is None:
+            return None, dependencies
+        return list(plan['sequence']), dependencies if dependencies is not None else plan.get('dependencies')
+    
+    def _prepare_stage_graph(self, agent_sequence: List[str] = None, dependencies: Dict[str, List[str]] = None,
+                             parallel: bool = None):
+        """Resolve the agent sequence into a stage graph and worker count"""
+        # Fall back to the default sequence when there is no usable plan
+        if agent_sequence is None:
+            agent_sequence = DEFAULT_AGENT_SEQUENCE
+        
+        stages = []
         for agent_name in agent_sequence:
             if agent_name not in self.agents:
                 print(f"Warning: Agent '{agent_name}' not found, skipping...")
                 continue
+            if agent_name not in stages:
+                stages.append(agent_name)
+        
+        if parallel is None:
+            parallel = bool(self.settings.get('enable_parallel_execution', False))
+        
+        graph = self._build_stage_graph(stages, dependencies, parallel)
+        max_workers = (self.settings.get('max_parallel_agents') or len(graph)) if parallel else 1
+        return graph, max_workers
+    
+    def _build_stage_graph(self, stages: List[str], dependencies: Dict[str, List[str]] = None,
+                           parallel: bool = False) -> Dict[str, List[str]]:
+        """
+        Map every stage to the upstream stages it waits for
+        
+        Explicit dependencies win. Otherwise each stage follows the one before
+        it, unless parallel execution is on and config.yaml declares
+        stage_dependencies for it, in which case only those upstream stages
+        (that are part of this pipeline) are awaited.
+        """
+        graph = {}
+        for index, stage in enumerate(stages):
+            earlier = stages[:index]
+            if dependencies is not None:
+                upstream = list(dependencies.get(stage, []))
+            else:
+                upstream = earlier[-1:]
+                if parallel and stage in self.stage_dependencies:
+                    declared = [dep for dep in self.stage_dependencies[stage] if dep in earlier]
+                    upstream = declared or upstream
             
-            print(f"\n{'='*60}")
-            print(f"Running: {agent_name}")
-            print(f"{'='*60}\n")
-            
-            # Create context-aware query
-            query = f"""
+            for dep in upstream:
+                if dep not in stages:
+                    raise ValueError(f"Stage '{stage}' depends on '{dep}', which is not part of the pipeline")
+            graph[stage] = upstream
+        
+        self._topological_order(graph)
+        return graph
+    
+    @staticmethod
+    def _topological_order(graph: Dict[str, List[str]]) -> List[str]:
+        """Order stages so every stage comes after its dependencies"""
+        order = []
+        remaining = dict(graph)
+        while remaining:
+            ready = [stage for stage, deps in remaining.items() if all(dep in order for dep in deps)]
+            if not ready:
+                raise ValueError(f"Circular dependency between stages: {list(remaining.keys())}")
+            for stage in ready:
+                order.append(stage)
+                del remaining[stage]
+        return order
+    
+    def _run_stage_graph(self, run: "PipelineRun") -> Dict[str, Any]:
+        """
+        Execute the stage graph, starting each stage once its dependencies are done
+        
+        A failed stage does not stop stages that don't depend on it; once
+        nothing else can run, PipelineStageError is raised with the results
+        of every stage that finished.
+        """
+        graph = run.graph
+        
+        if run.max_workers <= 1:
+            for stage in self._topological_order(graph):
+                if all(dep in run.results for dep in graph[stage]):
+                    try:
+                        run.results[stage] = self._run_stage(stage, run)
+                    except Exception as e:
+                        run.failures[stage] = e
+            return self._collect_results(run)
+        
+        pending = dict(graph)
+        running = {}
+        with ThreadPoolExecutor(max_workers=run.max_workers) as executor:
+            while True:
+                ready = [stage for stage, deps in pending.items() if all(dep in run.results for dep in deps)]
+                for stage in ready:
+                    del pending[stage]
+                    running[executor.submit(self._run_stage, stage, run)] = stage
+                if not running:
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        run.results[stage] = future.result()
+                    except Exception as e:
+                        run.failures[stage] = e
+        
+        return self._collect_results(run)
+    
+    async def _arun_stage_graph(self, run: "PipelineRun") -> Dict[str, Any]:
+        """Async version of _run_stage_graph, one task per stage"""
+        graph = run.graph
+        tasks = {}
+        semaphore = asyncio.Semaphore(max(run.max_workers, 1))
+        
+        async def run_when_ready(stage):
+            if graph[stage]:
+                await asyncio.gather(*(tasks[dep] for dep in graph[stage]))
+                if not all(dep in run.results for dep in graph[stage]):
+                    return
+            async with semaphore:
+                try:
+                    run.results[stage] = await self._arun_stage(stage, run)
+                except Exception as e:
+                    run.failures[stage] = e
+        
+        for stage in self._topological_order(graph):
+            tasks[stage] = asyncio.ensure_future(run_when_ready(stage))
+        
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        
+        return self._collect_results(run)
+    
+    def _collect_results(self, run: "PipelineRun") -> Dict[str, Any]:
+        """Results in pipeline order, or PipelineStageError if a stage failed"""
+        # Keep results in pipeline order regardless of completion order
+        results = {stage: run.results[stage] for stage in run.graph if stage in run.results}
+        if run.failures:
+            self.checkpoints.finish(run.pipeline_id, "failed")
+            stage = next(stage for stage in run.graph if stage in run.failures)
+            skipped = [stage for stage in run.graph if stage not in run.results and stage not in run.failures]
+            raise PipelineStageError(stage, run.failures[stage], results, skipped,
+                                     pipeline_id=run.pipeline_id) from run.failures[stage]
+        self.checkpoints.finish(run.pipeline_id, "completed")
+        return results
+    
+    def _run_stage(self, agent_name: str, run: "PipelineRun") -> Any:
+        """Run a single pipeline stage with the outputs of its upstream stages"""
+        self._print_stage_banner(agent_name)
+        started = time.time()
+        run.emit("stage_started", agent=agent_name)
+        
+        query = self._build_stage_query(agent_name, run)
+        input_hash, memo_key = self._stage_keys(agent_name, query, run)
+        source, output = self._stored_stage_output(agent_name, run, input_hash, memo_key)
+        if source is not None:
+            return self._restore_stage(agent_name, run, output, started, source)
+        
+        try:
+            output = self._call_agent(agent_name, query, use_cache=self._stage_uses_response_cache(run),
+                                      task="pipeline")
+        except Exception as e:
+            self._report_stage_failure(agent_name, run, e, started)
+            raise
+        
+        self._store_stage_output(agent_name, run, input_hash, memo_key, output)
+        run.emit("stage_finished", agent=agent_name, output=output, elapsed=time.time() - started)
+        print(f"\n{agent_name} completed.")
+        return output
+    
+    async def _arun_stage(self, agent_name: str, run: "PipelineRun") -> Any:
+        """Async version of _run_stage, forwarding output chunks as token events"""
+        self._print_stage_banner(agent_name)
+        started = time.time()
+        run.emit("stage_started", agent=agent_name)
+        
+        on_chunk = on_restart = None
+        if run.on_event is not None:
+            on_chunk = lambda text: run.emit("token", agent=agent_name, text=text)
+            on_restart = lambda: run.emit("attempt_restarted", agent=agent_name)
+        
+        query = self._build_stage_query(agent_name, run)
+        input_hash, memo_key = self._stage_keys(agent_name, query, run)
+        source, output = self._stored_stage_output(agent_name, run, input_hash, memo_key)
+        if source is not None:
+            return self._restore_stage(agent_name, run, output, started, source)
+        
+        try:
+            output = await self._acall_agent(agent_name, query, use_cache=self._stage_uses_response_cache(run),
+                                             on_chunk=on_chunk, task="pipeline", on_restart=on_restart)
+        except Exception as e:
+            self._report_stage_failure(agent_name, run, e, started)
+            raise
+        
+        self._store_stage_output(agent_name, run, input_hash, memo_key, output)
+        run.emit("stage_finished", agent=agent_name, output=output, elapsed=time.time() - started, restored=None)
+        print(f"\n{agent_name} completed.")
+        return output
+    
+    def _stage_keys(self, agent_name: str, query: str, run: "PipelineRun"):
+        """
+        Checkpoint input hash and memo key of a stage
+        
+        The memo key covers everything that determines the output: the
+        stage's input (which includes its upstream outputs), the agent's
+        model, settings, instruction and tools, and the dataset fingerprint.
+        """
+        route = self.router.route(agent_name, query, "pipeline")
+        payload = json.dumps([self._cache_key(agent_name, query, route), route.key, run.dataset_fingerprint])
+        return self.checkpoints.input_hash(query), hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _stored_stage_output(self, agent_name: str, run: "PipelineRun", input_hash: str, memo_key: str):
+        """("checkpoint" or "memo", output) for a stage that does not need to run, else (None, None)"""
+        restored, output = self.checkpoints.load(run.pipeline_id, agent_name, input_hash)
+        if restored:
+            return "checkpoint", output
+        if run.use_cache:
+            output = self.stage_memo.get(memo_key, agent_name)
+            if output is not None:
+                # Also checkpointed, so a resume finds it even if the memo entry is evicted
+                self.checkpoints.save(run.pipeline_id, agent_name, input_hash, output)
+                return "memo", output
+        return None, None
+    
+    def _store_stage_output(self, agent_name: str, run: "PipelineRun", input_hash: str, memo_key: str,
+                            output: Any):
+        """Checkpoint a stage's output and memoize it for later pipelines"""
+        self.checkpoints.save(run.pipeline_id, agent_name, input_hash, output)
+        self.stage_memo.set(memo_key, output, agent_name)
+    
+    def _stage_uses_response_cache(self, run: "PipelineRun") -> bool:
+        """The response cache key cannot see the dataset, so stages rely on the memo when it is on"""
+        return run.use_cache and not self.stage_memo.enabled
+    
+    @staticmethod
+    def _restore_stage(agent_name: str, run: "PipelineRun", output: Any, started: float, source: str) -> Any:
+        """Finish a stage with a reused output without calling the agent"""
+        run.emit("stage_finished", agent=agent_name, output=output, elapsed=time.time() - started,
+                 restored=source)
+        print(f"{agent_name} reused from {source} (inputs unchanged).")
+        return output
+    
+    @staticmethod
+    def _report_stage_failure(agent_name: str, run: "PipelineRun", error: Exception, started: float):
+        """Tell the listener and the console that a stage failed"""
+        run.emit("stage_failed", agent=agent_name, error=f"{type(error).__name__}: {error}",
+                 elapsed=time.time() - started)
+        print(f"\n{agent_name} failed: {type(error).__name__}: {error}")
+    
+    @staticmethod
+    def _print_stage_banner(agent_name: str):
+        """Print the banner shown when a stage starts"""
+        print(f"\n{'='*60}")
+        print(f"Running: {agent_name}")
+        print(f"{'='*60}\n")
+    
+    def _build_stage_query(self, agent_name: str, run: "PipelineRun") -> str:
+        """Create context-aware query from the upstream outputs, within the agent's token budget"""
+        upstream = run.graph[agent_name]
+        if not upstream:
+            previous_output = run.user_query
+            if run.dataset_profile:
+                previous_output += (
+                    f"\n\nDataset profile of {run.dataset_path} (precomputed; use these figures "
+                    f"instead of writing code to compute them):\n{run.dataset_profile}"
+                )
+        elif len(upstream) == 1:
+            previous_output = self.handoff.prepare(agent_name, run.results[upstream[0]])
+        else:
+            # Upstream stages share the budget evenly
+            budget = max(self.handoff.budget_for(agent_name) // len(upstream), 1)
+            previous_output = "\n\n".join(
+                f"Output from {dep}:\n{self.handoff.prepare(agent_name, run.results[dep], budget)}"
+                for dep in upstream
+            )
+        
+        if self.prompt_mode == STABLE_PREFIX:
+            # Fixed instructions first and the changing context last, so the
+            # model server can reuse the cached prefix across calls
+            return (
+                "Your task is to contribute to this data science project based on the context below.\n"
+                "Focus on your specialized area and produce actionable insights/code.\n"
+                "\n"
+                f"Previous context:\n{previous_output}\n"
+            )
+        
+        return f"""
             Previous context: {previous_output}
             
             Your task is to contribute to this data science project based on the above context.
             Focus on your specialized area and produce actionable insights/code.
             """
-            
-            # Run agent
-            agent = self.agents[agent_name]
-            output = agent.run(query)
-            results[agent_name] = output
-            previous_output = output
-            
-            print(f"\n{agent_name} completed.")
+    
+    def _call_agent(self, agent_name: str, prompt: str, use_cache: bool = True, task: str = "chat") -> Any:
+        """
+        Send a prompt to one of the agents, answering from the cache when possible
         
-        return results
+        task ("planning", "pipeline" or "chat") and the prompt size select the
+        model route configured for the agent.
+        """
+        route = self.router.route(agent_name, prompt, task)
+        metrics = self.instrumentation.start_call(agent_name, route.model, prompt)
+        key = self._cache_key(agent_name, prompt, route)
+        if use_cache:
+            cached = self.cache.get(key, agent_name)
+            if cached is not None:
+                metrics.cache_hit = True
+                self.instrumentation.end_call(metrics, cached)
+                return cached
+        
+        def call():
+            self._track_prompt_prefix(agent_name, prompt, route, metrics)
+            return self.call_policy.call(lambda: self._run_agent(agent_name, prompt, metrics, route),
+                                         key=agent_name, metrics=metrics, backend=route.model)
+        
+        try:
+            if self.coalesce_calls:
+                response, metrics.coalesced = self.single_flight.do(f"{agent_name}:{key}", call)
+            else:
+                response = call()
+        except Exception as e:
+            self.instrumentation.end_call(metrics, error=e)
+            raise
+        
+        self.instrumentation.end_call(metrics, response)
+        if not metrics.coalesced:
+            self.cache.set(key, response, agent_name)
+        return response
+    
+    def _run_agent(self, agent_name: str, prompt: str, metrics: CallMetrics = None,
+                   route: ModelRoute = None) -> Any:
+        """Blocking agent call"""
+        agent = self._agent_for(agent_name, route)
+        if not is_fake_model(getattr(agent.model, 'model', agent.model)):
+            return agent.run(prompt)
+        
+        # The fake backend only implements ADK's async model interface, so
+        # it goes through the async runner on a private event loop
+        return asyncio.run(self._arun_agent(agent_name, prompt, metrics=metrics, route=route))
+    
+    async def _acall_agent(self, agent_name: str, prompt: str, use_cache: bool = True,
+                           on_chunk: Callable[[str], None] = None, task: str = "chat",
+                           on_restart: Callable[[], None] = None) -> str:
+        """
+        Async version of _call_agent; on_chunk receives output text as it streams in
+        
+        A retry streams the output again from the start, so when the failed
+        attempt already sent chunks on_restart is called before the retry's.
+        """
+        route = self.router.route(agent_name, prompt, task)
+        metrics = self.instrumentation.start_call(agent_name, route.model, prompt)
+        key = self._cache_key(agent_name, prompt, route)
+        if use_cache:
+            cached = self.cache.get(key, agent_name)
+            if cached is not None:
+                metrics.cache_hit = True
+                if on_chunk is not None:
+                    on_chunk(str(cached))
+                self.instrumentation.end_call(metrics, cached)
+                return cached
+        
+        stream = _AttemptStream(on_chunk, on_restart) if on_chunk is not None else None
+        
+        def attempt():
+            if stream is None:
+                return self._arun_agent(agent_name, prompt, None, metrics, route)
+            stream.start_attempt()
+            return self._arun_agent(agent_name, prompt, stream.chunk, metrics, route)
+        
+        # Hedging would stream two copies of the output, so streamed calls only retry
+        def call():
+            self._track_prompt_prefix(agent_name, prompt, route, metrics)
+            return self.call_policy.acall(attempt, key=agent_name, hedge=on_chunk is None, metrics=metrics,
+                                          backend=route.model)
+        
+        try:
+            if self.coalesce_calls:
+                response, metrics.coalesced = await self.single_flight.ado(f"{agent_name}:{key}", call)
+            else:
+                response = await call()
+        except BaseException as e:
+            self.instrumentation.end_call(metrics, error=e)
+            raise
+        
+        if metrics.coalesced:
+            # The output streamed to the caller that made the call; waiters get it in one piece
+            if on_chunk is not None:
+                on_chunk(str(response))
+        else:
+            self.cache.set(key, response, agent_name)
+        self.instrumentation.end_call(metrics, response)
+        return response
+    
+    async def _arun_agent(self, agent_name: str, prompt: str, on_chunk: Callable[[str], None] = None,
+                          metrics: CallMetrics = None, route: ModelRoute = None) -> str:
+        """
+        Send a prompt to one of the agents through ADK's async runner
+        
+        Each call gets its own short-lived session so calls stay independent,
+        like the synchronous path. The LiteLlm model uses LiteLLM's async
+        completion under the runner, so no thread is held while waiting.
+        With on_chunk set, the runner streams (SSE) and partial text is
+        forwarded as it arrives. Token usage, tool calls and the first token
+        time are recorded on metrics when given.
+        """
+        runner = self._get_runner(agent_name, route)
+        session = await runner.session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+        message = types.Content(role='user', parts=[types.Part(text=prompt)])
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE) if on_chunk is not None else None
+        
+        response = []
+        try:
+            async for event in runner.run_async(user_id=USER_ID, session_id=session.id, new_message=message,
+                                                run_config=run_config):
+                if metrics is not None:
+                    self._record_event_metrics(event, metrics)
+                if not (event.content and event.content.parts):
+                    continue
+                if event.partial:
+                    if on_chunk is not None:
+                        for part in event.content.parts:
+                            if part.text:
+                                on_chunk(part.text)
+                elif event.is_final_response():
+                    response.extend(part.text for part in event.content.parts if part.text)
+        finally:
+            await runner.session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        
+        return "".join(response)
+    
+    @staticmethod
+    def _record_event_metrics(event: Any, metrics: CallMetrics):
+        """Pick first-token time, tool calls, token usage and decode time out of a runner event"""
+        if event.content and event.content.parts and any(part.text for part in event.content.parts):
+            metrics.first_token(partial=bool(event.partial))
+        metrics.tool_calls += len(event.get_function_calls() or [])
+        
+        usage = getattr(event, 'usage_metadata', None)
+        if usage is not None and not event.partial:
+            metrics.report_usage(
+                getattr(usage, 'prompt_token_count', None),
+                getattr(usage, 'candidates_token_count', None)
+            )
+            cached = getattr(usage, 'cached_content_token_count', None)
+            if cached:
+                metrics.report_prompt_cache(cached, getattr(usage, 'prompt_token_count', None), reported=True)
+        
+        # Ollama reports its generation time in nanoseconds
+        eval_duration = (getattr(event, 'custom_metadata', None) or {}).get('eval_duration')
+        if eval_duration and not event.partial:
+            metrics.report_decode_time(eval_duration / 1e9)
+    
+    def _track_prompt_prefix(self, agent_name: str, prompt: str, route: ModelRoute, metrics: CallMetrics):
+        """Estimate how much of this prompt the model server can serve from its prefix cache"""
+        # The system instruction comes first in the model's prompt, then the message
+        text = AGENT_SPECS[agent_name]['instruction'] + "\n" + prompt
+        reusable, total = self.prefix_tracker.observe(route.model, text)
+        metrics.report_prompt_cache(reusable, total)
+    
+    def _cache_key(self, agent_name: str, prompt: str, route: ModelRoute = None) -> str:
+        """Cache key for a prompt sent to an agent, computed without building the agent"""
+        route = route or self.router.agent_route(agent_name)
+        if self._tool_names is None:
+            self._tool_names = [getattr(tool, 'name', None) or getattr(tool, '__name__', type(tool).__name__)
+                                for tool in self._build_tools()]
+        tool_names = self._tool_names + ["pooled_code_executor"] if self._uses_code_pool(agent_name, route) \
+            else self._tool_names
+        return ResponseCache.make_key(
+            route.model,
+            AGENT_SPECS[agent_name]['instruction'],
+            tool_names,
+            route.temperature,
+            prompt
+        )
+    
+    def _get_runner(self, agent_name: str, route: ModelRoute = None) -> InMemoryRunner:
+        """Get (or create) the async runner for an agent and model route"""
+        route = route or self.router.agent_route(agent_name)
+        key = (agent_name, route.key)
+        if key not in self._runners:
+            self._runners[key] = InMemoryRunner(agent=self._agent_for(agent_name, route), app_name=APP_NAME)
+        return self._runners[key]
+    
+    async def awarm_up_agent(self, agent_name: str, route: ModelRoute = None, prompt: str = WARMUP_PROMPT) -> float:
+        """
+        Send a tiny prompt through an agent so its model is loaded before real requests
+        
+        Skips the response cache, call policy and metrics. Returns the seconds
+        the call took, which for a cold model is mostly load time.
+        """
+        started = time.perf_counter()
+        await self._arun_agent(agent_name, prompt, route=route or self.router.agent_route(agent_name))
+        return time.perf_counter() - started
     
     def get_agent(self, name: str) -> Agent:
-        """Get a specific agent by name"""
+        """Get a specific agent by name, building it on first use"""
         return self.agents.get(name)
     
-    def chat_with_agent(self, agent_name: str, message: str) -> str:
+    def chat_with_agent(self, agent_name: str, message: str, bypass_cache: bool = False) -> str:
         """Have a conversation with a specific agent"""
         if agent_name not in self.agents:
             return f"Agent '{agent_name}' not found. Available agents: {list(self.agents.keys())}"
         
-        agent = self.agents[agent_name]
-        response = agent.run(message)
-        return response
+        return self._call_agent(agent_name, message, use_cache=not bypass_cache)
+    
+    async def achat_with_agent(self, agent_name: str, message: str, bypass_cache: bool = False) -> str:
+        """Async version of chat_with_agent"""
+        if agent_name not in self.agents:
+            return f"Agent '{agent_name}' not found. Available agents: {list(self.agents.keys())}"
+        
+        return await self._acall_agent(agent_name, message, use_cache=not bypass_cache)
 
 
 def main():
@@ -7,9 +7,12 @@ import streamlit as st
 import time
 import json
 from datetime import datetime
-from agent_orchestrator import DataScienceAgentOrchestrator
+from agent_orchestrator import DataScienceAgentOrchestrator, PipelineStageError
 from workflow_manager import WorkflowManager
-from utils import AgentUtils
+from history_store import HistoryStore
+from model_warmup import get_residency_manager
+from csv_inspector import format_report
+from utils import AgentUtils, load_config
 
 # Page configuration
 st.set_page_config(
@@ -74,13 +77,23 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# Entries rendered on every rerun; older ones are loaded from disk on request
+CHAT_RENDER_LIMIT = 20
+ACTIVITY_RENDER_LIMIT = 50
+
+
+def new_history(name):
+    """Bounded history for this session; entries beyond history.max_in_memory spill to disk"""
+    return HistoryStore.from_config(load_config().get('history'), name)
+
+
 # Initialize session state
 if 'orchestrator' not in st.session_state:
     st.session_state.orchestrator = None
 if 'workflow_manager' not in st.session_state:
     st.session_state.workflow_manager = None
 if 'conversation_history' not in st.session_state:
-    st.session_state.conversation_history = []
+    st.session_state.conversation_history = new_history("conversation")
 
 
 def initialize_system():
@@ -89,6 +102,10 @@ def initialize_system():
         with st.spinner('🤖 Initializing AI Agents...'):
             try:
                 st.session_state.orchestrator = DataScienceAgentOrchestrator()
+                warmup_config = st.session_state.orchestrator.config.get('warmup') or {}
+                if warmup_config.get('enabled', True):
+                    # Load models in the background so the UI is usable right away
+                    get_residency_manager(st.session_state.orchestrator, warmup_config).start()
                 st.session_state.workflow_manager = WorkflowManager(
                     st.session_state.orchestrator
                 )
@@ -146,9 +163,14 @@ def main():
         
         # Quick stats
         st.markdown("## 📈 Quick Stats")
-        st.metric("Agents Available", "6")
+        st.metric("Agents Available", len(st.session_state.orchestrator.agents))
         st.metric("Workflows", "5+")
-        st.metric("Status", "✅ Online")
+        models = get_residency_manager(st.session_state.orchestrator).status()
+        ready = sum(1 for status in models.values() if status['state'] == "ready")
+        loading = any(status['state'] in ("cold", "loading") for status in models.values())
+        if models:
+            st.metric("Models Ready", f"{ready}/{len(models)}")
+        st.metric("Status", "⏳ Warming up" if loading else "✅ Online")
     
     # Main content based on selected page
     if page == "🏠 Home":
@@ -281,13 +303,13 @@ def chat_page():
     
     # Display chat history
     if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = new_history("chat")
     
-    for chat in st.session_state.chat_history:
-        with st.chat_message("user"):
-            st.write(chat['user'])
-        with st.chat_message("assistant"):
-            st.write(chat['assistant'])
+    chat_history = st.session_state.chat_history
+    earlier = len(chat_history) - CHAT_RENDER_LIMIT
+    if earlier > 0 and st.checkbox(f"Show {earlier} earlier messages"):
+        render_chat(chat_history[:earlier])
+    render_chat(chat_history.recent(CHAT_RENDER_LIMIT))
     
     # User input
     user_input = st.chat_input("Ask your agent a question...")
@@ -321,6 +343,15 @@ def chat_page():
                 st.error(f"Error: {e}")
 
 
+def render_chat(chats):
+    """Render user/assistant message pairs"""
+    for chat in chats:
+        with st.chat_message("user"):
+            st.write(chat['user'])
+        with st.chat_message("assistant"):
+            st.write(chat['assistant'])
+
+
 def workflows_page():
     """Workflow execution page"""
     
@@ -396,6 +427,21 @@ def workflows_page():
             run_custom_workflow(custom_query, selected_agents)
         else:
             st.warning("Please provide a task and select at least one agent")
+    
+    # Pipelines that stopped part-way can continue from their checkpoints
+    unfinished = [manifest for manifest in st.session_state.orchestrator.checkpoints.pipelines()
+                  if manifest.get('status') != "completed"]
+    if unfinished:
+        st.markdown("---")
+        st.markdown("### 🔁 Resume Failed Workflow")
+        
+        labels = {
+            f"{manifest['pipeline_id']} - {manifest['user_query'].strip()[:60]}": manifest['pipeline_id']
+            for manifest in unfinished
+        }
+        selected = st.selectbox("Workflow", list(labels))
+        if st.button("Resume Workflow"):
+            run_resume_workflow(labels[selected])
 
 
 def analytics_page():
@@ -406,24 +452,65 @@ def analytics_page():
     # System health
     st.markdown("### 🏥 System Health")
     
+    orchestrator = st.session_state.orchestrator
+    ring_buffer = orchestrator.instrumentation.ring_buffer
+    records = ring_buffer.recent() if ring_buffer else []
+    cache_hits = sum(1 for record in records if record['cache_hit'])
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Agents", "6/6", "✅")
+        st.metric("Agents Loaded", f"{len(orchestrator.agents.built())}/{len(orchestrator.agents)}")
     with col2:
         st.metric("Workflows", len(st.session_state.conversation_history))
     with col3:
-        st.metric("Status", "Online", "🟢")
+        st.metric("Agent Calls", len(records))
     with col4:
-        st.metric("Last Activity", "Now" if st.session_state.conversation_history else "N/A")
+        st.metric("Cache Hit Rate", f"{cache_hits / len(records):.0%}" if records else "N/A")
+    
+    st.markdown("---")
+    
+    # Per-agent performance from the instrumentation ring buffer
+    st.markdown("### ⏱️ Agent Performance")
+    
+    if records:
+        summary = ring_buffer.summary()
+        st.dataframe(
+            [
+                {
+                    "Agent": agent,
+                    "Calls": stats['calls'],
+                    "Errors": stats['errors'],
+                    "p50 (s)": round(stats['p50_seconds'] or 0, 2),
+                    "p95 (s)": round(stats['p95_seconds'] or 0, 2),
+                    "Cache Hit Rate": f"{stats['cache_hit_rate']:.0%}",
+                    "Tokens/s": round(stats['tokens_per_second'], 1) if stats['tokens_per_second'] else None,
+                    "Prompt Cache": (f"{stats['prompt_cache_rate']:.0%}"
+                                     if stats.get('prompt_cache_rate') is not None else None),
+                }
+                for agent, stats in summary.items()
+            ],
+            use_container_width=True
+        )
+        
+        with st.expander("Recent agent calls"):
+            st.dataframe(list(reversed(records[-50:])), use_container_width=True)
+    else:
+        st.info("No agent calls recorded yet")
     
     st.markdown("---")
     
     # Activity log
     st.markdown("### 📜 Activity Log")
     
-    if st.session_state.conversation_history:
-        for activity in reversed(st.session_state.conversation_history):
+    history = st.session_state.conversation_history
+    if history:
+        activities = list(reversed(history.recent(ACTIVITY_RENDER_LIMIT)))
+        if len(history) > len(activities):
+            st.caption(f"Showing the latest {len(activities)} of {len(history)} activities")
+            if st.checkbox("Show older activity"):
+                activities = list(reversed(history))
+        for activity in activities:
             with st.expander(f"📝 {activity['task']} - {activity['timestamp']}"):
                 st.text("Task details would appear here")
     else:
@@ -436,7 +523,7 @@ def analytics_page():
     if st.button("📥 Download Results"):
         if st.session_state.conversation_history:
             filename = f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            json_data = json.dumps(st.session_state.conversation_history, indent=2)
+            json_data = json.dumps(st.session_state.conversation_history.to_list(), indent=2, default=str)
             st.download_button(
                 label="Download JSON",
                 data=json_data,
@@ -496,8 +583,11 @@ def settings_page():
     if st.button("🔄 Reset System", type="secondary"):
         st.session_state.orchestrator = None
         st.session_state.workflow_manager = None
-        st.session_state.conversation_history = []
-        st.session_state.chat_history = []
+        st.session_state.conversation_history.clear()
+        if 'chat_history' in st.session_state:
+            st.session_state.chat_history.clear()
+        st.session_state.conversation_history = new_history("conversation")
+        st.session_state.chat_history = new_history("chat")
         st.success("System reset complete. Refresh page to reinitialize.")
         st.rerun()
 
@@ -509,8 +599,44 @@ def run_example(example_name):
     # Add execution logic here
 
 
+def show_stage_error(error):
+    """Report a failed stage, the stages that finished and how to resume"""
+    st.error(f"Error: {error}")
+    if error.results:
+        st.json(error.results)
+    st.info(f"Finished stages are checkpointed; resume pipeline {error.pipeline_id} "
+            "from Workflows → Resume Failed Workflow")
+
+
+def run_resume_workflow(pipeline_id):
+    """Resume a checkpointed pipeline"""
+    with st.spinner(f"Resuming {pipeline_id}..."):
+        try:
+            results = st.session_state.workflow_manager.resume_pipeline(pipeline_id)
+            st.success("✅ Workflow resumed and completed!")
+            st.json(results)
+        except PipelineStageError as e:
+            show_stage_error(e)
+        except Exception as e:
+            st.error(f"Error: {e}")
+
+
+def check_csv_dataset(dataset_path) -> bool:
+    """Inspect a CSV dataset before a workflow loads it; False if it cannot be read"""
+    if not dataset_path.lower().endswith(".csv"):
+        return True
+    report = AgentUtils.inspect_csv_file(dataset_path)
+    if not report['valid']:
+        st.error(format_report(report))
+        return False
+    st.caption(format_report(report).replace("\n", "  \n"))
+    return True
+
+
 def run_eda_workflow(dataset_path):
     """Run EDA workflow"""
+    if not check_csv_dataset(dataset_path):
+        return
     with st.spinner("Running EDA workflow..."):
         try:
             results = st.session_state.workflow_manager.exploratory_data_analysis(
@@ -518,12 +644,16 @@ def run_eda_workflow(dataset_path):
             )
             st.success("✅ EDA completed successfully!")
             st.json(results)
+        except PipelineStageError as e:
+            show_stage_error(e)
         except Exception as e:
             st.error(f"Error: {e}")
 
 
 def run_ml_workflow(dataset_path, task_type):
     """Run ML pipeline workflow"""
+    if not check_csv_dataset(dataset_path):
+        return
     with st.spinner("Running ML pipeline..."):
         try:
             results = st.session_state.workflow_manager.ml_modeling_pipeline(
@@ -532,6 +662,8 @@ def run_ml_workflow(dataset_path, task_type):
             )
             st.success("✅ ML pipeline completed successfully!")
             st.json(results)
+        except PipelineStageError as e:
+            show_stage_error(e)
         except Exception as e:
             st.error(f"Error: {e}")
 
@@ -546,26 +678,52 @@ def run_deployment_workflow(model_path, model_type):
             )
             st.success("✅ Deployment setup completed!")
             st.json(results)
+        except PipelineStageError as e:
+            show_stage_error(e)
         except Exception as e:
             st.error(f"Error: {e}")
 
 
 def run_custom_workflow(query, agent_sequence):
-    """Run custom workflow"""
-    with st.spinner(f"Running workflow with {len(agent_sequence)} agents..."):
-        try:
-            results = st.session_state.orchestrator.run_data_science_pipeline(
-                query,
-                agent_sequence=agent_sequence
-            )
-            st.success("✅ Custom workflow completed!")
+    """Run custom workflow, showing each agent's output as it streams in"""
+    status = st.empty()
+    status.info(f"Running workflow with {len(agent_sequence)} agents...")
+    outputs = {}
+    placeholders = {}
+    
+    try:
+        for event in st.session_state.orchestrator.stream_data_science_pipeline(
+            query,
+            agent_sequence=agent_sequence
+        ):
+            agent_name = event.get('agent')
             
-            # Display results
-            for agent_name, result in results.items():
-                with st.expander(f"Results from {agent_name}"):
-                    st.text(str(result)[:500])
-        except Exception as e:
-            st.error(f"Error: {e}")
+            if event['type'] == 'stage_started':
+                status.info(f"🤖 Running {agent_name}...")
+                outputs[agent_name] = ""
+                with st.expander(f"Results from {agent_name}", expanded=True):
+                    placeholders[agent_name] = st.empty()
+            elif event['type'] == 'token':
+                outputs[agent_name] += event['text']
+                placeholders[agent_name].text(outputs[agent_name])
+            elif event['type'] == 'attempt_restarted':
+                # The retry streams the output again from the start
+                outputs[agent_name] = ""
+                placeholders[agent_name].text("")
+                status.info(f"🔁 Retrying {agent_name}...")
+            elif event['type'] == 'stage_finished':
+                placeholders[agent_name].text(str(event['output'])[:500])
+                source = f" (reused from {event['restored']})" if event.get('restored') else ""
+                status.info(f"✅ {agent_name} finished in {event['elapsed']:.1f}s{source}")
+            elif event['type'] == 'stage_failed':
+                placeholders[agent_name].text(outputs[agent_name])
+                status.warning(f"⚠️ {agent_name} failed after {event['elapsed']:.1f}s: {event['error']}")
+            elif event['type'] == 'pipeline_finished':
+                status.success(f"✅ Custom workflow completed in {event['elapsed']:.1f}s!")
+    except PipelineStageError as e:
+        show_stage_error(e)
+    except Exception as e:
+        st.error(f"Error: {e}")
 
 
 if __name__ == "__main__":
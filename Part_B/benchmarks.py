@@ -0,0 +1,364 @@
+"""
+Benchmark suite for the data science agent pipelines
+
+Runs the real entry points (pipelines, workflows, chat, result saving) against
+the simulated model backend in fake_llm.py, so numbers only reflect the
+framework's own overhead and scheduling, not Ollama.
+
+Usage:
+    python benchmarks.py                      # run and print a report
+    python benchmarks.py --save-baseline      # run and store benchmarks/baseline.json
+    python benchmarks.py --compare            # run and fail (exit 1) on regressions
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+from agent_orchestrator import DataScienceAgentOrchestrator
+from instrumentation import Instrumentation, RingBufferSink, percentile
+from llm_cache import ResponseCache
+from pipeline_checkpoint import CheckpointStore
+from utils import AgentUtils, load_config
+from workflow_manager import WorkflowManager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+BENCHMARK_MODEL = "fake/benchmark"
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "baseline.json")
+DEFAULT_CONCURRENCY_LEVELS = [1, 2, 4, 8]
+DEFAULT_TOLERANCE = 0.25
+
+# Absolute changes below these are treated as noise, whatever the relative change
+NOISE_FLOORS = {
+    "latency": 0.01,
+    "throughput": 0.0,
+    "peak_rss_mb": 10.0,
+    "import_seconds": 0.05,
+}
+
+# Fast, fixed simulated model so runs are comparable across machines and config edits
+BENCHMARK_FAKE_BACKEND = {
+    "time_to_first_token": 0.02,
+    "tokens_per_second": 2000,
+    "response_tokens": 100,
+    "max_concurrency": 8,
+    "responses": [],
+}
+
+PIPELINE_QUERY = "Analyze the iris dataset and build a classification model"
+PIPELINE_SEQUENCE = ['data_analyst', 'visualization_specialist', 'ml_engineer']
+
+
+def build_orchestrator(config_dir: str) -> DataScienceAgentOrchestrator:
+    """
+    Orchestrator on the simulated backend with caching, checkpoints and file sinks turned off
+
+    Every store that stays on (dataset cache, profiles, fingerprints, plans,
+    history, results) lives under config_dir, so no state from earlier runs
+    is reused.
+    """
+    config = load_config()
+    config['fake_backend'] = dict(BENCHMARK_FAKE_BACKEND)
+    config['code_execution'] = {'enabled': False}
+    config.setdefault('settings', {})['results_directory'] = os.path.join(config_dir, "results")
+    stores = {
+        'dataset_cache': ('directory', "cache/datasets"),
+        'dataset_profile': ('directory', "cache/profiles"),
+        'fingerprint': ('index_path', "cache/fingerprints.jsonl"),
+        'cache': ('plan_file', "cache/plans.json"),
+        'history': ('directory', "results/history"),
+    }
+    for section, (key, path) in stores.items():
+        config[section] = dict(config.get(section) or {}, **{key: os.path.join(config_dir, path)})
+    config_path = os.path.join(config_dir, "config.yaml")
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(config, f)
+
+    return DataScienceAgentOrchestrator(
+        model_name=BENCHMARK_MODEL,
+        config_path=config_path,
+        cache=ResponseCache(directory=None, enabled=False),
+        checkpoints=CheckpointStore(enabled=False),
+        stage_memo=ResponseCache(directory=None, enabled=False),
+        instrumentation=Instrumentation([RingBufferSink()]),
+    )
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """p50/p95/mean of latency samples in seconds"""
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "mean": sum(ordered) / len(ordered) if ordered else None,
+    }
+
+
+def time_call(func: Callable[[], Any], iterations: int, warmup: int = 1) -> Dict[str, Any]:
+    """Latency of a callable over several iterations, with its output silenced"""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            func()
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def latency_benchmarks(orchestrator: DataScienceAgentOrchestrator, work_dir: str,
+                       iterations: int) -> Dict[str, Dict[str, Any]]:
+    """Latency of each public entry point"""
+    manager = WorkflowManager(orchestrator)
+    manager.results_dir = os.path.join(work_dir, "results")
+    os.makedirs(manager.results_dir, exist_ok=True)
+    sample_results = {"data_analyst": "x" * 4000, "ml_engineer": "y" * 4000}
+
+    cases = {
+        "orchestrator_init": lambda: build_orchestrator(work_dir),
+        "run_data_science_pipeline": lambda: orchestrator.run_data_science_pipeline(
+            PIPELINE_QUERY, agent_sequence=PIPELINE_SEQUENCE, bypass_cache=True),
+        "run_data_science_pipeline_parallel": lambda: orchestrator.run_data_science_pipeline(
+            PIPELINE_QUERY, agent_sequence=PIPELINE_SEQUENCE, parallel=True,
+            dependencies=orchestrator.stage_dependencies, bypass_cache=True),
+        "stream_data_science_pipeline": lambda: list(orchestrator.stream_data_science_pipeline(
+            PIPELINE_QUERY, agent_sequence=PIPELINE_SEQUENCE, bypass_cache=True)),
+        "chat_with_agent": lambda: orchestrator.chat_with_agent(
+            'data_analyst', "What is a box plot?", bypass_cache=True),
+        "exploratory_data_analysis": lambda: manager.exploratory_data_analysis("iris"),
+        "ml_modeling_pipeline": lambda: manager.ml_modeling_pipeline("wine"),
+        "time_series_analysis": lambda: manager.time_series_analysis("sales.csv"),
+        "deploy_model": lambda: manager.deploy_model("model.pkl"),
+        "custom_pipeline": lambda: manager.custom_pipeline(PIPELINE_QUERY, PIPELINE_SEQUENCE),
+        "save_results": lambda: manager.save_results(sample_results, "benchmark"),
+        "save_conversation": lambda: AgentUtils.save_conversation(
+            sample_results, os.path.join(work_dir, "conversation.json")),
+    }
+
+    report = {}
+    for name, func in cases.items():
+        report[name] = time_call(func, iterations)
+        print(f"  {name:<36} p50 {report[name]['p50'] * 1000:8.1f} ms   "
+              f"p95 {report[name]['p95'] * 1000:8.1f} ms")
+    return report
+
+
+def throughput_benchmarks(orchestrator: DataScienceAgentOrchestrator, levels: List[int],
+                          pipelines_per_level: int) -> Dict[str, Dict[str, Any]]:
+    """Pipelines per second when running several pipelines at once"""
+    async def run_level(concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        samples = []
+
+        async def run_one(index):
+            async with semaphore:
+                started = time.perf_counter()
+                await orchestrator.arun_data_science_pipeline(
+                    f"{PIPELINE_QUERY} (run {index})", agent_sequence=PIPELINE_SEQUENCE,
+                    bypass_cache=True)
+                samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_one(index) for index in range(pipelines_per_level)))
+        elapsed = time.perf_counter() - started
+        return {
+            "pipelines": pipelines_per_level,
+            "elapsed": elapsed,
+            "pipelines_per_second": pipelines_per_level / elapsed,
+            "latency": summarize(samples),
+        }
+
+    report = {}
+    for concurrency in levels:
+        with contextlib.redirect_stdout(io.StringIO()):
+            report[str(concurrency)] = asyncio.run(run_level(concurrency))
+        print(f"  concurrency {concurrency:<3} {report[str(concurrency)]['pipelines_per_second']:8.2f} pipelines/s")
+    return report
+
+
+def import_time(modules: List[str] = None, repeats: int = 3) -> float:
+    """Best-of-N cold import time of the main modules, in a fresh interpreter"""
+    modules = modules or ['agent_orchestrator', 'workflow_manager']
+    script = (
+        "import time; started = time.perf_counter(); "
+        + "; ".join(f"import {module}" for module in modules)
+        + "; print(time.perf_counter() - started)"
+    )
+    env = dict(os.environ, LITELLM_LOCAL_MODEL_COST_MAP=os.environ.get('LITELLM_LOCAL_MODEL_COST_MAP', "True"))
+    timings = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, None when it cannot be measured"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    # Windows tracks the peak working set
+    return getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024)
+
+
+def run_benchmarks(iterations: int = 5, concurrency_levels: List[int] = None,
+                   pipelines_per_level: int = 8) -> Dict[str, Any]:
+    """Run the whole suite and return the report"""
+    concurrency_levels = concurrency_levels or DEFAULT_CONCURRENCY_LEVELS
+
+    print("\n" + "="*60)
+    print("Benchmarks (simulated model backend)")
+    print("="*60)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Stores with fixed relative paths (conversations, process-wide caches) also start empty
+        os.chdir(work_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                orchestrator = build_orchestrator(work_dir)
+
+            print("\nLatency:")
+            latency = latency_benchmarks(orchestrator, work_dir, iterations)
+
+            print("\nThroughput:")
+            throughput = throughput_benchmarks(orchestrator, concurrency_levels, pipelines_per_level)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "model": BENCHMARK_MODEL,
+            "fake_backend": BENCHMARK_FAKE_BACKEND,
+            "iterations": iterations,
+        },
+        "latency": latency,
+        "throughput": throughput,
+        "peak_rss_mb": peak_rss_mb(),
+        "import_seconds": import_time(),
+    }
+
+    if report['peak_rss_mb'] is not None:
+        print(f"\nPeak RSS: {report['peak_rss_mb']:.1f} MB")
+    print(f"Import time: {report['import_seconds'] * 1000:.0f} ms")
+    return report
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Regressions of the current report against a baseline
+
+    Args:
+        baseline: Previously saved report
+        current: Report from this run
+        tolerance: Allowed relative slowdown (0.25 = 25% worse)
+
+    Returns:
+        One message per regressed metric; empty when nothing regressed
+    """
+    # (name, baseline value, current value, noise floor, True when higher is better)
+    checks = []
+    for name, stats in baseline.get('latency', {}).items():
+        if name in current.get('latency', {}):
+            for stat in ('p50', 'p95'):
+                checks.append((f"latency.{name}.{stat}", stats.get(stat),
+                               current['latency'][name].get(stat), NOISE_FLOORS['latency'], False))
+    for level, stats in baseline.get('throughput', {}).items():
+        if level in current.get('throughput', {}):
+            checks.append((f"throughput.{level}.pipelines_per_second", stats.get('pipelines_per_second'),
+                           current['throughput'][level].get('pipelines_per_second'),
+                           NOISE_FLOORS['throughput'], True))
+    for name in ('peak_rss_mb', 'import_seconds'):
+        checks.append((name, baseline.get(name), current.get(name), NOISE_FLOORS[name], False))
+
+    regressions = []
+    for name, old, new, noise_floor, higher_is_better in checks:
+        if old is None or new is None or old <= 0 or abs(new - old) <= noise_floor:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    return regressions
+
+
+def save_report(report: Dict[str, Any], path: str):
+    """Write a report as JSON"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to: {path}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipelines on the simulated backend")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed runs per latency benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY_LEVELS,
+                        help="Concurrency levels for the throughput benchmark")
+    parser.add_argument("--pipelines", type=int, default=8, help="Pipelines run per concurrency level")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail if this run regresses against the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative regression before --compare fails")
+    parser.add_argument("--output", help="Also write this run's report to a JSON file")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.iterations, args.concurrency, args.pipelines)
+
+    if args.output:
+        save_report(report, args.output)
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\n✗ No baseline at {args.baseline}; run with --save-baseline first")
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\n✓ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+    if args.save_baseline:
+        save_report(report, args.baseline)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
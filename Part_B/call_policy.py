@@ -0,0 +1,459 @@
+"""
+Call policy for model requests
+Deadlines, exponential backoff retries, hedged requests and a circuit breaker
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+
+import httpx
+
+from instrumentation import percentile
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the backend while the circuit breaker is open"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call runs past its attempt timeout or overall deadline"""
+    
+    def __init__(self, message: str, pending: Sequence[Future] = ()):
+        super().__init__(message)
+        # Blocking attempts still running on their threads
+        self.pending = list(pending)
+
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429}
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a failed call is worth retrying and counts against the circuit breaker
+    
+    Timeouts, connection errors and 5xx/429 responses are; bad requests,
+    authentication errors and bugs (ValueError, TypeError, ...) are not.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = getattr(error, 'status_code', None)
+    if status is None and isinstance(getattr(error, 'response', None), httpx.Response):
+        status = error.response.status_code
+    if isinstance(status, int):
+        return status >= 500 or status in TRANSIENT_STATUS_CODES
+    return isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError, httpx.TransportError))
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the model backend keeps failing
+    
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._trial_in_flight or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+    
+    def before_call(self):
+        """Reserve a call, raising CircuitOpenError if the circuit is open"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            retry_in = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if retry_in > 0 or self._trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    f"Model backend unavailable after {self.failures} consecutive failures; "
+                    f"retrying in {max(retry_in, 0):.0f}s"
+                )
+            self._trial_in_flight = True
+    
+    def release(self):
+        """Give back a reserved call that ended without a verdict (cancelled or not transient)"""
+        with self._lock:
+            self._trial_in_flight = False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if not self.failure_threshold:
+                return
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class CallPolicy:
+    """
+    Wraps every agent call with deadlines, retries, hedging and a circuit breaker
+    
+    Hedging sends a second identical request when the first has been running
+    longer than the given percentile of recent latencies for the same key
+    (agent); whichever answers first wins and the other is abandoned.
+    
+    Only transient failures (see is_transient) are retried and counted by
+    the circuit breaker; there is one breaker per backend (model), so one
+    model being down does not reject calls routed to another.
+    """
+    
+    def __init__(self, attempt_timeout: Optional[float] = None, deadline: Optional[float] = None,
+                 max_retries: int = 2, backoff_initial: float = 1.0, backoff_max: float = 30.0,
+                 backoff_multiplier: float = 2.0, backoff_jitter: float = 0.1,
+                 hedge_percentile: Optional[float] = None, hedge_min_samples: int = 20,
+                 latency_window: int = 200, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 retry_on: Callable[[BaseException], bool] = is_transient):
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.backoff_multiplier = backoff_multiplier
+        self.backoff_jitter = backoff_jitter
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency_window = latency_window
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.retry_on = retry_on
+        self.counters = {"calls": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "failures": 0,
+                         "late_results": 0}
+        
+        self._latencies = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CallPolicy":
+        """Build a policy from the 'call_policy' section of config.yaml"""
+        config = config or {}
+        breaker_config = config.get('circuit_breaker') or {}
+        return cls(
+            attempt_timeout=config.get('attempt_timeout_seconds'),
+            deadline=config.get('deadline_seconds'),
+            max_retries=config.get('max_retries', 2),
+            backoff_initial=config.get('backoff_initial_seconds', 1.0),
+            backoff_max=config.get('backoff_max_seconds', 30.0),
+            backoff_multiplier=config.get('backoff_multiplier', 2.0),
+            backoff_jitter=config.get('backoff_jitter', 0.1),
+            hedge_percentile=config.get('hedge_percentile'),
+            hedge_min_samples=config.get('hedge_min_samples', 20),
+            failure_threshold=breaker_config.get('failure_threshold', 5),
+            reset_timeout=breaker_config.get('reset_timeout_seconds', 30.0),
+        )
+    
+    def breaker(self, backend: str = "default") -> CircuitBreaker:
+        """The circuit breaker of one backend, created on first use"""
+        with self._lock:
+            if backend not in self._breakers:
+                self._breakers[backend] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[backend]
+    
+    def call(self, func: Callable[[], Any], key: str = "default", hedge: bool = True, metrics: Any = None,
+             backend: str = "default") -> Any:
+        """
+        Run a blocking call under the policy
+        
+        A timed-out attempt keeps running on its thread, so instead of
+        retrying next to it the policy waits for it and uses its result if
+        it succeeds. The wait ends at the deadline or, without one, once the
+        time the retries would have had (attempt_timeout per attempt) is
+        spent; the call then fails with DeadlineExceeded.
+        
+        Args:
+            func: Makes one attempt; called again for retries and hedges
+            key: Groups latencies for the hedging percentile (the agent name)
+            hedge: Allow a hedged second request
+            metrics: Optional CallMetrics to record attempts and hedging on
+            backend: Selects the circuit breaker (the model name)
+        
+        Returns:
+            The first successful result
+        """
+        breaker = self.breaker(backend)
+        deadline = self._deadline()
+        # Without a deadline, stragglers may use the whole retry budget but no more
+        wait_until = deadline
+        if wait_until is None and self.attempt_timeout is not None:
+            wait_until = time.monotonic() + self.attempt_timeout * (self.max_retries + 1)
+        attempt = 0
+        while True:
+            breaker.before_call()
+            self._count("calls" if attempt == 0 else "retries")
+            self._note_attempt(metrics)
+            try:
+                result = self._attempt(func, key, deadline, hedge, metrics)
+            except Exception as e:
+                delay = self._after_failure(breaker, e, attempt, deadline)
+                if delay is None:
+                    raise
+                if getattr(e, 'pending', None):
+                    # The timed-out attempt still runs on its thread; a retry next to it
+                    # would only add load, so wait for it and keep its result if it succeeds
+                    finished, late = self._wait_for_stragglers(e.pending, wait_until)
+                    if not finished:
+                        raise
+                    if late is not None:
+                        breaker.record_success()
+                        return late[0]
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # Interrupted mid-call: free a half-open trial so later calls get through
+                breaker.release()
+                raise
+            breaker.record_success()
+            return result
+    
+    async def acall(self, factory: Callable[[], Awaitable[Any]], key: str = "default", hedge: bool = True,
+                    metrics: Any = None, backend: str = "default") -> Any:
+        """Async version of call; factory returns a new coroutine for each attempt"""
+        breaker = self.breaker(backend)
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            breaker.before_call()
+            self._count("calls" if attempt == 0 else "retries")
+            self._note_attempt(metrics)
+            try:
+                result = await self._aattempt(factory, key, deadline, hedge, metrics)
+            except Exception as e:
+                delay = self._after_failure(breaker, e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled (or interrupted) mid-call: free a half-open trial so later calls get through
+                breaker.release()
+                raise
+            breaker.record_success()
+            return result
+    
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while hedging is off or there are too few samples"""
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+        if len(latencies) < max(self.hedge_min_samples, 1):
+            return None
+        return percentile(latencies, self.hedge_percentile)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            breakers = dict(self._breakers)
+        counters["circuit"] = {backend: breaker.state for backend, breaker in breakers.items()}
+        counters["rejected"] = sum(breaker.rejected for breaker in breakers.values())
+        return counters
+    
+    def _attempt(self, func: Callable[[], Any], key: str, deadline: Optional[float], hedge: bool,
+                 metrics: Any) -> Any:
+        """One attempt, plus its hedge, bounded by the attempt timeout"""
+        timeout = self._attempt_timeout(deadline)
+        hedge_after = self.hedge_delay(key) if hedge else None
+        started = time.perf_counter()
+        if timeout is not None and timeout <= 0:
+            self._count("timeouts")
+            raise DeadlineExceeded(f"Deadline for '{key}' passed before the call started")
+        
+        if timeout is None and hedge_after is None:
+            result = func()
+            self._record_latency(key, time.perf_counter() - started)
+            return result
+        
+        # Attempts run on their own daemon threads, so a timed-out or losing
+        # attempt is abandoned rather than blocking the caller
+        futures = [self._start_thread(func)]
+        if hedge_after is not None and (timeout is None or hedge_after < timeout):
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                self._hedged(metrics)
+                futures.append(self._start_thread(func))
+        
+        pending = set(futures)
+        error = None
+        while pending:
+            remaining = None if timeout is None else timeout - (time.perf_counter() - started)
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        self._count("hedge_wins")
+                    self._record_latency(key, time.perf_counter() - started)
+                    return future.result()
+                error = future.exception()
+        
+        if error is not None and not pending:
+            raise error
+        self._count("timeouts")
+        raise DeadlineExceeded(f"Model call for '{key}' exceeded {timeout:.1f}s", pending)
+    
+    async def _aattempt(self, factory: Callable[[], Awaitable[Any]], key: str, deadline: Optional[float],
+                        hedge: bool, metrics: Any) -> Any:
+        """Async version of _attempt; losing or timed-out attempts are cancelled"""
+        timeout = self._attempt_timeout(deadline)
+        hedge_after = self.hedge_delay(key) if hedge else None
+        started = time.perf_counter()
+        if timeout is not None and timeout <= 0:
+            self._count("timeouts")
+            raise DeadlineExceeded(f"Deadline for '{key}' passed before the call started")
+        
+        if timeout is None and hedge_after is None:
+            result = await factory()
+            self._record_latency(key, time.perf_counter() - started)
+            return result
+        
+        tasks = [asyncio.ensure_future(factory())]
+        try:
+            if hedge_after is not None and (timeout is None or hedge_after < timeout):
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    self._hedged(metrics)
+                    tasks.append(asyncio.ensure_future(factory()))
+            
+            pending = set(tasks)
+            error = None
+            while pending:
+                remaining = None if timeout is None else timeout - (time.perf_counter() - started)
+                if remaining is not None and remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self._count("hedge_wins")
+                        self._record_latency(key, time.perf_counter() - started)
+                        return task.result()
+                    error = task.exception()
+            
+            if error is not None and not pending:
+                raise error
+            self._count("timeouts")
+            raise DeadlineExceeded(f"Model call for '{key}' exceeded {timeout:.1f}s")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def _after_failure(self, breaker: CircuitBreaker, error: Exception, attempt: int,
+                       deadline: Optional[float]) -> Optional[float]:
+        """Record a failed attempt; return the backoff before retrying, or None to give up"""
+        if isinstance(error, CircuitOpenError):
+            return None
+        self._count("failures")
+        if not self.retry_on(error):
+            # The backend answered (or the call never reached it): no verdict on its health
+            breaker.release()
+            return None
+        breaker.record_failure()
+        if attempt >= self.max_retries:
+            return None
+        
+        delay = min(self.backoff_max, self.backoff_initial * self.backoff_multiplier ** attempt)
+        delay *= 1 + random.uniform(-self.backoff_jitter, self.backoff_jitter)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return max(delay, 0)
+    
+    def _wait_for_stragglers(self, pending: Sequence[Future], deadline: float):
+        """
+        Wait for timed-out blocking attempts to finish, until deadline (a monotonic time)
+        
+        Returns (finished, result): finished is False when the deadline came
+        first; result is a 1-tuple holding the first successful result, or
+        None when every attempt failed.
+        """
+        pending = set(pending)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False, None
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._count("late_results")
+                    return True, (future.result(),)
+        return True, None
+    
+    def _deadline(self) -> Optional[float]:
+        return time.monotonic() + self.deadline if self.deadline else None
+    
+    def _attempt_timeout(self, deadline: Optional[float]) -> Optional[float]:
+        """Time allowed for the next attempt: the attempt timeout, capped by what is left of the deadline"""
+        limits = [limit for limit in (self.attempt_timeout,
+                                      None if deadline is None else deadline - time.monotonic())
+                  if limit is not None]
+        if not limits:
+            return None
+        return max(min(limits), 0)
+    
+    def _record_latency(self, key: str, latency: float):
+        with self._lock:
+            if key not in self._latencies:
+                self._latencies[key] = deque(maxlen=self.latency_window)
+            self._latencies[key].append(latency)
+    
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+    
+    def _hedged(self, metrics: Any):
+        self._count("hedges")
+        if metrics is not None:
+            metrics.hedged = True
+    
+    @staticmethod
+    def _note_attempt(metrics: Any):
+        if metrics is not None:
+            metrics.attempts += 1
+    
+    @staticmethod
+    def _start_thread(func: Callable[[], Any]) -> Future:
+        """Run func on a daemon thread and return its future"""
+        future = Future()
+        
+        def target():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=target, name="agent-call", daemon=True).start()
+        return future
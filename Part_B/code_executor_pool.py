@@ -0,0 +1,487 @@
+"""
+Warm code-execution pool
+Runs agent-generated code in long-lived worker processes that already have the
+data science libraries imported and recently used datasets loaded
+"""
+
+import asyncio
+import builtins
+import contextlib
+import importlib
+import io
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from google.adk.code_executors import BaseCodeExecutor
+from google.adk.code_executors.code_execution_utils import CodeExecutionInput, CodeExecutionResult
+from pydantic import Field
+
+from dataset_cache import MappedDatasetCache
+from utils import DatasetLoader
+
+
+DEFAULT_PRELOAD = (
+    "numpy", "pandas", "sklearn", "sklearn.model_selection", "sklearn.ensemble", "sklearn.metrics",
+    "matplotlib.pyplot", "xgboost",
+)
+
+
+class _DatasetCache:
+    """
+    Recently read datasets, kept in the worker between executions
+    
+    Frames are built on the memory-mapped dataset cache, so every worker
+    shares one copy of a dataset's numeric columns.
+    """
+    
+    def __init__(self, entries: int, mapped: MappedDatasetCache):
+        self.entries = entries
+        self.mapped = mapped
+        self._frames = OrderedDict()
+        self._read_csv = None
+    
+    def install(self):
+        """Serve plain pd.read_csv(path) calls from the cache"""
+        pandas = sys.modules.get("pandas")
+        if pandas is None or self.entries <= 0:
+            return
+        self._read_csv = pandas.read_csv
+        
+        def read_csv(filepath_or_buffer, *args, **kwargs):
+            # Only a bare path is cached; any other argument changes the result
+            if args or kwargs or not isinstance(filepath_or_buffer, (str, os.PathLike)) \
+                    or not os.path.isfile(filepath_or_buffer):
+                return self._read_csv(filepath_or_buffer, *args, **kwargs)
+            path = os.fspath(filepath_or_buffer)
+            return self._cached(path, lambda: self.mapped.read_csv(path, self._read_csv))
+        
+        read_csv.__doc__ = self._read_csv.__doc__
+        pandas.read_csv = read_csv
+    
+    def load(self, dataset: str):
+        """load_dataset() helper given to executed code: a CSV path or a sklearn dataset name"""
+        if os.path.isfile(dataset):
+            import pandas
+            return pandas.read_csv(dataset)
+        
+        def load_sklearn():
+            frame = DatasetLoader.load_sklearn_frame(dataset, self.mapped)
+            if frame is not None:
+                return frame
+            from sklearn import datasets
+            loader = getattr(datasets, f"load_{dataset}", None) or getattr(datasets, f"fetch_{dataset}", None)
+            if loader is None:
+                raise ValueError(f"Unknown dataset '{dataset}'")
+            return loader(as_frame=True).frame
+        return self._cached(f"sklearn:{dataset}", load_sklearn)
+    
+    def _cached(self, path: str, read):
+        if path.startswith("sklearn:"):
+            key = path
+        else:
+            stat = os.stat(path)
+            key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = read()
+            self._frames[key] = frame
+            while len(self._frames) > self.entries:
+                self._frames.popitem(last=False)
+        self._frames.move_to_end(key)
+        # A copy, so one execution's changes never leak into the next; with
+        # copy-on-write a shallow one is enough and keeps the columns shared
+        return frame.copy(deep=not _copy_on_write())
+
+
+def _copy_on_write() -> bool:
+    pandas = sys.modules.get("pandas")
+    return pandas is not None and (int(pandas.__version__.split(".")[0]) >= 3
+                                   or bool(pandas.options.mode.copy_on_write))
+
+
+def _limit_memory(memory_limit_mb: Optional[int]):
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+        limit = int(memory_limit_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        # Not available on this platform; executions run without a memory cap
+        pass
+
+
+def _execute(code: str, datasets: _DatasetCache, working_dir: str) -> Dict[str, Any]:
+    """Run one snippet in a fresh namespace, capturing its output"""
+    run_name = "__main__" if re.search(r"if\s+__name__\s*==\s*['\"]__main__['\"]", code) else "__exec__"
+    namespace = {"__name__": run_name, "__builtins__": builtins, "load_dataset": datasets.load}
+    stdout, stderr = io.StringIO(), io.StringIO()
+    recycle = False
+    state = _ProcessState()
+    started = time.perf_counter()
+    
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            exec(compile(code, "<code>", "exec"), namespace, namespace)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            stderr.write(f"Code exited with status {e.code}\n")
+    except MemoryError:
+        stderr.write("MemoryError: the code exceeded the worker's memory limit\n")
+        recycle = True
+    except BaseException as e:
+        tb = e.__traceback__
+        # Drop this function's frame so the traceback starts in the snippet
+        traceback.print_exception(type(e), e, tb.tb_next if tb else None, file=stderr)
+    finally:
+        # Undo what a snippet may have changed for the next one
+        os.chdir(working_dir)
+        state.restore()
+        pyplot = sys.modules.get("matplotlib.pyplot")
+        if pyplot is not None:
+            pyplot.close("all")
+    
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(),
+            "seconds": time.perf_counter() - started, "recycle": recycle}
+
+
+class _ProcessState:
+    """
+    Snapshot of the worker state a snippet can change for later ones
+    
+    Covers the module table, environment variables, sys.path and sys.argv.
+    Modules a snippet imported from packages that were not loaded before
+    are dropped, while new submodules of already loaded packages are kept,
+    since those packages hold references to them. Changes made inside a
+    module (e.g. a monkeypatched function) are not undone; max_runs_per_worker
+    bounds how long they can last.
+    """
+    
+    def __init__(self):
+        self.modules = dict(sys.modules)
+        self.packages = {name.partition(".")[0] for name in self.modules}
+        self.environ = dict(os.environ)
+        self.path = list(sys.path)
+        self.argv = list(sys.argv)
+    
+    def restore(self):
+        for name in list(sys.modules):
+            if name not in self.modules and name.partition(".")[0] not in self.packages:
+                del sys.modules[name]
+        # Puts back replaced or deleted entries
+        sys.modules.update(self.modules)
+        if os.environ != self.environ:
+            os.environ.clear()
+            os.environ.update(self.environ)
+        sys.path[:] = self.path
+        sys.argv[:] = self.argv
+
+
+def _worker_main(connection, preload: Sequence[str], memory_limit_mb: Optional[int], dataset_cache_entries: int,
+                 mapped_dataset_config: Optional[Dict[str, Any]]):
+    """Entry point of a worker process"""
+    _limit_memory(memory_limit_mb)
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    
+    loaded = []
+    for module in preload:
+        try:
+            importlib.import_module(module)
+            loaded.append(module)
+        except Exception:
+            continue
+    
+    pandas = sys.modules.get("pandas")
+    if pandas is not None and int(pandas.__version__.split(".")[0]) == 2:
+        # Writes to a shared dataset copy the column instead of failing on the read-only map
+        pandas.options.mode.copy_on_write = True
+    datasets = _DatasetCache(dataset_cache_entries, MappedDatasetCache.from_config(mapped_dataset_config))
+    datasets.install()
+    working_dir = os.getcwd()
+    connection.send(("ready", loaded))
+    
+    while True:
+        try:
+            code = connection.recv()
+        except EOFError:
+            break
+        if code is None:
+            break
+        connection.send(_execute(code, datasets, working_dir))
+
+
+class _Worker:
+    """Parent-side handle of one worker process"""
+    
+    def __init__(self, context, preload: Sequence[str], memory_limit_mb: Optional[int], dataset_cache_entries: int,
+                 mapped_dataset_config: Optional[Dict[str, Any]]):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child, tuple(preload), memory_limit_mb, dataset_cache_entries, mapped_dataset_config),
+            name="code-worker",
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.runs = 0
+        self.loaded = []
+    
+    def wait_ready(self, timeout: float) -> List[str]:
+        if not self.connection.poll(timeout):
+            raise TimeoutError(f"Code worker did not start within {timeout}s")
+        _, self.loaded = self.connection.recv()
+        return self.loaded
+    
+    def run(self, code: str, timeout: Optional[float], count: bool = True) -> Dict[str, Any]:
+        """Execute code; raises TimeoutError or EOFError if the worker hangs or dies"""
+        self.connection.send(code)
+        if not self.connection.poll(timeout):
+            raise TimeoutError
+        if count:
+            self.runs += 1
+        return self.connection.recv()
+    
+    def stop(self):
+        """Ask the worker to exit, killing it if it does not"""
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        self.kill()
+    
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.connection.close()
+
+
+class CodeWorkerPool:
+    """
+    Long-lived Python worker processes for executing generated code
+    
+    Each worker imports the preload modules once at startup and keeps the
+    datasets read with pd.read_csv(path) or load_dataset(name) in an LRU
+    cache, so a snippet no longer pays for imports and loading. Datasets
+    come from the memory-mapped dataset cache, so workers share one copy of
+    their numeric columns. Every
+    execution gets a fresh namespace and a copy of any cached dataset; the
+    working directory, imported modules, environment variables, sys.path and
+    matplotlib figures are reset afterwards, and each worker runs under an
+    address-space limit. A worker that times out or
+    dies is killed and replaced; one that has served max_runs_per_worker
+    executions (or ran out of memory) is recycled. Replacements start in the
+    background so an execution never waits for imports.
+    """
+    
+    def __init__(self, workers: int = 2, preload: Sequence[str] = DEFAULT_PRELOAD,
+                 max_runs_per_worker: int = 50, timeout: float = 60.0, memory_limit_mb: Optional[int] = 2048,
+                 dataset_cache_entries: int = 4, startup_timeout: float = 120.0, start_method: str = "spawn",
+                 mapped_dataset_config: Dict[str, Any] = None):
+        self.workers = max(workers, 1)
+        self.preload = list(preload)
+        self.max_runs_per_worker = max_runs_per_worker
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.dataset_cache_entries = dataset_cache_entries
+        # 'dataset_cache' section for the workers' MappedDatasetCache
+        self.mapped_dataset_config = mapped_dataset_config
+        self.startup_timeout = startup_timeout
+        self.executions = 0
+        self.warm_ups = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.started_workers = 0
+        self.last_error = None
+        
+        # spawn: workers never inherit the parent's threads or open connections
+        self._context = multiprocessing.get_context(start_method)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], mapped_dataset_config: Dict[str, Any] = None) -> "CodeWorkerPool":
+        """Build a pool from the 'code_execution' and 'dataset_cache' sections of config.yaml"""
+        config = config or {}
+        return cls(
+            workers=config.get('workers', 2),
+            preload=config.get('preload') or DEFAULT_PRELOAD,
+            max_runs_per_worker=config.get('max_runs_per_worker', 50),
+            timeout=config.get('timeout_seconds', 60),
+            memory_limit_mb=config.get('memory_limit_mb', 2048),
+            dataset_cache_entries=config.get('dataset_cache_entries', 4),
+            mapped_dataset_config=mapped_dataset_config,
+        )
+    
+    def start(self):
+        """Start the workers in the background (once)"""
+        with self._lock:
+            if self._started or self._closed:
+                return
+            self._started = True
+        for _ in range(self.workers):
+            self._spawn_in_background()
+    
+    def execute(self, code: str, timeout: float = None) -> Dict[str, Any]:
+        """
+        Run code on an idle worker
+        
+        Returns:
+            Dict with 'stdout', 'stderr' (empty unless the code failed) and 'seconds'
+        """
+        return self._execute(code, timeout)
+    
+    async def aexecute(self, code: str, timeout: float = None) -> Dict[str, Any]:
+        """Async version of execute; the round trip to the worker runs on a thread"""
+        return await asyncio.to_thread(self._execute, code, timeout)
+    
+    def _execute(self, code: str, timeout: float = None, warm_up: bool = False) -> Dict[str, Any]:
+        """Run code on an idle worker; warm-up runs do not count toward max_runs_per_worker"""
+        self.start()
+        timeout = timeout or self.timeout
+        try:
+            worker = self._idle.get(timeout=self.startup_timeout)
+        except queue.Empty:
+            error = f": {self.last_error}" if self.last_error else ""
+            return {"stdout": "", "stderr": f"No code worker available{error}\n", "seconds": 0.0}
+        
+        with self._lock:
+            if warm_up:
+                self.warm_ups += 1
+            else:
+                self.executions += 1
+        try:
+            result = worker.run(code, timeout, count=not warm_up)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            self._replace(worker)
+            return {"stdout": "", "stderr": f"Code execution timed out after {timeout} seconds.\n",
+                    "seconds": timeout}
+        except (EOFError, OSError):
+            exitcode = worker.process.exitcode
+            self._replace(worker)
+            return {"stdout": "", "stderr": f"Code worker exited unexpectedly (status {exitcode}).\n",
+                    "seconds": 0.0}
+        
+        if result.pop("recycle") or worker.runs >= self.max_runs_per_worker:
+            with self._lock:
+                self.recycled += 1
+            self._replace(worker, graceful=True)
+        else:
+            self._idle.put(worker)
+        return result
+    
+    def warm_dataset(self, dataset: str):
+        """Load a dataset into the cache of every idle worker, in the background"""
+        if not dataset or self.dataset_cache_entries <= 0:
+            return
+        self.start()
+        code = f"load_dataset({dataset!r})"
+        
+        def warm():
+            for _ in range(self.workers):
+                self._execute(code, warm_up=True)
+        
+        threading.Thread(target=warm, name="code-worker-warm", daemon=True).start()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "idle": self._idle.qsize(),
+            "executions": self.executions,
+            "warm_ups": self.warm_ups,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+            "started_workers": self.started_workers,
+        }
+    
+    def close(self):
+        """Stop every idle worker; busy workers are stopped when they finish"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+    
+    def _replace(self, worker: _Worker, graceful: bool = False):
+        if graceful:
+            threading.Thread(target=worker.stop, daemon=True).start()
+        else:
+            worker.kill()
+        self._spawn_in_background()
+    
+    def _spawn_in_background(self):
+        if self._closed:
+            return
+        threading.Thread(target=self._spawn, name="code-worker-start", daemon=True).start()
+    
+    def _spawn(self):
+        try:
+            worker = _Worker(self._context, self.preload, self.memory_limit_mb, self.dataset_cache_entries,
+                             self.mapped_dataset_config)
+            worker.wait_ready(self.startup_timeout)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Warning: could not start a code worker: {self.last_error}")
+            return
+        with self._lock:
+            self.started_workers += 1
+        if self._closed:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+
+class PooledCodeExecutor(BaseCodeExecutor):
+    """
+    ADK code executor that runs the code blocks of model responses on a CodeWorkerPool
+    
+    execute_code blocks until the worker answers (up to timeout_seconds).
+    Current ADK releases call it through asyncio.to_thread; callers on an
+    event loop should use aexecute_code, which does the same.
+    """
+    
+    pool: Any = Field(default=None, exclude=True)
+    
+    def execute_code(self, invocation_context: Any, code_execution_input: CodeExecutionInput) -> CodeExecutionResult:
+        result = self.pool.execute(code_execution_input.code, timeout=self.timeout_seconds)
+        return self._result(result)
+    
+    async def aexecute_code(self, invocation_context: Any, code_execution_input: CodeExecutionInput
+                            ) -> CodeExecutionResult:
+        """Async version of execute_code that keeps the event loop free while the code runs"""
+        result = await self.pool.aexecute(code_execution_input.code, timeout=self.timeout_seconds)
+        return self._result(result)
+    
+    @staticmethod
+    def _result(result: Dict[str, Any]) -> CodeExecutionResult:
+        return CodeExecutionResult(stdout=result['stdout'], stderr=result['stderr'], output_files=[])
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_code_worker_pool(config: Dict[str, Any] = None, mapped_dataset_config: Dict[str, Any] = None
+                         ) -> CodeWorkerPool:
+    """Return the process-wide worker pool, creating it on first use"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = CodeWorkerPool.from_config(config, mapped_dataset_config)
+        return _shared_pool
@@ -0,0 +1,157 @@
+"""
+Context handoff between pipeline stages
+Fits the output of upstream agents into a per-agent token budget
+"""
+
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+CODE_BLOCK_PATTERN = re.compile(r"```.*?(?:```|$)", re.S)
+
+KEY_LINE_PATTERN = re.compile(
+    r"^\s*(#{1,6}\s|\*\*|[-*•]\s|\d+[.)]\s)"
+    r"|\b(accuracy|precision|recall|f1|r2|rmse|mae|auc|score|mean|median|std|correlat\w*|missing|"
+    r"outlier\w*|shape|finding\w*|insight\w*|recommend\w*|conclusion\w*|result\w*|best)\b",
+    re.I
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+class ContextHandoff:
+    """
+    Trims upstream output to a token budget, keeping code and key findings
+    
+    stats holds the max_recent_stats latest handoffs; totals counts every
+    handoff since the start.
+    """
+    
+    def __init__(self, default_budget: int = 1500, agent_budgets: Dict[str, int] = None,
+                 code_share: float = 0.6, enabled: bool = True,
+                 token_counter: Callable[[str], int] = estimate_tokens, max_recent_stats: int = 200):
+        self.default_budget = default_budget
+        self.agent_budgets = agent_budgets or {}
+        self.code_share = code_share
+        self.enabled = enabled
+        self.count_tokens = token_counter
+        self.stats = deque(maxlen=max(max_recent_stats, 1))
+        self.totals = {"handoffs": 0, "original_tokens": 0, "handoff_tokens": 0, "saved_tokens": 0}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ContextHandoff":
+        """Build a handoff stage from the 'context_handoff' section of config.yaml"""
+        config = config or {}
+        return cls(
+            default_budget=config.get('default_token_budget', 1500),
+            agent_budgets=config.get('agent_token_budgets'),
+            code_share=config.get('code_share', 0.6),
+            enabled=config.get('enabled', True),
+            max_recent_stats=config.get('max_recent_stats', 200),
+        )
+    
+    @property
+    def tokens_saved(self) -> int:
+        """Total tokens removed from stage prompts so far"""
+        return self.totals['saved_tokens']
+    
+    def budget_for(self, agent_name: str) -> int:
+        """Token budget for the context handed to an agent"""
+        return self.agent_budgets.get(agent_name, self.default_budget)
+    
+    def prepare(self, agent_name: str, text: Any, budget: Optional[int] = None) -> str:
+        """Return the context to hand to an agent, trimmed to its budget"""
+        text = text if isinstance(text, str) else str(text)
+        if not self.enabled:
+            return text
+        
+        budget = budget or self.budget_for(agent_name)
+        original_tokens = self.count_tokens(text)
+        handoff = text if original_tokens <= budget else self._compress(text, budget)
+        handoff_tokens = self.count_tokens(handoff)
+        
+        entry = {
+            "agent": agent_name,
+            "budget": budget,
+            "original_tokens": original_tokens,
+            "handoff_tokens": handoff_tokens,
+            "saved_tokens": original_tokens - handoff_tokens,
+        }
+        with self._lock:
+            self.stats.append(entry)
+            self.totals['handoffs'] += 1
+            for field in ("original_tokens", "handoff_tokens", "saved_tokens"):
+                self.totals[field] += entry[field]
+        return handoff
+    
+    def _compress(self, text: str, budget: int) -> str:
+        """Keep the most recent code blocks and the key finding lines, drop the rest"""
+        code_blocks = CODE_BLOCK_PATTERN.findall(text)
+        prose = CODE_BLOCK_PATTERN.sub("\n", text)
+        
+        # Later code blocks are usually the final version, so keep those first
+        code_budget = int(budget * self.code_share)
+        kept_code = []
+        for block in reversed(code_blocks):
+            remaining = code_budget - sum(self.count_tokens(kept) for kept in kept_code)
+            if remaining <= 0:
+                break
+            kept_code.insert(0, block if self.count_tokens(block) <= remaining
+                             else self._truncate_middle(block, remaining))
+        
+        findings_budget = budget - sum(self.count_tokens(block) for block in kept_code)
+        findings = self._key_lines(prose, findings_budget)
+        
+        parts = []
+        if findings:
+            parts.append("Key findings:\n" + "\n".join(findings))
+        if kept_code:
+            parts.append("\n\n".join(kept_code))
+        
+        omitted = self.count_tokens(text) - sum(self.count_tokens(part) for part in parts)
+        parts.append(f"[... about {max(omitted, 0)} tokens of earlier output omitted ...]")
+        return "\n\n".join(parts)
+    
+    def _key_lines(self, prose: str, budget: int) -> List[str]:
+        """Lines that look like findings, in order, within the budget"""
+        lines = [line.rstrip() for line in prose.splitlines() if line.strip()]
+        key_lines = [line for line in lines if KEY_LINE_PATTERN.search(line)]
+        
+        # Fall back to the opening lines when nothing looks like a finding
+        candidates = key_lines or lines
+        kept = []
+        used = 0
+        seen = set()
+        for line in candidates:
+            cost = self.count_tokens(line) + 1
+            if used + cost > budget:
+                break
+            if line in seen:
+                continue
+            seen.add(line)
+            kept.append(line)
+            used += cost
+        return kept
+    
+    def _truncate_middle(self, block: str, budget: int) -> str:
+        """Keep the start and end of a code block that alone exceeds the budget"""
+        lines = block.splitlines()
+        head, tail = [], []
+        used = self.count_tokens("# ... truncated ...")
+        while lines:
+            line = lines.pop(0) if len(head) <= len(tail) else lines.pop()
+            cost = self.count_tokens(line) + 1
+            if used + cost > budget:
+                break
+            used += cost
+            if len(head) <= len(tail):
+                head.append(line)
+            else:
+                tail.insert(0, line)
+        return "\n".join(head + ["# ... truncated ..."] + tail)
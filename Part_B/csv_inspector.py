@@ -0,0 +1,313 @@
+"""
+CSV inspection
+Sniffs and validates large CSV files by reading bounded chunks, and picks how
+they should be loaded before any agent touches them
+"""
+
+import codecs
+import csv
+import io
+import os
+import re
+from typing import Any, Dict, List
+
+
+DELIMITERS = [",", ";", "\t", "|"]
+
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+_INT = re.compile(r"^[+-]?\d+$")
+_FLOAT = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$|^[+-]?(inf|nan)$", re.IGNORECASE)
+_BOOL = {"true", "false", "yes", "no"}
+_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?$")
+_MISSING = {"", "na", "n/a", "nan", "null", "none", "-"}
+
+# Bytes per value pandas needs in memory, by inferred column type
+_VALUE_BYTES = {"integer": 8, "float": 8, "boolean": 1, "datetime": 8, "empty": 8}
+
+
+def inspect_csv(path: str, chunk_bytes: int = 1024 * 1024, samples: int = 4, memory_budget_mb: float = 1024,
+                full_scan: bool = False) -> Dict[str, Any]:
+    """
+    Validate a CSV file and describe how to load it, in constant memory
+    
+    The encoding, delimiter, header and column types are detected from the
+    first chunk plus samples chunks spread evenly over the file, and the row
+    count is estimated from the average row size in those chunks. With
+    full_scan the whole file is streamed chunk by chunk, which also checks
+    every row's field count and gives the exact row count.
+    
+    Args:
+        path: The CSV file
+        chunk_bytes: Bytes read at a time; bounds the memory used
+        samples: Chunks read from the rest of the file besides the first
+        memory_budget_mb: Memory the loaded DataFrame may use before the
+            strategy switches to reading in chunks
+        full_scan: Read the whole file instead of samples
+    
+    Returns:
+        Report with 'valid', 'errors', 'warnings', 'encoding', 'delimiter',
+        'has_header', 'columns' (name, type, missing values in the sample),
+        'estimated_rows' and 'strategy' (mode, read_csv arguments, chunksize)
+    """
+    report = {
+        "path": path, "valid": False, "errors": [], "warnings": [],
+        "size_bytes": 0, "encoding": None, "delimiter": None, "has_header": None, "columns": [],
+        "sampled_rows": 0, "sampled_bytes": 0, "estimated_rows": 0, "exact_rows": None,
+        "inconsistent_rows": 0, "strategy": None,
+    }
+    if not os.path.isfile(path):
+        report['errors'].append("File does not exist")
+        return report
+    size = report['size_bytes'] = os.path.getsize(path)
+    if size == 0:
+        report['errors'].append("File is empty")
+        return report
+    
+    with open(path, 'rb') as f:
+        head = f.read(chunk_bytes)
+        encoding = _detect_encoding(head, at_eof=len(head) == size)
+        report['encoding'] = encoding
+        head_text = _complete_lines(_decode(head, encoding), at_eof=len(head) == size)
+        if not head_text.strip():
+            report['errors'].append(f"No complete line in the first {chunk_bytes} bytes")
+            return report
+        
+        delimiter, has_header = _sniff(head_text)
+        report['delimiter'], report['has_header'] = delimiter, has_header
+        head_rows = list(csv.reader(io.StringIO(head_text), delimiter=delimiter))
+        width = len(head_rows[0])
+        names = head_rows[0] if has_header else [f"column_{i}" for i in range(width)]
+        data_rows = head_rows[1:] if has_header else head_rows
+        header_bytes = len(head_text.split("\n", 1)[0].encode(encoding)) + 1 if has_header else 0
+        
+        # Rows sampled across the file; chunks start after the first line break
+        sample_rows, sample_bytes = list(data_rows), len(head_text.encode(encoding)) - header_bytes
+        if full_scan:
+            exact_rows, inconsistent = _scan(f, encoding, delimiter, width, chunk_bytes, report)
+            report['exact_rows'] = exact_rows - (1 if has_header else 0)
+            report['inconsistent_rows'] = inconsistent
+        elif size > chunk_bytes:
+            for i in range(1, samples + 1):
+                offset = int((size - chunk_bytes) * i / samples)
+                if encoding == "utf-16":
+                    offset -= offset % 2
+                if offset <= chunk_bytes:
+                    continue
+                f.seek(offset)
+                chunk = f.read(chunk_bytes)
+                text = _decode(chunk, encoding, report)
+                text = text.split("\n", 1)[1] if "\n" in text else ""
+                text = _complete_lines(text, at_eof=offset + len(chunk) >= size)
+                sample_rows.extend(csv.reader(io.StringIO(text), delimiter=delimiter))
+                sample_bytes += len(text.encode(encoding, errors='replace'))
+    
+    sample_rows = [row for row in sample_rows if row]
+    if not full_scan:
+        report['inconsistent_rows'] = sum(1 for row in sample_rows if len(row) != width)
+    report['sampled_rows'] = len(sample_rows)
+    report['sampled_bytes'] = sample_bytes
+    if report['exact_rows'] is not None:
+        report['estimated_rows'] = report['exact_rows']
+    elif sample_rows:
+        average = max(sample_bytes, 1) / len(sample_rows)
+        report['estimated_rows'] = max(int((size - header_bytes) / average), len(sample_rows))
+    
+    report['columns'] = _infer_columns(names, sample_rows)
+    if width < 2:
+        report['warnings'].append("Only one column found; the delimiter may not have been detected")
+    if report['inconsistent_rows']:
+        report['warnings'].append(f"{report['inconsistent_rows']} rows do not have {width} fields")
+    if has_header and len(set(names)) != len(names):
+        report['warnings'].append("Duplicate column names; pandas will rename them")
+    
+    report['strategy'] = loading_strategy(report, memory_budget_mb)
+    report['valid'] = not report['errors']
+    return report
+
+
+def loading_strategy(report: Dict[str, Any], memory_budget_mb: float = 1024) -> Dict[str, Any]:
+    """
+    How to read a file described by inspect_csv
+    
+    Returns:
+        Dict with 'mode' ("full" or "chunked"), 'read_csv_kwargs',
+        'chunksize' (rows per chunk, None for "full"), 'estimated_memory_mb'
+        and a one-line 'code' example
+    """
+    kwargs = {}
+    if report['delimiter'] and report['delimiter'] != ",":
+        kwargs['sep'] = report['delimiter']
+    if report['encoding'] and report['encoding'] not in ("utf-8", "ascii"):
+        kwargs['encoding'] = report['encoding']
+    if report['has_header'] is False:
+        kwargs['header'] = None
+    if report['inconsistent_rows']:
+        kwargs['on_bad_lines'] = "warn"
+    dates = [column['name'] for column in report['columns'] if column['type'] == "datetime"]
+    if dates and report['has_header']:
+        kwargs['parse_dates'] = dates
+    
+    # Strings take about their length plus ~50 bytes of Python object overhead
+    row_bytes = sum(_VALUE_BYTES.get(column['type'], 50 + column.get('average_length', 8))
+                    for column in report['columns'])
+    memory_mb = report['estimated_rows'] * row_bytes / 1024 ** 2
+    chunked = memory_mb > memory_budget_mb
+    chunksize = max(int(report['estimated_rows'] * memory_budget_mb / 4 / max(memory_mb, 1e-9)), 1000) \
+        if chunked else None
+    
+    arguments = "".join(f", {key}={value!r}" for key, value in kwargs.items())
+    if chunked:
+        code = f"for chunk in pd.read_csv({report['path']!r}{arguments}, chunksize={chunksize}): ..."
+    else:
+        code = f"df = pd.read_csv({report['path']!r}{arguments})"
+    return {"mode": "chunked" if chunked else "full", "read_csv_kwargs": kwargs, "chunksize": chunksize,
+            "estimated_memory_mb": round(memory_mb, 1), "code": code}
+
+
+def _detect_encoding(head: bytes, at_eof: bool) -> str:
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        # The chunk may end inside a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=at_eof)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        head.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def _decode(chunk: bytes, encoding: str, report: Dict[str, Any] = None) -> str:
+    """Decode a chunk that may start or end in the middle of a character"""
+    text = chunk.decode(encoding, errors='replace')
+    if report is not None and "�" in text.strip("�") and encoding != "latin-1":
+        warning = f"Bytes that are not valid {encoding} found after the first chunk"
+        if warning not in report['warnings']:
+            report['warnings'].append(warning)
+    return text.replace("\r\n", "\n")
+
+
+def _complete_lines(text: str, at_eof: bool) -> str:
+    """Drop the partial last line of a chunk"""
+    if at_eof or "\n" not in text:
+        return text if at_eof else ""
+    return text[:text.rindex("\n") + 1]
+
+
+def _sniff(text: str):
+    """(delimiter, has_header) of a sample"""
+    sniffer = csv.Sniffer()
+    lines = text.splitlines()[:200]
+    sample = "\n".join(lines)
+    
+    def score(candidate):
+        # Splits the header into several fields, most lines as wide as the header
+        widths = [len(row) for row in csv.reader(lines[:50], delimiter=candidate)]
+        return (widths[0] > 1, widths.count(widths[0]) / len(widths), widths[0]) if widths else (False, 0, 0)
+    
+    try:
+        delimiter = sniffer.sniff(sample, delimiters="".join(DELIMITERS)).delimiter
+    except csv.Error:
+        delimiter = None
+    if delimiter is None or score(delimiter) < max(score(candidate) for candidate in DELIMITERS):
+        delimiter = max(DELIMITERS, key=score)
+    try:
+        has_header = sniffer.has_header(sample)
+    except csv.Error:
+        has_header = True
+    return delimiter, has_header
+
+
+def _scan(f, encoding: str, delimiter: str, width: int, chunk_bytes: int, report: Dict[str, Any]):
+    """Count rows and rows with the wrong field count, one chunk at a time"""
+    f.seek(0)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    reader_input = _ChunkLines(f, decoder, chunk_bytes, report, encoding)
+    rows = inconsistent = 0
+    try:
+        for row in csv.reader(reader_input, delimiter=delimiter):
+            if not row:
+                continue
+            rows += 1
+            if len(row) != width:
+                inconsistent += 1
+    except csv.Error as e:
+        report['errors'].append(f"Malformed CSV near row {rows + 1}: {e}")
+    return rows, inconsistent
+
+
+class _ChunkLines:
+    """Lines of a binary file decoded chunk by chunk, for csv.reader"""
+    
+    def __init__(self, f, decoder, chunk_bytes: int, report: Dict[str, Any], encoding: str):
+        self.f = f
+        self.decoder = decoder
+        self.chunk_bytes = chunk_bytes
+        self.report = report
+        self.encoding = encoding
+        self.buffer = ""
+    
+    def __iter__(self):
+        while True:
+            chunk = self.f.read(self.chunk_bytes)
+            text = self.decoder.decode(chunk, final=not chunk)
+            if "�" in text and self.encoding != "latin-1":
+                warning = f"Bytes that are not valid {self.encoding} found"
+                if warning not in self.report['warnings']:
+                    self.report['warnings'].append(warning)
+            lines = (self.buffer + text).split("\n")
+            self.buffer = lines.pop()
+            for line in lines:
+                yield line + "\n"
+            if not chunk:
+                break
+        if self.buffer:
+            yield self.buffer
+
+
+def _infer_columns(names: List[str], rows: List[List[str]]) -> List[Dict[str, Any]]:
+    """Most specific type every sampled value of a column fits"""
+    columns = []
+    for i, name in enumerate(names):
+        values = [row[i].strip() for row in rows if i < len(row)]
+        present = [value for value in values if value.lower() not in _MISSING]
+        column = {"name": name, "type": _infer_type(present), "missing_in_sample": len(values) - len(present)}
+        if column['type'] == "string":
+            column['average_length'] = round(sum(map(len, present)) / len(present), 1)
+        columns.append(column)
+    return columns
+
+
+def _infer_type(values: List[str]) -> str:
+    if not values:
+        return "empty"
+    for name, matches in (("integer", _INT.match), ("float", _FLOAT.match), ("datetime", _DATETIME.match)):
+        if all(matches(value) for value in values):
+            return name
+    if all(value.lower() in _BOOL for value in values):
+        return "boolean"
+    return "string"
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """One-paragraph summary of a report"""
+    if not report['valid']:
+        return f"Invalid CSV {report['path']}: " + "; ".join(report['errors'])
+    rows = report['exact_rows'] if report['exact_rows'] is not None else f"~{report['estimated_rows']}"
+    lines = [
+        f"{report['path']}: {rows} rows x {len(report['columns'])} columns, "
+        f"{report['size_bytes'] / 1024 ** 2:.1f} MB, encoding {report['encoding']}, "
+        f"delimiter {report['delimiter']!r}, {'header' if report['has_header'] else 'no header'}",
+        f"Load with: {report['strategy']['code']}",
+    ]
+    lines.extend(f"Warning: {warning}" for warning in report['warnings'])
+    return "\n".join(lines)
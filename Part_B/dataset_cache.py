@@ -0,0 +1,241 @@
+"""
+Memory-mapped dataset cache
+Stores each loaded dataset once as .npy files that every process maps read-only,
+so code workers, the UI and batch jobs share one copy through the OS page cache
+"""
+
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dataset_fingerprint import dataset_fingerprint
+from single_flight import SingleFlight
+
+
+_META_FILE = "meta.json"
+_OBJECTS_FILE = "objects.pkl"
+
+# Array kinds np.load can map: bool, integers, floats, complex, datetimes
+_MAPPABLE_KINDS = "biufcmM"
+
+
+class MappedDatasetCache:
+    """
+    Datasets on disk as memory-mapped arrays, evicted by total size
+    
+    An entry is a directory with one .npy file per array (or DataFrame column)
+    and a small meta.json. Every lookup maps the files copy-on-write, so the
+    pages are read once, shared by every process through the page cache and
+    only copied when a caller writes to them; the file itself never changes.
+    Columns numpy cannot map (text, categoricals) are pickled and loaded on
+    each lookup.
+    
+    Entries are written to a temporary directory and renamed into place, so
+    processes building the same dataset never see a partial entry; within a
+    process concurrent misses on one key share a single build, and lookups of
+    other keys never wait for it. An entry that cannot be opened (evicted by
+    another process, or damaged) is built again. The least
+    recently opened entries are removed once the cache exceeds max_bytes;
+    processes that already mapped them keep working on their mapping.
+    """
+    
+    def __init__(self, directory: str = "./cache/datasets", max_bytes: Optional[int] = 2048 * 1024 * 1024,
+                 enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled and bool(directory)
+        self._lock = threading.Lock()
+        self._builds = SingleFlight()
+        
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "MappedDatasetCache":
+        """Build a cache from the 'dataset_cache' section of config.yaml"""
+        config = config or {}
+        max_mb = config.get('max_mb', 2048)
+        return cls(
+            directory=config.get('directory', "./cache/datasets"),
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+            enabled=config.get('enabled', True),
+        )
+    
+    def arrays(self, key: str, build: Callable[[], Tuple[Dict[str, Any], Dict[str, Any]]]
+               ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Named arrays of an entry, building and storing it on a miss
+        
+        Args:
+            key: Entry name; letters, digits, '-', '_' and '.'
+            build: Returns (arrays, meta) for a new entry; arrays numpy cannot
+                map are pickled, meta must be JSON serializable
+        
+        Returns:
+            (arrays, meta); the arrays are copy-on-write memory maps
+        """
+        if not self.enabled:
+            return build()
+        
+        path = os.path.join(self.directory, key)
+        for _ in range(2):
+            if not os.path.isdir(path):
+                self._builds.do(key, lambda: self._store(key, *build()))
+            self._touch(path)
+            try:
+                return self._open(path)
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+                # Evicted while opening, or damaged; a damaged entry is replaced
+                shutil.rmtree(path, ignore_errors=True)
+        return build()
+    
+    def read_csv(self, path: str, read: Callable[[str], Any] = None) -> Any:
+        """
+        pd.read_csv(path) with the columns mapped from the cache
+        
+        The entry is keyed by the file's fingerprint, so editing the file
+        reads it again. read replaces pd.read_csv for the first load.
+        """
+        import pandas as pd
+        read = read or pd.read_csv
+        if not self.enabled:
+            return read(path)
+        # Keyed by content, so copies of a file share one entry
+        key = _safe_key(f"csv-{os.path.splitext(os.path.basename(path))[0][:40]}-{dataset_fingerprint(path)}")
+        
+        def build():
+            frame = read(path)
+            columns = [str(column) for column in frame.columns]
+            if columns != list(frame.columns) or len(set(columns)) != len(columns):
+                raise ValueError("Only frames with unique string column names can be cached")
+            return {f"c{i}": frame.iloc[:, i] for i in range(len(columns))}, {"columns": columns}
+        
+        try:
+            columns, meta = self.arrays(key, build)
+        except ValueError:
+            return read(path)
+        return pd.DataFrame({name: columns[f"c{i}"] for i, name in enumerate(meta['columns'])}, copy=False)
+    
+    def entries(self) -> List[Dict[str, Any]]:
+        """Cached entries with their size and last use, most recently used first"""
+        if not self.enabled:
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            meta_path = os.path.join(self.directory, name, _META_FILE)
+            if name.startswith(".") or not os.path.isfile(meta_path):
+                continue
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                entries.append({"key": name, "bytes": meta.get('bytes', 0), "last_used": os.path.getmtime(meta_path)})
+            except (OSError, ValueError):
+                continue
+        return sorted(entries, key=lambda entry: entry['last_used'], reverse=True)
+    
+    def total_bytes(self) -> int:
+        return sum(entry['bytes'] for entry in self.entries())
+    
+    def evict(self, keep: str = None) -> List[str]:
+        """Remove least recently used entries until the cache fits max_bytes; returns their keys"""
+        if not self.enabled or not self.max_bytes:
+            return []
+        entries = self.entries()
+        total = sum(entry['bytes'] for entry in entries)
+        evicted = []
+        for entry in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if entry['key'] == keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, entry['key']), ignore_errors=True)
+            total -= entry['bytes']
+            evicted.append(entry['key'])
+        return evicted
+    
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            if self.enabled:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                os.makedirs(self.directory, exist_ok=True)
+    
+    def _store(self, key: str, arrays: Dict[str, Any], meta: Dict[str, Any]):
+        """Write an entry next to the cache and rename it into place"""
+        tmp_path = os.path.join(self.directory, f".{key}.{os.getpid()}.{uuid.uuid4().hex[:8]}")
+        os.makedirs(tmp_path)
+        try:
+            mapped, objects = [], {}
+            for name, array in arrays.items():
+                dtype = getattr(array, 'dtype', None)
+                if isinstance(dtype, np.dtype) and dtype.kind in _MAPPABLE_KINDS:
+                    np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(array), allow_pickle=False)
+                    mapped.append(name)
+                else:
+                    objects[name] = array
+            if objects:
+                with open(os.path.join(tmp_path, _OBJECTS_FILE), 'wb') as f:
+                    pickle.dump(objects, f, protocol=pickle.HIGHEST_PROTOCOL)
+            
+            size = sum(os.path.getsize(os.path.join(tmp_path, file)) for file in os.listdir(tmp_path))
+            with open(os.path.join(tmp_path, _META_FILE), 'w') as f:
+                json.dump({"meta": meta, "mapped": mapped, "order": list(arrays), "bytes": size,
+                           "created": time.time()}, f, default=str)
+            try:
+                os.rename(tmp_path, os.path.join(self.directory, key))
+            except OSError:
+                # Another process stored it first
+                pass
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict(keep=key)
+    
+    def _open(self, path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        with open(os.path.join(path, _META_FILE), 'r') as f:
+            entry = json.load(f)
+        objects = {}
+        if len(entry['mapped']) < len(entry['order']):
+            with open(os.path.join(path, _OBJECTS_FILE), 'rb') as f:
+                objects = pickle.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='c') if name in entry['mapped']
+                  else objects[name] for name in entry['order']}
+        return arrays, entry['meta']
+    
+    @staticmethod
+    def _touch(path: str):
+        """Record a use for least-recently-used eviction, visible to every process"""
+        try:
+            os.utime(os.path.join(path, _META_FILE))
+        except OSError:
+            pass
+
+
+def _safe_key(key: str) -> str:
+    return "".join(char if char.isalnum() or char in "-_." else "_" for char in key)
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_dataset_cache(config: Dict[str, Any] = None) -> MappedDatasetCache:
+    """
+    Return the process-wide dataset cache, creating it on first use
+    
+    Without a config the 'dataset_cache' section of the default config.yaml is used.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            if config is None:
+                from utils import load_config
+                config = load_config().get('dataset_cache')
+            _shared_cache = MappedDatasetCache.from_config(config)
+        return _shared_cache
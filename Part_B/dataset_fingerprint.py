@@ -0,0 +1,262 @@
+"""
+Dataset fingerprints
+Identify the content of a dataset so cached work is reused only while it is unchanged
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# Datasets bundled with (or downloaded by) sklearn, named instead of given as a path
+SKLEARN_DATASETS = ("iris", "wine", "breast_cancer", "boston", "digits", "diabetes", "california_housing")
+
+HASH_NAME = "xxh3" if xxhash is not None else "blake2b"
+
+
+def _new_hash():
+    """xxHash3 (128 bit) when installed, otherwise BLAKE2b with a 128-bit digest"""
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+class DatasetFingerprinter:
+    """
+    Content fingerprints of dataset files, directories and sklearn dataset names
+    
+    Files are hashed through a memory map, chunk_bytes at a time. The hash is
+    remembered in an index keyed by path, size and modification time, so an
+    unchanged file is never read twice, even across runs, while a file that
+    was only touched or copied keeps its fingerprint. The index is a JSON
+    lines file that every process appends one line to per new fingerprint
+    and rereads from where it stopped; it is rewritten without superseded
+    lines once it holds twice max_index_entries.
+    
+    Files larger than sample_above_bytes are fingerprinted from sample_chunks
+    chunks spread evenly over the file plus its size. That is much faster
+    for huge files but can miss an edit that keeps the size and falls
+    between the samples.
+    """
+    
+    def __init__(self, index_path: Optional[str] = "./cache/fingerprints.jsonl", chunk_bytes: int = 8 * 1024 * 1024,
+                 sample_above_bytes: Optional[int] = 2048 * 1024 * 1024, sample_chunks: int = 16,
+                 max_index_entries: int = 10000):
+        self.index_path = index_path
+        self.chunk_bytes = max(chunk_bytes, 4096)
+        self.sample_above_bytes = sample_above_bytes
+        self.sample_chunks = max(sample_chunks, 2)
+        self.max_index_entries = max_index_entries
+        self._index = None
+        # Where reading the index file stopped, and which file that was
+        self._offset = 0
+        self._lines = 0
+        self._file_id = None
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DatasetFingerprinter":
+        """Build a fingerprinter from the 'fingerprint' section of config.yaml"""
+        config = config or {}
+        sample_above_mb = config.get('sample_above_mb', 2048)
+        return cls(
+            index_path=config.get('index_path', "./cache/fingerprints.jsonl"),
+            chunk_bytes=int(config.get('chunk_mb', 8) * 1024 * 1024),
+            sample_above_bytes=int(sample_above_mb * 1024 * 1024) if sample_above_mb else None,
+            sample_chunks=config.get('sample_chunks', 16),
+        )
+    
+    def fingerprint(self, dataset_path: Optional[str], sampled: bool = None) -> Optional[str]:
+        """
+        Fingerprint of a dataset file, directory or sklearn dataset name
+        
+        Args:
+            dataset_path: The dataset
+            sampled: Force (True) or prevent (False) sampling; by default
+                only files above sample_above_bytes are sampled
+        
+        Returns:
+            "<hash>:<hex>" for a file ("<hash>-sampled:<hex>" when sampled,
+            "<hash>-dir:<hex>" for a directory), "sklearn:<name>:<version>",
+            "missing:<path>", or None without a dataset_path
+        """
+        if not dataset_path:
+            return None
+        
+        name = dataset_path.lower()
+        if name.startswith("sklearn:"):
+            name = name.split(":", 1)[1]
+        if name in SKLEARN_DATASETS and not os.path.exists(dataset_path):
+            # Bundled datasets only change with the sklearn release
+            return f"sklearn:{name}:{_sklearn_version()}"
+        
+        path = os.path.abspath(dataset_path)
+        if not os.path.exists(path):
+            return f"missing:{path}"
+        if not os.path.isdir(path):
+            return self.file_fingerprint(path, sampled)
+        
+        digest = _new_hash()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                digest.update(f"{os.path.relpath(file_path, path)}\0{self.file_fingerprint(file_path, sampled)}\n"
+                              .encode('utf-8'))
+        return f"{HASH_NAME}-dir:{digest.hexdigest()}"
+    
+    def file_fingerprint(self, path: str, sampled: bool = None) -> str:
+        """Content fingerprint of one file, from the index while its size and mtime are unchanged"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        if sampled is None:
+            sampled = bool(self.sample_above_bytes) and stat.st_size > self.sample_above_bytes
+        
+        entry = [stat.st_size, stat.st_mtime_ns, sampled, HASH_NAME]
+        with self._lock:
+            known = self._load_index().get(path)
+            if not (known and known[:4] == entry):
+                # Another process may have hashed it since
+                self._read_appended()
+                known = self._index.get(path)
+        if known and known[:4] == entry:
+            return known[4]
+        
+        fingerprint = self._hash_file(path, stat.st_size, sampled)
+        self._remember(path, entry + [fingerprint])
+        return fingerprint
+    
+    def _hash_file(self, path: str, size: int, sampled: bool) -> str:
+        digest = _new_hash()
+        if size == 0:
+            return f"{HASH_NAME}:{digest.hexdigest()}"
+        
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                if sampled and size > self.chunk_bytes * self.sample_chunks:
+                    digest.update(str(size).encode('utf-8'))
+                    # First and last chunk included, the rest evenly in between
+                    step = (size - self.chunk_bytes) / (self.sample_chunks - 1)
+                    for i in range(self.sample_chunks):
+                        start = int(i * step)
+                        digest.update(view[start:start + self.chunk_bytes])
+                    return f"{HASH_NAME}-sampled:{digest.hexdigest()}"
+                
+                for start in range(0, size, self.chunk_bytes):
+                    digest.update(view[start:start + self.chunk_bytes])
+            finally:
+                view.release()
+        return f"{HASH_NAME}:{digest.hexdigest()}"
+    
+    def _load_index(self) -> Dict[str, list]:
+        """The path -> [size, mtime_ns, sampled, hash name, fingerprint] index (lock held)"""
+        if self._index is None:
+            self._index = {}
+            self._read_appended()
+        return self._index
+    
+    def _read_appended(self):
+        """Add the index lines written since the last read, by any process (lock held)"""
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if (stat.st_dev, stat.st_ino) != self._file_id or stat.st_size < self._offset:
+                    # New or rewritten file
+                    self._file_id, self._offset, self._lines = (stat.st_dev, stat.st_ino), 0, 0
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return
+        
+        # A line still being appended is read next time
+        complete = data[:data.rfind(b"\n") + 1]
+        self._offset += len(complete)
+        for line in complete.splitlines():
+            try:
+                path, *entry = json.loads(line)
+            except (ValueError, TypeError):
+                continue
+            self._lines += 1
+            self._index.pop(path, None)
+            self._index[path] = entry
+        self._trim()
+    
+    def _remember(self, path: str, entry: list):
+        """Add a fingerprint to the index and append it to the index file"""
+        with self._lock:
+            index = self._load_index()
+            index.pop(path, None)
+            index[path] = entry
+            self._trim()
+            if not self.index_path:
+                return
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+                if self._lines >= 2 * self.max_index_entries:
+                    self._compact()
+                else:
+                    with open(self.index_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps([path] + entry) + "\n")
+            except OSError as e:
+                print(f"Warning: could not save the fingerprint index: {e}")
+    
+    def _compact(self):
+        """Rewrite the index file with one line per remembered path (lock held)"""
+        # Lines other processes append meanwhile are lost; they only cost a rehash
+        self._read_appended()
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, value in self._index.items():
+                f.write(json.dumps([key] + value) + "\n")
+            f.flush()
+            stat = os.fstat(f.fileno())
+        os.replace(tmp_path, self.index_path)
+        self._file_id, self._offset, self._lines = (stat.st_dev, stat.st_ino), stat.st_size, len(self._index)
+    
+    def _trim(self):
+        while len(self._index) > self.max_index_entries:
+            self._index.pop(next(iter(self._index)))
+
+
+def _sklearn_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("scikit-learn")
+    except Exception:
+        return "unknown"
+
+
+_shared_fingerprinter = None
+_shared_fingerprinter_lock = threading.Lock()
+
+
+def get_fingerprinter(config: Dict[str, Any] = None) -> DatasetFingerprinter:
+    """
+    Return the process-wide fingerprinter, creating it on first use
+    
+    Without a config the 'fingerprint' section of the default config.yaml is used.
+    """
+    global _shared_fingerprinter
+    with _shared_fingerprinter_lock:
+        if _shared_fingerprinter is None:
+            if config is None:
+                from utils import load_config
+                config = load_config().get('fingerprint')
+            _shared_fingerprinter = DatasetFingerprinter.from_config(config)
+        return _shared_fingerprinter
+
+
+def dataset_fingerprint(dataset_path: Optional[str], sampled: bool = None) -> Optional[str]:
+    """Fingerprint of a dataset with the process-wide fingerprinter; see DatasetFingerprinter.fingerprint"""
+    return get_fingerprinter().fingerprint(dataset_path, sampled)
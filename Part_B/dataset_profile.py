@@ -0,0 +1,239 @@
+"""
+Dataset profiles
+Computes a compact profile of a pipeline's dataset once per dataset version and
+formats it for the first stages, so agents do not spend round-trips on basic EDA
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from csv_inspector import format_report, inspect_csv
+from dataset_cache import get_dataset_cache
+from dataset_fingerprint import DatasetFingerprinter, get_fingerprinter
+from llm_cache import ResponseCache
+from utils import DatasetLoader
+
+
+def profile_frame(frame: Any, top_correlations: int = 10, top_values: int = 5) -> Dict[str, Any]:
+    """
+    Profile a DataFrame with column-wise vectorized NumPy/pandas operations
+    
+    Args:
+        frame: The dataset
+        top_correlations: Number of most correlated numeric column pairs to keep
+        top_values: Most frequent values kept for each non-numeric column
+    
+    Returns:
+        JSON-serializable dict with the shape, per-column types, missing and
+        unique counts, numeric summaries and the strongest correlations
+    """
+    rows = len(frame)
+    missing = frame.isna().sum().to_numpy()
+    unique = frame.nunique(dropna=True).to_numpy()
+    columns = [
+        {"name": str(name), "dtype": str(dtype), "missing": int(missing[i]), "unique": int(unique[i])}
+        for i, (name, dtype) in enumerate(frame.dtypes.items())
+    ]
+    
+    numeric = frame.select_dtypes(include="number")
+    numeric_stats = {}
+    correlations = []
+    if numeric.shape[1]:
+        values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        # One pass over the matrix per statistic, for every column at once
+        with np.errstate(all="ignore"):
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0)
+            q = np.nanpercentile(values, [0, 25, 50, 75, 100], axis=0)
+            centered = (values - mean) / np.where(std > 0, std, np.nan)
+            skew = np.nanmean(centered ** 3, axis=0)
+            iqr = q[3] - q[1]
+            outliers = ((values < q[1] - 1.5 * iqr) | (values > q[3] + 1.5 * iqr)).sum(axis=0)
+            zeros = (values == 0).sum(axis=0)
+        for i, name in enumerate(numeric.columns):
+            numeric_stats[str(name)] = {
+                "mean": _number(mean[i]), "std": _number(std[i]),
+                "min": _number(q[0][i]), "p25": _number(q[1][i]), "median": _number(q[2][i]),
+                "p75": _number(q[3][i]), "max": _number(q[4][i]),
+                "skew": _number(skew[i]), "outliers": int(outliers[i]), "zeros": int(zeros[i]),
+            }
+        
+        if numeric.shape[1] > 1:
+            with np.errstate(all="ignore"):
+                matrix = numeric.corr().to_numpy()
+            upper = np.triu_indices_from(matrix, k=1)
+            strength = np.nan_to_num(np.abs(matrix[upper]), nan=-1.0)
+            for index in np.argsort(-strength)[:top_correlations]:
+                if strength[index] < 0:
+                    break
+                first, second = upper[0][index], upper[1][index]
+                correlations.append({"columns": [str(numeric.columns[first]), str(numeric.columns[second])],
+                                     "r": _number(matrix[first, second])})
+    
+    categorical = {}
+    for name in frame.columns.difference(numeric.columns, sort=False):
+        counts = frame[name].value_counts(dropna=True)
+        # Identifiers and timestamps have no frequent values worth listing
+        if len(counts) and counts.iloc[0] == 1:
+            continue
+        counts = counts.head(top_values)
+        categorical[str(name)] = {str(value): int(count) for value, count in counts.items()}
+    
+    return {
+        "rows": rows,
+        "columns": len(columns),
+        "memory_bytes": int(frame.memory_usage(deep=False).sum()),
+        "duplicate_rows": int(frame.duplicated().sum()) if rows else 0,
+        "column_info": columns,
+        "numeric": numeric_stats,
+        "categorical": categorical,
+        "correlations": correlations,
+    }
+
+
+def format_profile(profile: Dict[str, Any], max_columns: int = 40) -> str:
+    """Compact text version of a profile for an agent's prompt"""
+    lines = [profile['csv']] if profile.get('csv') else []
+    lines += [
+        f"Shape: {profile['rows']} rows x {profile['columns']} columns, "
+        f"{profile['duplicate_rows']} duplicate rows, {profile['memory_bytes'] / 1024 ** 2:.1f} MB in memory",
+        "Columns (dtype, missing, unique; numeric: mean, std, min/median/max, skew, IQR outliers):",
+    ]
+    if profile.get('profiled_rows'):
+        lines[-2] += f" (statistics from the first {profile['profiled_rows']} rows)"
+    for column in profile['column_info'][:max_columns]:
+        name = column['name']
+        line = f"- {name}: {column['dtype']}, {column['missing']} missing, {column['unique']} unique"
+        stats = profile['numeric'].get(name)
+        if stats:
+            line += (f"; mean {_fmt(stats['mean'])}, std {_fmt(stats['std'])}, "
+                     f"{_fmt(stats['min'])}/{_fmt(stats['median'])}/{_fmt(stats['max'])}, "
+                     f"skew {_fmt(stats['skew'])}, {stats['outliers']} outliers")
+        elif name in profile['categorical']:
+            top = ", ".join(f"{value} ({count})" for value, count in profile['categorical'][name].items())
+            line += f"; top: {top}"
+        lines.append(line)
+    if profile['columns'] > max_columns:
+        lines.append(f"- ... {profile['columns'] - max_columns} more columns")
+    if profile['correlations']:
+        pairs = ", ".join(f"{first}~{second} {_fmt(item['r'])}" for item in profile['correlations']
+                          for first, second in [item['columns']])
+        lines.append(f"Strongest correlations: {pairs}")
+    return "\n".join(lines)
+
+
+class DatasetProfiler:
+    """
+    Profiles of pipeline datasets, cached by dataset fingerprint
+    
+    A dataset is profiled the first time a pipeline uses it and again only
+    when its fingerprint changes. CSV files and sklearn dataset names are
+    supported; datasets that cannot be read get no profile.
+    """
+    
+    def __init__(self, cache: ResponseCache = None, enabled: bool = True, max_columns: int = 40,
+                 top_correlations: int = 10, csv_inspection: Dict[str, Any] = None,
+                 fingerprinter: DatasetFingerprinter = None):
+        self.cache = cache if cache is not None else ResponseCache(directory=None)
+        # Keys the cache; the process-wide fingerprinter when not given
+        self.fingerprinter = fingerprinter
+        self.enabled = enabled
+        self.max_columns = max_columns
+        self.top_correlations = top_correlations
+        # inspect_csv arguments from the 'csv_inspection' section
+        self.csv_inspection = csv_inspection or {}
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], csv_config: Dict[str, Any] = None,
+                    fingerprinter: DatasetFingerprinter = None) -> "DatasetProfiler":
+        """Build a profiler from the 'dataset_profile' and 'csv_inspection' sections of config.yaml"""
+        config = config or {}
+        csv_config = csv_config or {}
+        return cls(
+            cache=ResponseCache(max_entries=config.get('memory_entries', 32),
+                                directory=config.get('directory', "./cache/profiles"),
+                                enabled=config.get('enabled', True)),
+            enabled=config.get('enabled', True),
+            max_columns=config.get('max_columns', 40),
+            top_correlations=config.get('top_correlations', 10),
+            csv_inspection={
+                'chunk_bytes': int(csv_config.get('chunk_kb', 1024) * 1024),
+                'samples': csv_config.get('samples', 4),
+                'memory_budget_mb': csv_config.get('memory_budget_mb', 1024),
+            },
+            fingerprinter=fingerprinter,
+        )
+    
+    def profile(self, dataset_path: str) -> Optional[Dict[str, Any]]:
+        """The dataset's profile, computed on the first request for its current version"""
+        if not self.enabled:
+            return None
+        try:
+            fingerprint = (self.fingerprinter or get_fingerprinter()).fingerprint(dataset_path)
+        except OSError as e:
+            print(f"Warning: could not fingerprint {dataset_path}: {e}")
+            return None
+        if fingerprint is None or fingerprint.startswith("missing:"):
+            return None
+        key = hashlib.sha256(f"{fingerprint}\0{self.top_correlations}".encode('utf-8')).hexdigest()
+        profile = self.cache.get(key)
+        if profile is None:
+            frame, report = self._load(dataset_path)
+            if frame is None:
+                return None
+            try:
+                profile = profile_frame(frame, self.top_correlations)
+            except Exception as e:
+                # A pipeline runs without a profile rather than failing on one
+                print(f"Warning: could not profile {dataset_path}: {type(e).__name__}: {e}")
+                return None
+            if report is not None:
+                profile['csv'] = format_report(report)
+                if report['strategy']['mode'] == "chunked":
+                    # Only the first chunk was profiled
+                    profile.update(profiled_rows=profile['rows'], rows=report['estimated_rows'])
+            self.cache.set(key, profile)
+        return profile
+    
+    def describe(self, dataset_path: str) -> Optional[str]:
+        """The profile formatted for a prompt, or None without one"""
+        profile = self.profile(dataset_path)
+        return format_profile(profile, self.max_columns) if profile else None
+    
+    def _load(self, dataset_path: str):
+        """(frame, CSV report); CSV files are inspected first and read the way the report suggests"""
+        name = dataset_path.lower().split(":", 1)[-1]
+        try:
+            if not os.path.exists(dataset_path):
+                return DatasetLoader.load_sklearn_frame(name), None
+            if not os.path.isfile(dataset_path) or not dataset_path.lower().endswith(".csv"):
+                return None, None
+            
+            report = inspect_csv(dataset_path, **self.csv_inspection)
+            if not report['valid']:
+                print(f"Warning: {format_report(report)}")
+                return None, report
+            strategy = report['strategy']
+            if strategy['mode'] == "chunked":
+                import pandas as pd
+                return pd.read_csv(dataset_path, nrows=strategy['chunksize'], **strategy['read_csv_kwargs']), report
+            if strategy['read_csv_kwargs']:
+                import pandas as pd
+                return pd.read_csv(dataset_path, **strategy['read_csv_kwargs']), report
+            return get_dataset_cache().read_csv(dataset_path), report
+        except Exception as e:
+            print(f"Warning: could not profile {dataset_path}: {type(e).__name__}: {e}")
+        return None, None
+
+
+def _number(value: Any) -> Optional[float]:
+    """A JSON-safe float, None for NaN or infinity"""
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:.4g}"
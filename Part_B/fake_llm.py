@@ -0,0 +1,183 @@
+"""
+Deterministic fake model backend
+A local stand-in for Ollama, selected with a "fake/..." model name, that
+returns scripted or templated responses with simulated latency
+"""
+
+import asyncio
+import re
+import threading
+import time
+from typing import Any, AsyncGenerator, Dict, List
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+from pydantic import PrivateAttr
+
+
+FAKE_MODEL_PREFIX = "fake/"
+
+DEFAULT_TEMPLATE = """{persona} (simulated) response.
+
+Key findings:
+- Request summary: {summary}
+- Prompt size: {prompt_tokens} tokens
+
+```python
+import pandas as pd
+print("simulated step")
+```
+{padding}"""
+
+# Planning prompts get a valid plan so unsequenced pipelines run end to end
+DEFAULT_RESPONSES = [
+    {
+        "match": r"Respond with only a JSON object",
+        "response": '{"stages": [{"agent": "data_analyst", "depends_on": []}, '
+                    '{"agent": "visualization_specialist", "depends_on": ["data_analyst"]}, '
+                    '{"agent": "ml_engineer", "depends_on": ["data_analyst"]}]}',
+    },
+]
+
+
+def is_fake_model(model_name: str) -> bool:
+    """True when a model name selects the fake backend"""
+    return bool(model_name) and model_name.startswith(FAKE_MODEL_PREFIX)
+
+
+class FakeLlm(BaseLlm):
+    """
+    Simulated model with configurable time to first token, generation speed
+    and number of concurrent requests, like a model server with N slots
+    
+    The first failures calls raise ConnectionError after streaming
+    fail_after_tokens tokens, to exercise retries of interrupted streams.
+    """
+    
+    model: str = "fake/default"
+    responses: List[Dict[str, str]] = DEFAULT_RESPONSES
+    template: str = DEFAULT_TEMPLATE
+    time_to_first_token: float = 0.05
+    tokens_per_second: float = 200.0
+    response_tokens: int = 120
+    max_concurrency: int = 4
+    failures: int = 0
+    fail_after_tokens: int = 0
+    
+    _failed: int = PrivateAttr(default=0)
+    _failed_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    
+    @classmethod
+    def supported_models(cls) -> List[str]:
+        return [r"fake/.*"]
+    
+    @classmethod
+    def from_config(cls, model_name: str, config: Dict[str, Any] = None) -> "FakeLlm":
+        """Build a fake model from the 'fake_backend' section of config.yaml"""
+        config = config or {}
+        fields = {name: config[name] for name in (
+            'template', 'time_to_first_token', 'tokens_per_second', 'response_tokens', 'max_concurrency',
+            'failures', 'fail_after_tokens',
+        ) if name in config}
+        responses = list(config.get('responses') or []) + DEFAULT_RESPONSES
+        return cls(model=model_name, responses=responses, **fields)
+    
+    def respond(self, prompt: str, system_instruction: str = "") -> str:
+        """The deterministic response for a prompt"""
+        for rule in self.responses:
+            if re.search(rule['match'], prompt, re.S):
+                return rule['response']
+        
+        persona = (system_instruction or "Assistant").strip().split('.')[0].replace("You are ", "")
+        fields = {
+            "persona": persona,
+            "summary": " ".join(prompt.split())[:120],
+            "prompt_tokens": len(prompt.split()),
+        }
+        
+        # Pad with filler words up to response_tokens (one word ~ one token)
+        base_words = len(self.template.format(padding="", **fields).split())
+        padding = " ".join(f"detail{i % 10}" for i in range(max(self.response_tokens - base_words, 0)))
+        return self.template.format(padding=padding, **fields)
+    
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        prompt = self._prompt_text(llm_request)
+        system_instruction = ""
+        if llm_request.config is not None and llm_request.config.system_instruction:
+            system_instruction = str(llm_request.config.system_instruction)
+        
+        text = self.respond(prompt, system_instruction)
+        words = re.findall(r"\S+\s*", text) or [text]
+        with self._failed_lock:
+            fail = self._failed < self.failures
+            if fail:
+                self._failed += 1
+        
+        await self._acquire_slot()
+        decode_started = None
+        try:
+            await asyncio.sleep(self.time_to_first_token)
+            delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+            decode_started = time.perf_counter()
+            if stream:
+                for i, word in enumerate(words):
+                    if fail and i == self.fail_after_tokens:
+                        break
+                    await asyncio.sleep(delay)
+                    yield LlmResponse(content=types.Content(role='model', parts=[types.Part(text=word)]),
+                                      partial=True)
+            else:
+                await asyncio.sleep(delay * len(words))
+        finally:
+            self._release_slot()
+        if fail:
+            raise ConnectionError(f"Simulated failure of {self.model}")
+        
+        yield LlmResponse(
+            content=types.Content(role='model', parts=[types.Part(text=text)]),
+            partial=False,
+            turn_complete=True,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=len(prompt.split()) + len(system_instruction.split()),
+                candidates_token_count=len(words),
+                total_token_count=len(prompt.split()) + len(system_instruction.split()) + len(words),
+            ),
+            # Generation time in nanoseconds, reported like Ollama's eval_duration
+            custom_metadata={"eval_duration": int((time.perf_counter() - decode_started) * 1e9)},
+        )
+    
+    @staticmethod
+    def _prompt_text(llm_request: LlmRequest) -> str:
+        """Text of the latest user message"""
+        for content in reversed(llm_request.contents or []):
+            if content.role == 'user' and content.parts:
+                return "".join(part.text or "" for part in content.parts)
+        return ""
+    
+    async def _acquire_slot(self):
+        """Wait for a free slot; works across threads and event loops"""
+        while not _slots(self.model, self.max_concurrency).acquire(blocking=False):
+            await asyncio.sleep(0.001)
+    
+    def _release_slot(self):
+        _slots(self.model, self.max_concurrency).release()
+
+
+_slot_semaphores = {}
+_slot_lock = threading.Lock()
+
+
+def _slots(model_name: str, max_concurrency: int) -> threading.BoundedSemaphore:
+    """Process-wide request slots for a fake model"""
+    with _slot_lock:
+        key = (model_name, max_concurrency)
+        if key not in _slot_semaphores:
+            _slot_semaphores[key] = threading.BoundedSemaphore(max(max_concurrency, 1))
+        return _slot_semaphores[key]
+
+
+LLMRegistry.register(FakeLlm)
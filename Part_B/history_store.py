@@ -0,0 +1,218 @@
+"""
+Bounded history store
+Keeps the latest entries in memory and spills older ones to an indexed log on disk
+"""
+
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+
+# One little-endian uint64 byte offset into the log per spilled entry
+_OFFSET = struct.Struct("<Q")
+_PAGE_SIZE = 100
+
+
+class HistoryStore:
+    """
+    List-like history with a fixed-size in-memory ring
+    
+    Appending past max_in_memory moves the oldest entry to a JSON lines log in
+    directory, with the byte offset of each entry in a separate index file so
+    any entry can be read with two seeks. Spilled entries are only read when
+    they are indexed, sliced or iterated. The latest entries are the live
+    objects, so they can still be updated in place (history[-1]['x'] = ...).
+    
+    Without a directory entries falling out of the ring are dropped. With
+    remove_on_close the log is deleted by close(), or when the store is
+    garbage collected or the interpreter exits.
+    """
+    
+    def __init__(self, max_in_memory: int = 200, directory: Optional[str] = None, remove_on_close: bool = False):
+        self.max_in_memory = max(max_in_memory, 1)
+        self.directory = directory
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._spilled = 0
+        self._finalizer = None
+        
+        # Reopening an existing log continues after its last entry
+        if directory and os.path.exists(self._index_path):
+            self._spilled = os.path.getsize(self._index_path) // _OFFSET.size
+        if directory and remove_on_close:
+            # Holds only the path, so it does not keep the store alive
+            self._finalizer = weakref.finalize(self, shutil.rmtree, directory, True)
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], name: str) -> "HistoryStore":
+        """
+        Build a store from the 'history' section of config.yaml
+        
+        Each store gets its own log directory, removed when the store is
+        closed or collected. The first store of a process also removes logs
+        left behind (e.g. by a crash) for more than max_age_hours.
+        
+        Args:
+            config: The 'history' section
+            name: What the history holds
+        """
+        config = config or {}
+        directory = None
+        if config.get('spill_to_disk', True):
+            root = config.get('directory', "./results/history")
+            prune_history_logs(root, config.get('max_age_hours', 24))
+            # Nothing is written until the first entry is spilled
+            run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            directory = os.path.join(root, f"{name}_{run_id}")
+        return cls(max_in_memory=config.get('max_in_memory', 200), directory=directory, remove_on_close=True)
+    
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.directory, "history.jsonl")
+    
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "history.idx")
+    
+    def append(self, entry: Any):
+        """Add an entry, spilling the oldest in-memory entry if the ring is full"""
+        with self._lock:
+            self._recent.append(entry)
+            if len(self._recent) > self.max_in_memory:
+                oldest = self._recent.popleft()
+                if self.directory:
+                    self._spill(oldest)
+    
+    def recent(self, count: int = None) -> List[Any]:
+        """The latest entries, oldest first, without touching the disk"""
+        with self._lock:
+            entries = list(self._recent)
+        if count is None:
+            return entries
+        return entries[-count:] if count > 0 else []
+    
+    @property
+    def spilled(self) -> int:
+        """Number of entries on disk"""
+        return self._spilled
+    
+    def clear(self):
+        """Remove every entry, including the on-disk log"""
+        with self._lock:
+            self._recent.clear()
+            self._spilled = 0
+            if self.directory and os.path.isdir(self.directory):
+                shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def close(self):
+        """Remove every entry; a log owned by the store (remove_on_close) is deleted for good"""
+        self.clear()
+        if self._finalizer is not None:
+            self._finalizer.detach()
+    
+    def to_list(self) -> List[Any]:
+        """Every entry, oldest first; reads the whole on-disk log"""
+        return list(self)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._spilled + len(self._recent)
+    
+    def __getitem__(self, index):
+        with self._lock:
+            spilled, recent = self._spilled, list(self._recent)
+        total = spilled + len(recent)
+        
+        if isinstance(index, slice):
+            start, stop, step = index.indices(total)
+            if step != 1:
+                return [self[position] for position in range(start, stop, step)]
+            entries = self._read_spilled(start, min(stop, spilled)) if start < spilled else []
+            return entries + recent[max(start - spilled, 0):max(stop - spilled, 0)]
+        
+        if index < 0:
+            index += total
+        if not 0 <= index < total:
+            raise IndexError("history index out of range")
+        if index >= spilled:
+            return recent[index - spilled]
+        return self._read_spilled(index, index + 1)[0]
+    
+    def __iter__(self) -> Iterator[Any]:
+        with self._lock:
+            spilled, recent = self._spilled, list(self._recent)
+        for start in range(0, spilled, _PAGE_SIZE):
+            yield from self._read_spilled(start, min(start + _PAGE_SIZE, spilled))
+        yield from recent
+    
+    def __reversed__(self) -> Iterator[Any]:
+        with self._lock:
+            spilled, recent = self._spilled, list(self._recent)
+        yield from reversed(recent)
+        for stop in range(spilled, 0, -_PAGE_SIZE):
+            yield from reversed(self._read_spilled(max(stop - _PAGE_SIZE, 0), stop))
+    
+    def __repr__(self) -> str:
+        return f"HistoryStore({len(self)} entries, {self._spilled} on disk)"
+    
+    def _spill(self, entry: Any):
+        """Append an entry to the log and its offset to the index (lock held)"""
+        os.makedirs(self.directory, exist_ok=True)
+        line = (json.dumps(entry, default=str) + "\n").encode('utf-8')
+        with open(self._log_path, 'ab') as log:
+            offset = log.tell()
+            log.write(line)
+        with open(self._index_path, 'ab') as index:
+            index.write(_OFFSET.pack(offset))
+        self._spilled += 1
+    
+    def _read_spilled(self, start: int, stop: int) -> List[Any]:
+        """Spilled entries start..stop-1; they are contiguous in the log"""
+        if start >= stop:
+            return []
+        with open(self._index_path, 'rb') as index:
+            index.seek(start * _OFFSET.size)
+            (offset,) = _OFFSET.unpack(index.read(_OFFSET.size))
+        with open(self._log_path, 'rb') as log:
+            log.seek(offset)
+            return [json.loads(log.readline()) for _ in range(stop - start)]
+
+
+_pruned_roots = set()
+_pruned_roots_lock = threading.Lock()
+
+
+def prune_history_logs(root: str, max_age_hours: Optional[float] = 24) -> int:
+    """
+    Remove history logs under root not written to for max_age_hours
+    
+    Runs once per root and process; returns how many logs were removed.
+    """
+    with _pruned_roots_lock:
+        if not max_age_hours or root in _pruned_roots:
+            return 0
+        _pruned_roots.add(root)
+    if not os.path.isdir(root):
+        return 0
+    
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            last_write = max([os.path.getmtime(path)] + [os.path.getmtime(os.path.join(path, file))
+                                                        for file in os.listdir(path)])
+        except OSError:
+            continue
+        if last_write < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
@@ -0,0 +1,359 @@
+"""
+Instrumentation for agent calls
+Records latency and token metrics for every call and fans them out to sinks
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from context_handoff import estimate_tokens
+
+
+class CallMetrics:
+    """Measurements for a single agent call"""
+    
+    def __init__(self, agent: str, model: str, prompt: str):
+        self.agent = agent
+        self.model = model
+        self.started = time.time()
+        self.wall_time = None
+        self.time_to_first_token = None
+        self.prompt_tokens = estimate_tokens(prompt)
+        self.completion_tokens = None
+        self.cached_prompt_tokens = None
+        self.prompt_cache_rate = None
+        self.tokens_per_second = None
+        self.decode_time = None
+        self.cache_hit = False
+        self.coalesced = False
+        self.tool_calls = 0
+        self.attempts = 0
+        self.hedged = False
+        self.error = None
+        self._start = time.perf_counter()
+        self._usage_reported = False
+        self._prompt_cache_reported = False
+        self._streamed = False
+        self._rate_source = None
+    
+    def first_token(self, partial: bool = False):
+        """Mark the arrival of output text; partial is True for a streamed chunk"""
+        self._streamed = self._streamed or partial
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self._start
+    
+    def report_usage(self, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        """Record token counts reported by the model backend"""
+        if prompt_tokens is not None:
+            self.prompt_tokens = prompt_tokens
+        if completion_tokens is not None:
+            self.completion_tokens = completion_tokens
+        self._usage_reported = True
+    
+    def report_decode_time(self, seconds: float):
+        """Record the generation time reported by the model backend (Ollama's eval_duration)"""
+        if seconds and seconds > 0:
+            self.decode_time = seconds
+    
+    def report_prompt_cache(self, cached_tokens: int, total_tokens: Optional[int] = None, reported: bool = False):
+        """
+        Record how many prompt tokens were served from the model server's prefix cache
+        
+        Counts reported by the backend replace local estimates, never the reverse.
+        """
+        if self._prompt_cache_reported and not reported:
+            return
+        self.cached_prompt_tokens = cached_tokens
+        total_tokens = total_tokens or self.prompt_tokens
+        if total_tokens:
+            self.prompt_cache_rate = min(cached_tokens / total_tokens, 1.0)
+        self._prompt_cache_reported = reported
+    
+    def finish(self, response: Any = None, error: BaseException = None):
+        """Stop the clock and derive the rates"""
+        self.wall_time = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        
+        # Without streaming the whole response arrives at once
+        if self.time_to_first_token is None and error is None:
+            self.time_to_first_token = self.wall_time
+        
+        if self.completion_tokens is None and response is not None:
+            self.completion_tokens = estimate_tokens(str(response))
+        
+        if not self.completion_tokens or self.cache_hit or self.coalesced:
+            return
+        # Time after the first token only measures generation when chunks were streamed;
+        # otherwise the first token is the whole response and that time is close to zero
+        generation_time = self.wall_time - (self.time_to_first_token or 0)
+        if self.decode_time:
+            self.tokens_per_second, self._rate_source = self.completion_tokens / self.decode_time, "reported"
+        elif self._streamed and generation_time > 0:
+            self.tokens_per_second, self._rate_source = self.completion_tokens / generation_time, "streamed"
+        elif self.wall_time > 0:
+            # Includes prompt processing and queueing, so it understates the decode rate
+            self.tokens_per_second, self._rate_source = self.completion_tokens / self.wall_time, "estimated"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "agent": self.agent,
+            "model": self.model,
+            "started": self.started,
+            "wall_time": self.wall_time,
+            "time_to_first_token": self.time_to_first_token,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "prompt_cache_rate": self.prompt_cache_rate,
+            "prompt_cache": ("reported" if self._prompt_cache_reported else "estimated")
+                            if self.cached_prompt_tokens is not None else None,
+            "tokens_per_second": self.tokens_per_second,
+            "tokens_per_second_source": self._rate_source,
+            "cache_hit": self.cache_hit,
+            "coalesced": self.coalesced,
+            "tool_calls": self.tool_calls,
+            "attempts": self.attempts,
+            "hedged": self.hedged,
+            "token_counts": "reported" if self._usage_reported else "estimated",
+            "error": self.error,
+        }
+
+
+class RingBufferSink:
+    """Keeps the most recent call metrics in memory"""
+    
+    def __init__(self, size: int = 1000):
+        self.records = deque(maxlen=size)
+        self._lock = threading.Lock()
+    
+    def write(self, metrics: CallMetrics):
+        with self._lock:
+            self.records.append(metrics.to_dict())
+    
+    def recent(self, count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recent records, oldest first"""
+        with self._lock:
+            records = list(self.records)
+        return records[-count:] if count else records
+    
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-agent call counts, latency percentiles, cache hit rates and throughput"""
+        per_agent = {}
+        for record in self.recent():
+            per_agent.setdefault(record['agent'], []).append(record)
+        
+        summary = {}
+        for agent, records in per_agent.items():
+            wall_times = sorted(r['wall_time'] for r in records if r['wall_time'] is not None)
+            rates = [r['tokens_per_second'] for r in records if r['tokens_per_second']]
+            prompt_cache_rates = [r['prompt_cache_rate'] for r in records if r.get('prompt_cache_rate') is not None]
+            summary[agent] = {
+                "calls": len(records),
+                "errors": sum(1 for r in records if r['error']),
+                "p50_seconds": percentile(wall_times, 50),
+                "p95_seconds": percentile(wall_times, 95),
+                "cache_hit_rate": sum(1 for r in records if r['cache_hit']) / len(records),
+                "tokens_per_second": sum(rates) / len(rates) if rates else None,
+                "prompt_cache_rate": (sum(prompt_cache_rates) / len(prompt_cache_rates)
+                                      if prompt_cache_rates else None),
+            }
+        return summary
+
+
+class JsonlSink:
+    """Appends one JSON line per call to a file"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    
+    def write(self, metrics: CallMetrics):
+        line = json.dumps(metrics.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + "\n")
+
+
+def _escape_label(value: Any) -> str:
+    """A label value escaped for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusSink:
+    """Aggregates metrics and renders them in the Prometheus text format"""
+    
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+        self._server = None
+    
+    def write(self, metrics: CallMetrics):
+        labels = (metrics.agent, metrics.model, "hit" if metrics.cache_hit else "miss")
+        with self._lock:
+            series = self._series.setdefault(labels, {
+                "calls": 0, "errors": 0, "seconds": 0.0, "ttft_seconds": 0.0, "ttft_count": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0, "tool_calls": 0,
+            })
+            series["calls"] += 1
+            series["errors"] += 1 if metrics.error else 0
+            series["seconds"] += metrics.wall_time or 0.0
+            if metrics.time_to_first_token is not None:
+                series["ttft_seconds"] += metrics.time_to_first_token
+                series["ttft_count"] += 1
+            series["prompt_tokens"] += metrics.prompt_tokens or 0
+            series["completion_tokens"] += metrics.completion_tokens or 0
+            series["cached_prompt_tokens"] += metrics.cached_prompt_tokens or 0
+            series["tool_calls"] += metrics.tool_calls
+    
+    def render(self) -> str:
+        """Current metrics in the Prometheus exposition format"""
+        # (family, type, help, [(sample suffix, field)]); summaries carry only _sum and _count
+        families = [
+            ("agent_calls_total", "counter", "Agent calls", [("", "calls")]),
+            ("agent_call_errors_total", "counter", "Failed agent calls", [("", "errors")]),
+            ("agent_call_seconds", "summary", "Agent call wall time",
+             [("_sum", "seconds"), ("_count", "calls")]),
+            ("agent_time_to_first_token_seconds", "summary", "Time to first token",
+             [("_sum", "ttft_seconds"), ("_count", "ttft_count")]),
+            ("agent_prompt_tokens_total", "counter", "Prompt tokens sent", [("", "prompt_tokens")]),
+            ("agent_completion_tokens_total", "counter", "Completion tokens received", [("", "completion_tokens")]),
+            ("agent_cached_prompt_tokens_total", "counter", "Prompt tokens served from the server's prefix cache",
+             [("", "cached_prompt_tokens")]),
+            ("agent_tool_calls_total", "counter", "Tool calls made by agents", [("", "tool_calls")]),
+        ]
+        with self._lock:
+            series = dict(self._series)
+        
+        lines = []
+        for name, kind, description, samples in families:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (agent, model, cache), values in sorted(series.items()):
+                labels = f'agent="{_escape_label(agent)}",model="{_escape_label(model)}",cache="{cache}"'
+                lines.extend(f"{name}{suffix}{{{labels}}} {values[field]}" for suffix, field in samples)
+        return "\n".join(lines) + "\n"
+    
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Expose render() at http://host:port/metrics from a background thread
+        
+        Only local scrapers can reach the default host; use "0.0.0.0" to
+        listen on every interface.
+        """
+        sink = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = sink.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        return self._server
+
+
+class Instrumentation:
+    """Hook-based instrumentation shared by all agent calls"""
+    
+    def __init__(self, sinks: List[Any] = None, enabled: bool = True):
+        self.sinks = list(sinks or [])
+        self.enabled = enabled
+        self.before_call_hooks = []
+        self.after_call_hooks = []
+        self.ring_buffer = next((sink for sink in self.sinks if isinstance(sink, RingBufferSink)), None)
+        self.prometheus = next((sink for sink in self.sinks if isinstance(sink, PrometheusSink)), None)
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Instrumentation":
+        """Build instrumentation from the 'instrumentation' section of config.yaml"""
+        config = config or {}
+        sinks = [RingBufferSink(config.get('ring_buffer_size', 1000))]
+        if config.get('jsonl_path'):
+            sinks.append(JsonlSink(config['jsonl_path']))
+        
+        prometheus = PrometheusSink()
+        sinks.append(prometheus)
+        if config.get('prometheus_port'):
+            try:
+                prometheus.serve(int(config['prometheus_port']), config.get('prometheus_host') or "127.0.0.1")
+            except OSError as e:
+                print(f"Warning: could not start metrics endpoint: {e}")
+        
+        return cls(sinks, enabled=config.get('enabled', True))
+    
+    def add_sink(self, sink: Any):
+        """Add a sink; anything with a write(metrics) method works"""
+        self.sinks.append(sink)
+    
+    def add_hook(self, before: Callable[[str, str], None] = None, after: Callable[[CallMetrics], None] = None):
+        """Register callables run before (agent, prompt) and after (metrics) every call"""
+        if before is not None:
+            self.before_call_hooks.append(before)
+        if after is not None:
+            self.after_call_hooks.append(after)
+    
+    def remove_hook(self, before: Callable[[str, str], None] = None, after: Callable[[CallMetrics], None] = None):
+        """Unregister hooks added with add_hook"""
+        if before in self.before_call_hooks:
+            self.before_call_hooks.remove(before)
+        if after in self.after_call_hooks:
+            self.after_call_hooks.remove(after)
+    
+    def start_call(self, agent: str, model: str, prompt: str) -> CallMetrics:
+        """Begin measuring an agent call"""
+        if self.enabled:
+            for hook in self.before_call_hooks:
+                hook(agent, prompt)
+        return CallMetrics(agent, model, prompt)
+    
+    def end_call(self, metrics: CallMetrics, response: Any = None, error: BaseException = None):
+        """Finish measuring a call and publish it to hooks and sinks"""
+        metrics.finish(response, error)
+        if not self.enabled:
+            return
+        for hook in self.after_call_hooks:
+            hook(metrics)
+        for sink in self.sinks:
+            try:
+                sink.write(metrics)
+            except Exception as e:
+                print(f"Warning: metrics sink {type(sink).__name__} failed: {e}")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+_shared_instrumentation = None
+_shared_instrumentation_lock = threading.Lock()
+
+
+def get_instrumentation(config: Dict[str, Any] = None) -> Instrumentation:
+    """Return the process-wide instrumentation, creating it on first use"""
+    global _shared_instrumentation
+    with _shared_instrumentation_lock:
+        if _shared_instrumentation is None:
+            _shared_instrumentation = Instrumentation.from_config(config)
+        return _shared_instrumentation
@@ -0,0 +1,241 @@
+"""
+Response cache for agent calls
+In-memory LRU tier backed by an on-disk tier with size-based eviction
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class ResponseCache:
+    """Two-tier (memory + disk) cache of agent responses"""
+    
+    def __init__(self, max_entries: int = 256, directory: Optional[str] = "./cache/responses",
+                 max_disk_bytes: int = 200 * 1024 * 1024, default_ttl: Optional[float] = None,
+                 agent_ttls: Dict[str, float] = None, enabled: bool = True):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.default_ttl = default_ttl
+        self.agent_ttls = agent_ttls or {}
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        
+        if self.enabled and self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ResponseCache":
+        """Build a cache from the 'cache' section of config.yaml"""
+        config = config or {}
+        return cls(
+            max_entries=config.get('memory_entries', 256),
+            directory=config.get('directory', "./cache/responses"),
+            max_disk_bytes=int(config.get('max_disk_mb', 200) * 1024 * 1024),
+            default_ttl=config.get('default_ttl_seconds'),
+            agent_ttls=config.get('agent_ttl_seconds'),
+            enabled=config.get('enabled', True),
+        )
+    
+    @staticmethod
+    def make_key(model: str, instruction: str, tools: List[str], temperature: Any, prompt: str) -> str:
+        """Build a cache key from everything that influences the response"""
+        payload = json.dumps(
+            [model, instruction, sorted(tools), temperature, prompt],
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str, agent_name: str = None) -> Optional[Any]:
+        """Return a cached response, or None on a miss or expired entry"""
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        
+        if entry is None:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._remember(key, entry)
+        
+        if entry is None or self._expired(entry, agent_name):
+            if entry is not None:
+                self.delete(key)
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        return entry['value']
+    
+    def set(self, key: str, value: Any, agent_name: str = None):
+        """Store a response in both tiers"""
+        if not self.enabled:
+            return
+        
+        entry = {"value": value, "created": time.time(), "agent": agent_name}
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+    
+    def delete(self, key: str):
+        """Remove an entry from both tiers"""
+        with self._lock:
+            self._memory.pop(key, None)
+        path = self._path(key)
+        if path and os.path.exists(path):
+            size = os.path.getsize(path)
+            os.remove(path)
+            with self._lock:
+                self._disk_bytes -= size
+    
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._memory.clear()
+        for path, _, _ in self._disk_entries():
+            os.remove(path)
+        self._disk_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+    
+    def _expired(self, entry: Dict[str, Any], agent_name: str = None) -> bool:
+        ttl = self.agent_ttls.get(agent_name or entry.get('agent'), self.default_ttl)
+        return ttl is not None and time.time() - entry['created'] > ttl
+    
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+    
+    def _path(self, key: str) -> Optional[str]:
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, f"{key}.json")
+    
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            # Touch the file so eviction treats it as recently used
+            os.utime(path, None)
+            return entry
+        except (OSError, ValueError):
+            return None
+    
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        if not path:
+            return
+        
+        data = json.dumps(entry, default=str)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        
+        with self._lock:
+            self._disk_bytes += len(data.encode('utf-8')) - previous
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk()
+    
+    def _disk_entries(self):
+        """(path, mtime, size) for every entry on disk"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+    
+    def _evict_disk(self):
+        """Delete least recently used files until the tier is back under 90% of its limit"""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_disk_bytes * 0.9
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+
+class PlanCache:
+    """Orchestrator plans keyed by normalized task text, persisted to a JSON file"""
+    
+    def __init__(self, path: Optional[str] = "./cache/plans.json", enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self._plans = {}
+        self._lock = threading.Lock()
+        
+        if self.enabled and self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self._plans = json.load(f)
+            except (OSError, ValueError):
+                self._plans = {}
+    
+    @staticmethod
+    def normalize(task: str) -> str:
+        """Lowercase the task and collapse whitespace"""
+        return " ".join(task.lower().split())
+    
+    def get(self, task: str) -> Optional[Dict[str, Any]]:
+        """Return the cached plan for a task, if any"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._plans.get(self.normalize(task))
+    
+    def set(self, task: str, plan: Dict[str, Any]):
+        """Remember a validated plan for a task"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._plans[self.normalize(task)] = plan
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._plans, f, indent=2)
+                os.replace(tmp_path, self.path)
@@ -0,0 +1,179 @@
+"""
+Shared model clients
+One LiteLlm instance per model configuration, shared by every agent and
+orchestrator in the process
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.lite_llm import LiteLlm
+from pydantic import PrivateAttr
+
+from fake_llm import FakeLlm, is_fake_model
+
+
+class ConnectionLimit:
+    """
+    At most limit requests in flight, shared by every thread and event loop
+    
+    asyncio.Semaphore belongs to one loop, while the sync pipeline runs each
+    call on its own loop; waiters here are woken on their own loop instead.
+    Slots are handed to waiters in arrival order.
+    """
+    
+    def __init__(self, limit: int):
+        self.limit = max(limit, 1)
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+    
+    async def acquire(self):
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was handed over just before the cancellation
+            if waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+    
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # The slot passes straight to the next waiter
+                loop, future = self._waiters.popleft()
+            else:
+                self.active -= 1
+                return
+        try:
+            loop.call_soon_threadsafe(self._grant, future)
+        except RuntimeError:
+            # The waiter's loop is closed
+            self.release()
+    
+    def _grant(self, future: asyncio.Future):
+        if future.done():
+            # Cancelled while the slot was on its way
+            self.release()
+        else:
+            future.set_result(None)
+    
+    def waiting(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+
+class _LimitedLiteLlm(LiteLlm):
+    """LiteLlm whose requests wait for a slot of their endpoint's ConnectionLimit"""
+    
+    _limit: Any = PrivateAttr(default=None)
+    
+    async def generate_content_async(self, llm_request: Any, stream: bool = False) -> AsyncGenerator[Any, None]:
+        await self._limit.acquire()
+        try:
+            async for response in super().generate_content_async(llm_request, stream):
+                yield response
+        finally:
+            self._limit.release()
+
+
+class ModelClientPool:
+    """
+    Process-wide pool of model clients
+    
+    HTTP connections are left to LiteLLM: its handlers (including the
+    ollama_chat one) reuse one keep-alive client per provider and event loop
+    from litellm.in_memory_llm_clients_cache and close the ones it evicts, so
+    concurrent loops never share or replace each other's connections. The
+    pool caps the requests in flight to each endpoint (api_base, or provider
+    without one) at max_connections across all agents, orchestrators and
+    loops, so no more connections than that are ever in use; further
+    requests wait for a free slot.
+    """
+    
+    def __init__(self, timeout: Optional[float] = 600.0, max_connections: Optional[int] = 8):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        
+        self._models = {}
+        self._limits = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ModelClientPool":
+        """Build a pool from the 'connection_pool' section of config.yaml"""
+        config = config or {}
+        return cls(timeout=config.get('timeout_seconds', 600.0), max_connections=config.get('max_connections', 8))
+    
+    def get_model(self, model_name: str, api_base: Optional[str] = None,
+                  fake_backend: Dict[str, Any] = None, **params) -> BaseLlm:
+        """
+        Get the shared model client for a model configuration
+        
+        Agents asking for the same model, endpoint and parameters share one
+        client instead of each holding its own. "fake/..." model names get
+        the simulated backend configured by fake_backend instead of LiteLLM.
+        """
+        key = (model_name, api_base, tuple(sorted((name, repr(value)) for name, value in params.items())))
+        if is_fake_model(model_name):
+            with self._lock:
+                if key not in self._models:
+                    self._models[key] = FakeLlm.from_config(model_name, fake_backend)
+                return self._models[key]
+        
+        with self._lock:
+            if key not in self._models:
+                if api_base:
+                    params['api_base'] = api_base
+                if self.timeout and 'timeout' not in params:
+                    params['timeout'] = self.timeout
+                if not self.max_connections:
+                    self._models[key] = LiteLlm(model=model_name, **params)
+                else:
+                    endpoint = api_base or model_name.split("/", 1)[0]
+                    if endpoint not in self._limits:
+                        self._limits[endpoint] = ConnectionLimit(self.max_connections)
+                    model = _LimitedLiteLlm(model=model_name, **params)
+                    model._limit = self._limits[endpoint]
+                    self._models[key] = model
+            return self._models[key]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Number of shared model clients, their request timeout and requests per endpoint"""
+        with self._lock:
+            endpoints = {endpoint: {"active": limit.active, "waiting": limit.waiting()}
+                         for endpoint, limit in self._limits.items()}
+        return {"models": len(self._models), "timeout": self.timeout, "max_connections": self.max_connections,
+                "endpoints": endpoints}
+    
+    def close(self):
+        """Drop the shared model clients"""
+        with self._lock:
+            self._models.clear()
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_client_pool(config: Dict[str, Any] = None) -> ModelClientPool:
+    """Return the process-wide client pool, creating it on first use"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ModelClientPool.from_config(config)
+        return _shared_pool
@@ -0,0 +1,157 @@
+"""
+Per-agent model routing
+Chooses the model and generation settings for each agent call from config.yaml
+"""
+
+from typing import Any, Dict, List, Optional
+
+from context_handoff import estimate_tokens
+
+
+# Kinds of agent calls routes can match on
+TASK_TYPES = ("planning", "pipeline", "chat")
+
+ROUTE_SETTINGS = ("model", "temperature", "max_tokens", "context_size", "keep_alive")
+
+
+class ModelRoute:
+    """Model and generation settings used for one agent call"""
+    
+    def __init__(self, model: str, temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                 context_size: Optional[int] = None, keep_alive: Optional[str] = None, name: str = "default"):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.context_size = context_size
+        self.keep_alive = keep_alive
+        self.name = name
+    
+    @property
+    def key(self) -> tuple:
+        """Identifies the agent variant built for these settings"""
+        return (self.model, self.temperature, self.max_tokens, self.context_size, self.keep_alive)
+    
+    def params(self) -> Dict[str, Any]:
+        """Completion parameters passed to the model client"""
+        params = {}
+        if self.temperature is not None:
+            params['temperature'] = self.temperature
+        if self.max_tokens is not None:
+            params['max_tokens'] = self.max_tokens
+        if self.model.startswith("ollama"):
+            # Ollama sizes its context window and keeps the model loaded per request
+            if self.context_size is not None:
+                params['num_ctx'] = self.context_size
+            if self.keep_alive is not None:
+                params['keep_alive'] = self.keep_alive
+        return params
+    
+    def with_settings(self, settings: Dict[str, Any], name: str = None) -> "ModelRoute":
+        """Copy of this route with some settings overridden"""
+        values = {setting: getattr(self, setting) for setting in ROUTE_SETTINGS}
+        values.update({setting: settings[setting] for setting in ROUTE_SETTINGS if settings.get(setting) is not None})
+        return ModelRoute(name=name or self.name, **values)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, **{setting: getattr(self, setting) for setting in ROUTE_SETTINGS}}
+
+
+class ModelRouter:
+    """
+    Resolves the route for each agent call
+    
+    Every agent starts from the 'model' section of config.yaml, overridden by
+    its own model, temperature, max_tokens, context_size and keep_alive under
+    agents.<name>. Its 'routes' are then checked in order and the first one
+    whose conditions all hold overrides the settings again:
+        
+        routes:
+          - tasks: ["chat"]            # planning, pipeline or chat
+            max_prompt_tokens: 1500    # estimated prompt size
+            model: "ollama_chat/qwen2.5:1.5b"
+    
+    With fixed_model set (an explicit model passed to the orchestrator, e.g. the
+    fake backend) routes still change generation settings but never the model.
+    """
+    
+    def __init__(self, default: ModelRoute, agents: Dict[str, Dict[str, Any]] = None, fixed_model: bool = False):
+        self.default = default
+        self.agents = agents or {}
+        self.fixed_model = fixed_model
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], model_name: str, fixed_model: bool = False) -> "ModelRouter":
+        """Build a router from config.yaml, with model_name as the default model"""
+        model_config = config.get('model') or {}
+        default = ModelRoute(
+            model=model_name,
+            temperature=model_config.get('temperature'),
+            max_tokens=model_config.get('max_tokens'),
+            context_size=model_config.get('context_size'),
+            keep_alive=model_config.get('keep_alive'),
+        )
+        return cls(default, config.get('agents'), fixed_model=fixed_model)
+    
+    def agent_route(self, agent_name: str) -> ModelRoute:
+        """Settings an agent uses when no route matches"""
+        return self._apply(self.default, self.agents.get(agent_name) or {}, self.default.name)
+    
+    def route(self, agent_name: str, prompt: str = "", task: str = None) -> ModelRoute:
+        """
+        Pick the settings for one call
+        
+        Args:
+            agent_name: Agent being called
+            prompt: Prompt about to be sent
+            task: Kind of call, one of TASK_TYPES
+        
+        Returns:
+            The first matching route, or the agent's own settings
+        """
+        base = self.agent_route(agent_name)
+        routes = (self.agents.get(agent_name) or {}).get('routes') or []
+        if not routes:
+            return base
+        
+        prompt_tokens = estimate_tokens(prompt)
+        for index, rule in enumerate(routes):
+            if self._matches(rule, prompt_tokens, task):
+                return self._apply(base, rule, rule.get('name') or f"{agent_name}.routes[{index}]")
+        return base
+    
+    def all_routes(self, agent_name: str) -> List[ModelRoute]:
+        """The agent's own settings followed by each of its routes"""
+        base = self.agent_route(agent_name)
+        rules = (self.agents.get(agent_name) or {}).get('routes') or []
+        return [base] + [
+            self._apply(base, rule, rule.get('name') or f"{agent_name}.routes[{index}]")
+            for index, rule in enumerate(rules)
+        ]
+    
+    def routes_for(self, agent_name: str) -> List[Dict[str, Any]]:
+        """Every route an agent can take, for display"""
+        rules = [{}] + list((self.agents.get(agent_name) or {}).get('routes') or [])
+        routes = []
+        for route, rule in zip(self.all_routes(agent_name), rules):
+            route = route.to_dict()
+            if rule:
+                route['when'] = {condition: rule[condition] for condition in
+                                 ('tasks', 'min_prompt_tokens', 'max_prompt_tokens') if condition in rule}
+            routes.append(route)
+        return routes
+    
+    def _apply(self, route: ModelRoute, settings: Dict[str, Any], name: str) -> ModelRoute:
+        if self.fixed_model:
+            settings = {setting: value for setting, value in settings.items() if setting != 'model'}
+        return route.with_settings(settings, name)
+    
+    @staticmethod
+    def _matches(rule: Dict[str, Any], prompt_tokens: int, task: Optional[str]) -> bool:
+        """Whether every condition of a route holds"""
+        if rule.get('tasks') and task not in rule['tasks']:
+            return False
+        if rule.get('max_prompt_tokens') is not None and prompt_tokens > rule['max_prompt_tokens']:
+            return False
+        if rule.get('min_prompt_tokens') is not None and prompt_tokens < rule['min_prompt_tokens']:
+            return False
+        return True
@@ -0,0 +1,268 @@
+"""
+Model warm-up and residency
+Preloads the models used by the configured agents at startup, reports when
+they are ready, and unloads models that have been idle for too long
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from fake_llm import is_fake_model
+from instrumentation import CallMetrics
+from model_router import ModelRoute
+
+
+class ModelResidencyManager:
+    """
+    Warms up and tracks the models referenced by an orchestrator's agents
+    
+    Every route of every enabled agent is warmed with a tiny prompt through
+    the agent's own runner, so the model server loads the model with the same
+    options (context size, keep_alive) later calls use. With
+    prime_agent_prompts each agent is warmed separately, which also puts its
+    system prompt into the server's prompt cache; otherwise each model
+    configuration is warmed once.
+    
+    Model states belong to the model server, so they are kept when the
+    manager is bound to a new orchestrator (see bind).
+    """
+    
+    def __init__(self, orchestrator: Any, prime_agent_prompts: bool = True, timeout: float = 180.0,
+                 idle_unload_seconds: Optional[float] = None, check_interval: float = 60.0):
+        self.orchestrator = orchestrator
+        self.prime_agent_prompts = prime_agent_prompts
+        self.timeout = timeout
+        self.idle_unload_seconds = idle_unload_seconds
+        self.check_interval = check_interval
+        self.models = {}
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+        self._warmed = None
+        self._monitor_thread = None
+        self._stop = threading.Event()
+        
+        orchestrator.instrumentation.add_hook(after=self._record_use)
+    
+    @classmethod
+    def from_config(cls, orchestrator: Any, config: Dict[str, Any]) -> "ModelResidencyManager":
+        """Build a manager from the 'warmup' section of config.yaml"""
+        config = config or {}
+        idle_minutes = config.get('idle_unload_minutes')
+        return cls(
+            orchestrator,
+            prime_agent_prompts=config.get('prime_agent_prompts', True),
+            timeout=config.get('timeout_seconds', 180.0),
+            idle_unload_seconds=idle_minutes * 60 if idle_minutes else None,
+        )
+    
+    def bind(self, orchestrator: Any):
+        """Warm up, track and unload for another orchestrator, e.g. after the app's Reset System"""
+        with self._lock:
+            previous, self.orchestrator = self.orchestrator, orchestrator
+        if previous is orchestrator:
+            return
+        if previous.instrumentation is not orchestrator.instrumentation:
+            previous.instrumentation.remove_hook(after=self._record_use)
+            orchestrator.instrumentation.add_hook(after=self._record_use)
+    
+    def targets(self, orchestrator: Any = None) -> List[Tuple[str, ModelRoute]]:
+        """(agent, route) pairs to warm up, without building any agent"""
+        orchestrator = orchestrator or self.orchestrator
+        seen = set()
+        targets = []
+        for agent_name in orchestrator.agents:
+            for route in orchestrator.router.all_routes(agent_name):
+                key = (agent_name, route.key) if self.prime_agent_prompts else route.key
+                if key not in seen:
+                    seen.add(key)
+                    targets.append((agent_name, route))
+        return targets
+    
+    def warm_up(self) -> Dict[str, Dict[str, Any]]:
+        """Load every model now and return their status"""
+        return asyncio.run(self.awarm_up())
+    
+    async def awarm_up(self) -> Dict[str, Dict[str, Any]]:
+        """Async version of warm_up"""
+        started = time.perf_counter()
+        orchestrator = self.orchestrator
+        # Code workers import their libraries while the models load
+        orchestrator.start_code_pool()
+        failed = set()
+        for agent_name, route in self.targets(orchestrator):
+            if route.model in failed:
+                continue
+            with self._lock:
+                status = self._status(route.model)
+                if status['state'] != "ready":
+                    status['state'] = "loading"
+            
+            try:
+                elapsed = await asyncio.wait_for(orchestrator.awarm_up_agent(agent_name, route), self.timeout)
+            except Exception as e:
+                error = "timed out" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+                with self._lock:
+                    status.update(state="failed", error=error)
+                failed.add(route.model)
+                print(f"✗ {route.model} failed to warm up: {error}")
+                continue
+            
+            with self._lock:
+                # The first call to a model includes loading it
+                first_load = status['load_seconds'] is None
+                if first_load:
+                    status['load_seconds'] = elapsed
+                status.update(state="ready", error=None, last_used=time.time())
+                if agent_name not in status['agents']:
+                    status['agents'].append(agent_name)
+            if first_load:
+                print(f"✓ {route.model} ready in {elapsed:.1f}s")
+        
+        models = self.status()
+        ready = sum(1 for status in models.values() if status['state'] == "ready")
+        print(f"Models ready: {ready}/{len(models)} ({time.perf_counter() - started:.1f}s)")
+        return models
+    
+    def start(self) -> threading.Thread:
+        """Warm up in a background thread (once per orchestrator) and start the idle monitor"""
+        with self._lock:
+            running = self._warmup_thread is not None and self._warmup_thread.is_alive()
+            if not running and self._warmed is not self.orchestrator:
+                self._warmed = self.orchestrator
+                self._warmup_thread = threading.Thread(target=self.warm_up, name="model-warmup", daemon=True)
+                self._warmup_thread.start()
+        self.start_idle_monitor()
+        return self._warmup_thread
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a background warm-up; True once it has finished"""
+        if self._warmup_thread is not None:
+            self._warmup_thread.join(timeout)
+        return self.is_ready()
+    
+    def is_ready(self) -> bool:
+        """True when no model is still cold or loading"""
+        models = self.status()
+        return bool(models) and all(status['state'] not in ("cold", "loading") for status in models.values())
+    
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model state (cold, loading, ready, failed, unloaded), load time and last use"""
+        with self._lock:
+            return {model: dict(status, agents=list(status['agents'])) for model, status in self.models.items()}
+    
+    def start_idle_monitor(self) -> Optional[threading.Thread]:
+        """Unload idle models periodically; does nothing without idle_unload_seconds"""
+        if not self.idle_unload_seconds:
+            return None
+        with self._lock:
+            if self._monitor_thread is None:
+                self._monitor_thread = threading.Thread(target=self._monitor, name="model-idle-monitor", daemon=True)
+                self._monitor_thread.start()
+        return self._monitor_thread
+    
+    def stop(self):
+        """Stop the idle monitor"""
+        self._stop.set()
+    
+    def unload_idle(self) -> List[str]:
+        """Unload models not used for idle_unload_seconds; returns the unloaded models"""
+        if not self.idle_unload_seconds:
+            return []
+        now = time.time()
+        idle = [model for model, status in self.status().items()
+                if status['state'] == "ready" and status['last_used']
+                and now - status['last_used'] >= self.idle_unload_seconds]
+        return [model for model in idle if self.unload(model)]
+    
+    def unload(self, model: str) -> bool:
+        """Ask the model server to release a model; True if it was unloaded"""
+        if not is_fake_model(model):
+            if not model.startswith("ollama"):
+                return False
+            api_base = (self.orchestrator.model_config.get('api_base') or "http://localhost:11434").rstrip('/')
+            try:
+                # keep_alive 0 makes Ollama unload the model right away
+                response = httpx.post(f"{api_base}/api/generate",
+                                      json={"model": model.split('/', 1)[1], "keep_alive": 0}, timeout=30)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"Warning: could not unload {model}: {e}")
+                return False
+        
+        with self._lock:
+            self._status(model)['state'] = "unloaded"
+        print(f"Unloaded idle model {model}")
+        return True
+    
+    def _monitor(self):
+        while not self._stop.wait(self.check_interval):
+            # Models being warmed up are about to be used
+            if self._warmup_thread is not None and self._warmup_thread.is_alive():
+                continue
+            self.unload_idle()
+    
+    def _status(self, model: str) -> Dict[str, Any]:
+        """The mutable status entry of a model (lock held)"""
+        if model not in self.models:
+            self.models[model] = {"state": "cold", "load_seconds": None, "last_used": None,
+                                  "agents": [], "error": None}
+        return self.models[model]
+    
+    def _record_use(self, metrics: CallMetrics):
+        """Instrumentation hook: note that a model served a call"""
+        if metrics.cache_hit or metrics.coalesced or metrics.error:
+            return
+        with self._lock:
+            status = self.models.get(metrics.model)
+            if status is None:
+                return
+            status['last_used'] = time.time()
+            # Calls load an unloaded model again
+            if status['state'] == "unloaded":
+                status['state'] = "ready"
+
+
+_shared_manager = None
+_shared_manager_lock = threading.Lock()
+
+
+def warm_up_models(orchestrator: Any = None) -> bool:
+    """
+    Load the configured models before the first request, for command-line entry points
+    
+    Models stay loaded on the model server for model.keep_alive, so later
+    orchestrators in this or another process find them ready. Failures are
+    reported and never raised.
+    
+    Returns:
+        True if every model is ready, or warm-up is disabled
+    """
+    try:
+        if orchestrator is None:
+            from agent_orchestrator import DataScienceAgentOrchestrator
+            orchestrator = DataScienceAgentOrchestrator()
+        warmup_config = orchestrator.config.get('warmup') or {}
+        if not warmup_config.get('enabled', True):
+            return True
+        print("\nWarming up models...")
+        manager = get_residency_manager(orchestrator, warmup_config)
+        models = manager.warm_up()
+        return bool(models) and all(status['state'] == "ready" for status in models.values())
+    except Exception as e:
+        print(f"Warning: model warm-up failed: {e}")
+        return False
+
+
+def get_residency_manager(orchestrator: Any, config: Dict[str, Any] = None) -> ModelResidencyManager:
+    """Return the process-wide manager, bound to the given orchestrator"""
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = ModelResidencyManager.from_config(orchestrator, config)
+        else:
+            _shared_manager.bind(orchestrator)
+        return _shared_manager
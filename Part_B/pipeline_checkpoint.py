@@ -0,0 +1,156 @@
+"""
+Pipeline checkpoints
+Saves each stage's output as it finishes so a failed pipeline can resume where it stopped
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+_PIPELINE_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class CheckpointStore:
+    """
+    Stage outputs on disk, keyed by pipeline id, stage and input hash
+    
+    Every pipeline gets a directory with a manifest (query, stage graph and
+    status) and one file per finished stage. A checkpoint is only used while
+    the stage's input is unchanged, so when an upstream stage produced a
+    different output the stage runs again.
+    """
+    
+    def __init__(self, directory: str = "./cache/checkpoints", enabled: bool = True,
+                 max_age_hours: Optional[float] = 72):
+        self.directory = directory
+        self.enabled = enabled and bool(directory)
+        self.max_age_hours = max_age_hours
+        
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self.prune()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CheckpointStore":
+        """Build a store from the 'checkpoints' section of config.yaml"""
+        config = config or {}
+        return cls(
+            directory=config.get('directory', "./cache/checkpoints"),
+            enabled=config.get('enabled', True),
+            max_age_hours=config.get('max_age_hours', 72),
+        )
+    
+    @staticmethod
+    def new_pipeline_id() -> str:
+        """A unique, sortable pipeline id"""
+        return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    
+    @staticmethod
+    def input_hash(stage_input: str) -> str:
+        """Hash of everything a stage is given"""
+        return hashlib.sha256(stage_input.encode('utf-8')).hexdigest()
+    
+    def start(self, pipeline_id: str, user_query: str, graph: Dict[str, List[str]], max_workers: int = 1,
+              dataset_path: str = None):
+        """Record what a pipeline runs, keeping the creation time of an earlier attempt"""
+        if not self.enabled:
+            return
+        manifest = self.manifest(pipeline_id) or {"pipeline_id": pipeline_id, "created": time.time()}
+        manifest.update(user_query=user_query, graph=graph, max_workers=max_workers, dataset_path=dataset_path,
+                        status="running", updated=time.time())
+        self._write(self._manifest_path(pipeline_id), manifest)
+    
+    def finish(self, pipeline_id: str, status: str):
+        """Mark a pipeline completed or failed"""
+        manifest = self.manifest(pipeline_id) if self.enabled else None
+        if manifest is None:
+            return
+        manifest.update(status=status, updated=time.time())
+        self._write(self._manifest_path(pipeline_id), manifest)
+    
+    def manifest(self, pipeline_id: str) -> Optional[Dict[str, Any]]:
+        """The recorded query, graph and status of a pipeline, or None"""
+        return self._read(self._manifest_path(pipeline_id)) if self.enabled else None
+    
+    def save(self, pipeline_id: str, stage: str, input_hash: str, output: Any):
+        """Checkpoint a finished stage"""
+        if not self.enabled:
+            return
+        self._write(self._stage_path(pipeline_id, stage),
+                    {"stage": stage, "input_hash": input_hash, "output": output, "created": time.time()})
+    
+    def load(self, pipeline_id: str, stage: str, input_hash: str) -> Tuple[bool, Any]:
+        """
+        Look up a stage's checkpoint
+        
+        Returns:
+            (found, output); found is False when the stage never finished or
+            its input has changed since
+        """
+        if not self.enabled:
+            return False, None
+        entry = self._read(self._stage_path(pipeline_id, stage))
+        if entry is None or entry.get('input_hash') != input_hash:
+            return False, None
+        return True, entry['output']
+    
+    def pipelines(self) -> List[Dict[str, Any]]:
+        """Manifests of every checkpointed pipeline, newest first"""
+        if not self.enabled:
+            return []
+        manifests = [self._read(self._manifest_path(name)) for name in os.listdir(self.directory)
+                     if _PIPELINE_ID.match(name)]
+        return sorted((manifest for manifest in manifests if manifest),
+                      key=lambda manifest: manifest.get('created', 0), reverse=True)
+    
+    def delete(self, pipeline_id: str):
+        """Remove a pipeline's checkpoints"""
+        if self.enabled:
+            shutil.rmtree(self._pipeline_dir(pipeline_id), ignore_errors=True)
+    
+    def prune(self) -> int:
+        """Remove pipelines not updated for max_age_hours; returns how many were removed"""
+        if not self.enabled or not self.max_age_hours:
+            return 0
+        cutoff = time.time() - self.max_age_hours * 3600
+        removed = 0
+        for manifest in self.pipelines():
+            if manifest.get('updated', manifest.get('created', 0)) < cutoff:
+                self.delete(manifest['pipeline_id'])
+                removed += 1
+        return removed
+    
+    def _pipeline_dir(self, pipeline_id: str) -> str:
+        if not _PIPELINE_ID.match(pipeline_id or ""):
+            raise ValueError(f"Invalid pipeline id '{pipeline_id}'")
+        return os.path.join(self.directory, pipeline_id)
+    
+    def _manifest_path(self, pipeline_id: str) -> str:
+        return os.path.join(self._pipeline_dir(pipeline_id), "manifest.json")
+    
+    def _stage_path(self, pipeline_id: str, stage: str) -> str:
+        return os.path.join(self._pipeline_dir(pipeline_id), f"{stage}.json")
+    
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _write(self, path: str, data: Dict[str, Any]):
+        """Write atomically, so a crash never leaves a half-written checkpoint"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
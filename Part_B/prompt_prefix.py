@@ -0,0 +1,76 @@
+"""
+Prompt prefix tracking
+Estimates how much of each prompt a model server can serve from its prefix (KV) cache
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Tuple
+
+from context_handoff import estimate_tokens
+
+
+STABLE_PREFIX = "stable_prefix"
+LEGACY = "legacy"
+PROMPT_MODES = (STABLE_PREFIX, LEGACY)
+
+
+def common_prefix_length(first: str, second: str) -> int:
+    """Length of the common prefix of two strings"""
+    # Binary search on slice comparisons keeps the work in C for long prompts
+    low, high = 0, min(len(first), len(second))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[:middle] == second[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class PromptPrefixTracker:
+    """
+    Remembers the last prompts sent to each model
+    
+    Servers like Ollama keep the KV cache of the previous prompt in each of
+    their slots and only evaluate what comes after the longest matching
+    prefix. Comparing a new prompt with the last few prompts sent to the same
+    model estimates how much of it can be reused.
+    """
+    
+    def __init__(self, slots: int = 4):
+        self.slots = max(slots, 1)
+        self._recent = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, model: str, text: str) -> Tuple[int, int]:
+        """
+        Record a prompt about to be sent
+        
+        Returns:
+            (reusable_tokens, total_tokens), both estimated
+        """
+        with self._lock:
+            recent = self._recent.setdefault(model, deque(maxlen=self.slots))
+            previous = list(recent)
+            recent.append(text)
+        
+        shared = max((common_prefix_length(text, earlier) for earlier in previous), default=0)
+        return estimate_tokens(text[:shared]), estimate_tokens(text)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {model: len(recent) for model, recent in self._recent.items()}
+
+
+_shared_tracker = None
+_shared_tracker_lock = threading.Lock()
+
+
+def get_prefix_tracker(slots: int = 4) -> PromptPrefixTracker:
+    """Return the process-wide tracker; the model server's cache is shared by every orchestrator"""
+    global _shared_tracker
+    with _shared_tracker_lock:
+        if _shared_tracker is None:
+            _shared_tracker = PromptPrefixTracker(slots)
+        return _shared_tracker
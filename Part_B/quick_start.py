@@ -3,8 +3,9 @@ Quick Start Guide for Data Science Agent System
 Run this script to get started immediately
 """
 
-from agent_orchestrator import DataScienceAgentOrchestrator
+from agent_orchestrator import DataScienceAgentOrchestrator, PipelineStageError
 from workflow_manager import WorkflowManager
+from model_warmup import warm_up_models
 
 
 def print_menu():
@@ -23,6 +24,35 @@ def print_menu():
     print("\n" + "-"*70)
 
 
+def run_streaming_pipeline(orchestrator, task, agent_sequence=None):
+    """Run a pipeline, printing agent output as it is generated"""
+    results = {}
+    current_agent = None
+    
+    for event in orchestrator.stream_data_science_pipeline(task, agent_sequence=agent_sequence):
+        if event['type'] == 'token':
+            if event['agent'] != current_agent:
+                current_agent = event['agent']
+                print(f"\n[{current_agent}] ", end="")
+            print(event['text'], end="", flush=True)
+        elif event['type'] == 'attempt_restarted':
+            # The retry prints the output again from the start
+            print(f"\n[{event['agent']}] (retrying) ", end="")
+            current_agent = event['agent']
+        elif event['type'] == 'stage_finished':
+            source = f" (reused from {event['restored']})" if event.get('restored') else ""
+            print(f"\n✓ {event['agent']} finished in {event['elapsed']:.1f}s{source}")
+            current_agent = None
+        elif event['type'] == 'stage_failed':
+            print(f"\n✗ {event['agent']} failed: {event['error']}")
+            current_agent = None
+        elif event['type'] == 'pipeline_finished':
+            results = event['results']
+            print(f"\nPipeline finished in {event['elapsed']:.1f}s")
+    
+    return results
+
+
 def test_system():
     """Test that the system is working"""
     print("\n>>> Testing system...")
@@ -70,7 +100,8 @@ def quick_eda():
     print("\nThis may take a few moments as agents process the data...\n")
     
     try:
-        results = orchestrator.run_data_science_pipeline(
+        results = run_streaming_pipeline(
+            orchestrator,
             task,
             agent_sequence=['data_analyst', 'visualization_specialist']
         )
@@ -101,12 +132,18 @@ def ml_modeling():
     print("\nThis may take a few moments...\n")
     
     try:
-        results = orchestrator.run_data_science_pipeline(
+        results = run_streaming_pipeline(
+            orchestrator,
             task,
             agent_sequence=['data_analyst', 'ml_engineer', 'visualization_specialist']
         )
         print("\n✓ ML modeling completed successfully!")
         return results
+    except PipelineStageError as e:
+        print(f"\n✗ ML modeling failed: {e}")
+        print(f"Finished stages are checkpointed; resume with "
+              f"DataScienceAgentOrchestrator().resume_pipeline('{e.pipeline_id}')")
+        return None
     except Exception as e:
         print(f"\n✗ ML modeling failed: {e}")
         return None
@@ -176,7 +213,8 @@ def custom_task():
         orchestrator = DataScienceAgentOrchestrator()
         
         print("\nProcessing your task...\n")
-        results = orchestrator.run_data_science_pipeline(
+        results = run_streaming_pipeline(
+            orchestrator,
             user_task,
             agent_sequence=agent_sequence
         )
@@ -222,6 +260,10 @@ def main():
     print("\nWelcome to Data Science Agentic System!")
     print("This system provides AI-powered data science agents.")
     
+    # Load the models now so the first menu option does not wait for them
+    if not warm_up_models():
+        print("Some models are not ready yet; they will load on first use.")
+    
     while True:
         print_menu()
         
@@ -39,7 +39,16 @@ def main():
     if not check_dependencies():
         sys.exit(1)
     
-    print("✅ Dependencies OK\n")
+    print("✅ Dependencies OK")
+    
+    # Models stay loaded on the Ollama server, so the UI starts with them ready
+    try:
+        from model_warmup import warm_up_models
+        if not warm_up_models():
+            print("⚠️  Not every model is ready; the UI will load them on first use")
+    except ImportError as e:
+        print(f"⚠️  Skipping model warm-up: {e}")
+    print()
     print("Starting Streamlit...")
     print("="*60)
     print("\n📱 UI will open in your browser automatically")
@@ -0,0 +1,122 @@
+"""
+Single-flight request coalescing
+Concurrent identical calls share one in-flight call and all receive its result
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """The call being waited on was cancelled by its own caller; a waiter should retry"""
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call among concurrent callers with the same key
+    
+    The first caller (the leader) runs the call; callers arriving while it is
+    running wait for the leader's result, or get the leader's exception. Once
+    the call finishes the key is forgotten, so later calls run again. Works
+    across threads and event loops, so sync and async callers can share a call.
+    """
+    
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run func, or wait for an identical call already running
+        
+        Returns:
+            (result, shared) where shared is True if another caller's call was used
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                return self._lead(key, future, func), False
+            try:
+                return future.result(), True
+            except _LeaderCancelled:
+                continue
+    
+    async def ado(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async version of do; factory returns the coroutine to run when leading"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                try:
+                    result = await factory()
+                except asyncio.CancelledError:
+                    self._finish(key, future, error=_LeaderCancelled())
+                    raise
+                except BaseException as e:
+                    self._finish(key, future, error=e)
+                    raise
+                self._finish(key, future, result=result)
+                return result, False
+            try:
+                # Shielded so a waiter being cancelled never cancels the shared call
+                return await asyncio.shield(asyncio.wrap_future(future)), True
+            except _LeaderCancelled:
+                continue
+    
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        with self._lock:
+            return len(self._calls)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+    
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """The shared future for key and whether this caller has to run the call"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            # A running future cannot be cancelled by waiters
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+    
+    def _lead(self, key: str, future: Future, func: Callable[[], Any]) -> Any:
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+    
+    def _finish(self, key: str, future: Future, result: Any = None, error: BaseException = None):
+        """Forget the call, then hand its outcome to the waiters"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+_shared_single_flight = None
+_shared_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight group, shared by every orchestrator"""
+    global _shared_single_flight
+    with _shared_single_flight_lock:
+        if _shared_single_flight is None:
+            _shared_single_flight = SingleFlight()
+        return _shared_single_flight
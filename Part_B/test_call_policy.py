@@ -0,0 +1,169 @@
+"""
+Tests for the call policy and its circuit breaker
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from call_policy import CallPolicy, CircuitBreaker, CircuitOpenError, DeadlineExceeded, is_transient
+
+
+def _policy(**settings) -> CallPolicy:
+    settings = {"max_retries": 0, "backoff_initial": 0.0, "failure_threshold": 1, "reset_timeout": 0.0,
+                **settings}
+    return CallPolicy(**settings)
+
+
+def _fail(error: BaseException):
+    def func():
+        raise error
+    return func
+
+
+def test_breaker_opens_after_threshold_and_recovers_through_a_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    
+    assert breaker.state == "open"
+    assert breaker.rejected == 0
+
+
+def test_cancelled_trial_does_not_leave_the_breaker_half_open():
+    policy = _policy()
+    
+    async def slow():
+        await asyncio.sleep(10)
+    
+    async def fast():
+        return "ok"
+    
+    async def scenario():
+        with pytest.raises(ConnectionError):
+            await policy.acall(lambda: _raise_async(ConnectionError("down")))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(policy.acall(slow), 0.1)
+        return await policy.acall(fast)
+    
+    assert asyncio.run(scenario()) == "ok"
+    assert policy.breaker().state == "closed"
+
+
+def test_interrupted_sync_trial_is_released():
+    policy = _policy()
+    with pytest.raises(ConnectionError):
+        policy.call(_fail(ConnectionError("down")))
+    with pytest.raises(KeyboardInterrupt):
+        policy.call(_fail(KeyboardInterrupt()))
+    
+    assert policy.call(lambda: "ok") == "ok"
+
+
+def test_only_transient_errors_are_retried_and_counted():
+    policy = _policy(max_retries=2, failure_threshold=5)
+    calls = []
+    
+    def bad_request():
+        calls.append(1)
+        raise ValueError("bad prompt")
+    
+    with pytest.raises(ValueError):
+        policy.call(bad_request)
+    assert len(calls) == 1
+    assert policy.breaker().failures == 0
+    
+    flaky = iter([ConnectionError("reset"), TimeoutError("slow")])
+    
+    def recovers():
+        error = next(flaky, None)
+        if error is not None:
+            raise error
+        return "ok"
+    
+    assert policy.call(recovers) == "ok"
+    assert policy.stats()["retries"] == 2
+
+
+def test_is_transient_classifies_status_codes():
+    request = httpx.Request("POST", "http://localhost:11434/api/chat")
+    
+    def status_error(code):
+        return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+    
+    assert is_transient(status_error(503))
+    assert is_transient(status_error(429))
+    assert not is_transient(status_error(400))
+    assert not is_transient(status_error(401))
+    assert is_transient(httpx.ConnectError("refused", request=request))
+    assert is_transient(DeadlineExceeded("slow"))
+    assert not is_transient(CircuitOpenError("open"))
+    assert not is_transient(KeyError("x"))
+
+
+def test_each_backend_has_its_own_breaker():
+    policy = _policy(reset_timeout=60.0)
+    with pytest.raises(ConnectionError):
+        policy.call(_fail(ConnectionError("down")), backend="ollama_chat/qwen")
+    
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda: "ok", backend="ollama_chat/qwen")
+    assert policy.call(lambda: "ok", backend="ollama_chat/llama3") == "ok"
+    assert policy.stats()["circuit"] == {"ollama_chat/qwen": "open", "ollama_chat/llama3": "closed"}
+
+
+def test_sync_timeout_waits_for_the_running_attempt_instead_of_retrying():
+    policy = _policy(attempt_timeout=0.05, max_retries=2, failure_threshold=5)
+    calls = []
+    
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "late"
+    
+    assert policy.call(slow) == "late"
+    assert len(calls) == 1
+    assert policy.stats()["late_results"] == 1
+
+
+def test_hung_sync_attempt_without_deadline_fails_within_the_retry_budget():
+    policy = _policy(attempt_timeout=0.05, max_retries=2, failure_threshold=5)
+    release = threading.Event()
+    
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        policy.call(lambda: release.wait(5))
+    elapsed = time.monotonic() - started
+    release.set()
+    
+    assert policy.deadline is None
+    assert elapsed < 0.5
+
+
+async def _raise_async(error: BaseException):
+    raise error
@@ -0,0 +1,126 @@
+"""
+Tests for CSV sniffing and validation
+"""
+
+import codecs
+
+import pytest
+
+from csv_inspector import inspect_csv, loading_strategy
+
+
+def write(tmp_path, data: bytes, name: str = "data.csv") -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("delimiter", [",", ";", "\t", "|"])
+def test_detects_delimiter(tmp_path, delimiter):
+    rows = ["name,age,score", "ann,31,4.5", "bob,42,3.0", "cy,27,5.0"]
+    path = write(tmp_path, "\n".join(row.replace(",", delimiter) for row in rows).encode())
+    
+    report = inspect_csv(path)
+    
+    assert report['valid']
+    assert report['delimiter'] == delimiter
+    assert [column['name'] for column in report['columns']] == ["name", "age", "score"]
+
+
+def test_detects_header_and_column_types(tmp_path):
+    path = write(tmp_path, b"id,price,when,flag\n1,2.5,2024-01-02,true\n2,,2024-02-03,false\n3,4.0,2024-03-04,yes\n")
+    
+    report = inspect_csv(path)
+    
+    assert report['has_header'] is True
+    types = {column['name']: column['type'] for column in report['columns']}
+    assert types == {"id": "integer", "price": "float", "when": "datetime", "flag": "boolean"}
+    assert report['columns'][1]['missing_in_sample'] == 1
+    assert report['strategy']['read_csv_kwargs'] == {"parse_dates": ["when"]}
+
+
+def test_detects_missing_header(tmp_path):
+    path = write(tmp_path, b"1,2.5,3\n4,5.5,6\n7,8.5,9\n10,11.5,12\n")
+    
+    report = inspect_csv(path)
+    
+    assert report['has_header'] is False
+    assert report['columns'][0]['name'] == "column_0"
+    assert report['strategy']['read_csv_kwargs']['header'] is None
+
+
+@pytest.mark.parametrize("bom, encoding", [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+])
+def test_detects_bom(tmp_path, bom, encoding):
+    text = "city;temp\nOslo;-3\nRome;14\nLisbon;17\n"
+    data = bom + (text.encode("utf-16-le") if encoding == "utf-16" else text.encode("utf-8"))
+    path = write(tmp_path, data)
+    
+    report = inspect_csv(path)
+    
+    assert report['valid']
+    assert report['encoding'] == encoding
+    assert report['delimiter'] == ";"
+    assert report['columns'][0]['name'] == "city"
+    assert report['strategy']['read_csv_kwargs']['encoding'] == encoding
+
+
+def test_detects_legacy_encoding(tmp_path):
+    path = write(tmp_path, "name,age\nRené,31\nJosé,42\nAnaïs,27\n".encode("cp1252"))
+    
+    report = inspect_csv(path)
+    
+    assert report['encoding'] == "cp1252"
+    assert report['columns'][0]['name'] == "name"
+
+
+def test_missing_and_empty_files_are_invalid(tmp_path):
+    missing = inspect_csv(str(tmp_path / "missing.csv"))
+    empty = inspect_csv(write(tmp_path, b""))
+    
+    assert not missing['valid'] and missing['errors'] == ["File does not exist"]
+    assert not empty['valid'] and empty['errors'] == ["File is empty"]
+
+
+def test_no_complete_line_in_first_chunk_is_invalid(tmp_path):
+    path = write(tmp_path, b"a" * 200 + b",b\n1,2\n")
+    
+    report = inspect_csv(path, chunk_bytes=64)
+    
+    assert not report['valid']
+    assert "No complete line" in report['errors'][0]
+
+
+def test_full_scan_counts_rows_and_ragged_lines(tmp_path):
+    lines = ["a,b,c"] + [f"{i},{i},{i}" for i in range(500)] + ["1,2"]
+    path = write(tmp_path, ("\n".join(lines) + "\n").encode())
+    
+    report = inspect_csv(path, chunk_bytes=256, full_scan=True)
+    
+    assert report['exact_rows'] == 501
+    assert report['inconsistent_rows'] == 1
+    assert report['strategy']['read_csv_kwargs']['on_bad_lines'] == "warn"
+
+
+def test_sampling_estimates_rows(tmp_path):
+    lines = ["a,b"] + [f"{i:06d},{i:06d}" for i in range(20000)]
+    path = write(tmp_path, ("\n".join(lines) + "\n").encode())
+    
+    report = inspect_csv(path, chunk_bytes=4096, samples=4)
+    
+    assert report['exact_rows'] is None
+    assert 19000 <= report['estimated_rows'] <= 21000
+
+
+def test_strategy_reads_in_chunks_over_budget(tmp_path):
+    lines = ["a,b"] + [f"{i},{i}" for i in range(1000)]
+    path = write(tmp_path, ("\n".join(lines) + "\n").encode())
+    report = inspect_csv(path)
+    
+    strategy = loading_strategy(report, memory_budget_mb=0.001)
+    
+    assert strategy['mode'] == "chunked"
+    assert strategy['chunksize'] >= 1000
+    assert "chunksize=" in strategy['code']
@@ -0,0 +1,44 @@
+"""
+Tests for dataset profiles
+"""
+
+import os
+
+import pytest
+
+from dataset_fingerprint import DatasetFingerprinter
+from dataset_profile import DatasetProfiler
+
+
+class _RecordingFingerprinter(DatasetFingerprinter):
+    def __init__(self):
+        super().__init__(index_path=None)
+        self.paths = []
+    
+    def fingerprint(self, dataset_path, sampled=None):
+        self.paths.append(dataset_path)
+        return super().fingerprint(dataset_path, sampled)
+
+
+def test_profile_uses_the_given_fingerprinter(tmp_path):
+    path = str(tmp_path / "data.csv")
+    with open(path, 'w') as f:
+        f.write("a,b\n1,2\n3,4\n5,6\n")
+    fingerprinter = _RecordingFingerprinter()
+    
+    profile = DatasetProfiler(fingerprinter=fingerprinter).profile(path)
+    
+    assert profile is not None and profile['rows'] == 3
+    assert fingerprinter.paths == [path]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_unreadable_dataset_gets_no_profile(tmp_path):
+    directory = tmp_path / "dataset"
+    directory.mkdir()
+    (directory / "part.csv").write_text("a,b\n1,2\n")
+    os.symlink(tmp_path / "gone.csv", directory / "broken.csv")
+    
+    profiler = DatasetProfiler(fingerprinter=DatasetFingerprinter(index_path=None))
+    
+    assert profiler.profile(str(directory)) is None
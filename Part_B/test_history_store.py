@@ -0,0 +1,117 @@
+"""
+Tests for the spill-to-disk history store
+"""
+
+import gc
+import os
+import time
+
+import history_store
+from history_store import HistoryStore, prune_history_logs
+
+
+def test_ring_spills_oldest_entries(tmp_path):
+    store = HistoryStore(max_in_memory=3, directory=str(tmp_path / "log"))
+    for i in range(10):
+        store.append({"i": i})
+    
+    assert len(store) == 10
+    assert store.spilled == 7
+    assert store.recent() == [{"i": 7}, {"i": 8}, {"i": 9}]
+    assert store[0] == {"i": 0}
+    assert store[-1] == {"i": 9}
+    assert store[5:8] == [{"i": 5}, {"i": 6}, {"i": 7}]
+    assert store[::4] == [{"i": 0}, {"i": 4}, {"i": 8}]
+    assert [entry["i"] for entry in store] == list(range(10))
+    assert [entry["i"] for entry in reversed(store)] == list(range(9, -1, -1))
+
+
+def test_without_directory_old_entries_are_dropped():
+    store = HistoryStore(max_in_memory=2)
+    for i in range(5):
+        store.append(i)
+    
+    assert len(store) == 2
+    assert store.to_list() == [3, 4]
+
+
+def test_latest_entries_are_live_objects(tmp_path):
+    store = HistoryStore(max_in_memory=2, directory=str(tmp_path / "log"))
+    store.append({"status": "running"})
+    store[-1]["status"] = "completed"
+    
+    assert store[0] == {"status": "completed"}
+
+
+def test_reopening_a_log_continues_after_it(tmp_path):
+    directory = str(tmp_path / "log")
+    first = HistoryStore(max_in_memory=1, directory=directory)
+    for i in range(4):
+        first.append(i)
+    
+    second = HistoryStore(max_in_memory=1, directory=directory)
+    second.append(4)
+    second.append(5)
+    
+    # Entry 3 was still in the first store's ring
+    assert second.to_list() == [0, 1, 2, 4, 5]
+
+
+def test_close_removes_owned_log(tmp_path):
+    directory = str(tmp_path / "log")
+    store = HistoryStore(max_in_memory=1, directory=directory, remove_on_close=True)
+    store.append(1)
+    store.append(2)
+    assert os.path.isdir(directory)
+    
+    store.close()
+    
+    assert not os.path.exists(directory)
+    assert len(store) == 0
+
+
+def test_collected_store_removes_owned_log(tmp_path):
+    directory = str(tmp_path / "log")
+    store = HistoryStore(max_in_memory=1, directory=directory, remove_on_close=True)
+    store.append(1)
+    store.append(2)
+    
+    del store
+    gc.collect()
+    
+    assert not os.path.exists(directory)
+
+
+def test_from_config_prunes_stale_logs(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "_pruned_roots", set())
+    root = tmp_path / "history"
+    stale, fresh = root / "stale", root / "fresh"
+    for directory in (stale, fresh):
+        directory.mkdir(parents=True)
+        (directory / "history.jsonl").write_text("{}\n")
+    old = time.time() - 48 * 3600
+    for path in (stale / "history.jsonl", stale):
+        os.utime(path, (old, old))
+    
+    store = HistoryStore.from_config({"directory": str(root), "max_in_memory": 1}, "runs")
+    
+    assert not stale.exists()
+    assert fresh.exists()
+    store.append(1)
+    store.append(2)
+    assert os.path.dirname(store.directory) == str(root)
+    store.close()
+
+
+def test_prune_runs_once_per_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "_pruned_roots", set())
+    stale = tmp_path / "stale"
+    stale.mkdir()
+    old = time.time() - 48 * 3600
+    os.utime(stale, (old, old))
+    
+    assert prune_history_logs(str(tmp_path), max_age_hours=24) == 1
+    stale.mkdir()
+    os.utime(stale, (old, old))
+    assert prune_history_logs(str(tmp_path), max_age_hours=24) == 0
+    assert stale.exists()
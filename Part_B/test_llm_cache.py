@@ -0,0 +1,87 @@
+"""
+Tests for the two-tier response cache
+"""
+
+import os
+
+import llm_cache
+from llm_cache import ResponseCache
+
+
+class _Clock:
+    """Stand-in for time.time that only moves when told to"""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, directory=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResponseCache(directory=str(tmp_path)).set("key", {"answer": 42})
+    
+    cache = ResponseCache(directory=str(tmp_path))
+    assert cache.get("key") == {"answer": 42}
+    assert cache.stats()["hits"] == 1
+
+
+def test_disk_tier_evicts_oldest_files_over_the_limit(tmp_path):
+    cache = ResponseCache(max_entries=1, directory=str(tmp_path), max_disk_bytes=1000)
+    for i in range(10):
+        cache.set(f"k{i}", "x" * 200)
+        path = os.path.join(str(tmp_path), f"k{i}.json")
+        os.utime(path, (i, i))
+    
+    files = sorted(os.listdir(str(tmp_path)))
+    assert len(files) < 10
+    assert "k9.json" in files
+    assert "k0.json" not in files
+    assert cache.stats()["disk_bytes"] <= 1000
+
+
+def test_default_ttl_expires_entries_in_both_tiers(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    cache = ResponseCache(directory=str(tmp_path), default_ttl=60)
+    cache.set("key", "value")
+    
+    clock.now += 30
+    assert cache.get("key") == "value"
+    clock.now += 31
+    assert cache.get("key") is None
+    assert os.listdir(str(tmp_path)) == []
+    assert cache.stats()["misses"] == 1
+
+
+def test_agent_ttl_overrides_the_default(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    cache = ResponseCache(directory=None, default_ttl=None, agent_ttls={"web_researcher": 10})
+    cache.set("research", "news", agent_name="web_researcher")
+    cache.set("analysis", "stats", agent_name="data_analyst")
+    
+    clock.now += 11
+    assert cache.get("research", agent_name="web_researcher") is None
+    assert cache.get("analysis", agent_name="data_analyst") == "stats"
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), enabled=False)
+    cache.set("key", "value")
+    
+    assert cache.get("key") is None
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,63 @@
+"""
+Tests for the per-endpoint connection limit of the model client pool
+"""
+
+import asyncio
+import threading
+
+from model_clients import ConnectionLimit, ModelClientPool
+
+
+def test_limit_holds_across_event_loops():
+    limit = ConnectionLimit(2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    
+    async def request():
+        await limit.acquire()
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        limit.release()
+    
+    async def burst():
+        await asyncio.gather(*(request() for _ in range(5)))
+    
+    threads = [threading.Thread(target=lambda: asyncio.run(burst())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert peak[0] == 2
+    assert limit.active == 0 and limit.waiting() == 0
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    limit = ConnectionLimit(1)
+    
+    async def scenario():
+        await limit.acquire()
+        waiter = asyncio.ensure_future(limit.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limit.release()
+    
+    asyncio.run(scenario())
+    
+    assert limit.active == 0 and limit.waiting() == 0
+
+
+def test_models_of_one_endpoint_share_a_limit():
+    pool = ModelClientPool(max_connections=3)
+    first = pool.get_model("ollama_chat/qwen", api_base="http://localhost:11434")
+    second = pool.get_model("ollama_chat/llama", api_base="http://localhost:11434")
+    other = pool.get_model("ollama_chat/qwen", api_base="http://gpu-box:11434")
+    
+    assert first._limit is second._limit
+    assert first._limit is not other._limit
+    assert first._limit.limit == 3
@@ -0,0 +1,92 @@
+"""
+Tests for pipeline checkpoints
+"""
+
+import json
+import os
+import time
+
+import pytest
+
+from pipeline_checkpoint import CheckpointStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(directory=str(tmp_path / "checkpoints"))
+
+
+def test_save_and_load_round_trip(store):
+    pipeline_id = store.new_pipeline_id()
+    input_hash = store.input_hash("query + upstream output")
+    store.save(pipeline_id, "data_analyst", input_hash, {"text": "summary"})
+    
+    assert store.load(pipeline_id, "data_analyst", input_hash) == (True, {"text": "summary"})
+
+
+def test_changed_input_invalidates_checkpoint(store):
+    pipeline_id = store.new_pipeline_id()
+    store.save(pipeline_id, "ml_engineer", store.input_hash("upstream v1"), "model A")
+    
+    assert store.load(pipeline_id, "ml_engineer", store.input_hash("upstream v2")) == (False, None)
+    assert store.load(pipeline_id, "ml_engineer", store.input_hash("upstream v1")) == (True, "model A")
+
+
+def test_missing_stage_is_not_found(store):
+    pipeline_id = store.new_pipeline_id()
+    
+    assert store.load(pipeline_id, "data_analyst", store.input_hash("q")) == (False, None)
+
+
+def test_corrupt_checkpoint_is_not_found(store):
+    pipeline_id = store.new_pipeline_id()
+    input_hash = store.input_hash("q")
+    store.save(pipeline_id, "data_analyst", input_hash, "ok")
+    with open(os.path.join(store.directory, pipeline_id, "data_analyst.json"), 'w') as f:
+        f.write('{"stage": "data_an')
+    
+    assert store.load(pipeline_id, "data_analyst", input_hash) == (False, None)
+
+
+def test_start_keeps_created_time_across_attempts(store):
+    pipeline_id = store.new_pipeline_id()
+    store.start(pipeline_id, "q", {"data_analyst": []})
+    created = store.manifest(pipeline_id)['created']
+    store.finish(pipeline_id, "failed")
+    
+    store.start(pipeline_id, "q", {"data_analyst": []}, max_workers=2)
+    
+    manifest = store.manifest(pipeline_id)
+    assert manifest['created'] == created
+    assert manifest['status'] == "running"
+    assert manifest['max_workers'] == 2
+
+
+def test_prune_removes_stale_pipelines(tmp_path):
+    directory = str(tmp_path / "checkpoints")
+    store = CheckpointStore(directory=directory, max_age_hours=1)
+    stale, fresh = store.new_pipeline_id(), store.new_pipeline_id()
+    store.start(stale, "old", {})
+    store.start(fresh, "new", {})
+    path = os.path.join(directory, stale, "manifest.json")
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest['updated'] = time.time() - 2 * 3600
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+    
+    assert store.prune() == 1
+    assert [manifest['pipeline_id'] for manifest in store.pipelines()] == [fresh]
+
+
+def test_invalid_pipeline_id_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.load("../outside", "data_analyst", "hash")
+
+
+def test_disabled_store_keeps_nothing(tmp_path):
+    store = CheckpointStore(directory=str(tmp_path / "checkpoints"), enabled=False)
+    store.save("p1", "data_analyst", "hash", "output")
+    
+    assert store.load("p1", "data_analyst", "hash") == (False, None)
+    assert not os.path.exists(tmp_path / "checkpoints")
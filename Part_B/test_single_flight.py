@@ -0,0 +1,125 @@
+"""
+Tests for single-flight request coalescing
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    group = SingleFlight()
+    calls = []
+    started = threading.Event()
+    
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "answer"
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(group.do("key", slow)))
+    leader.start()
+    started.wait()
+    waiters = [threading.Thread(target=lambda: results.append(group.do("key", slow))) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    for thread in [leader] + waiters:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+    assert group.stats() == {"leaders": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_waiters_receive_the_leaders_error():
+    group = SingleFlight()
+    
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ConnectionError("backend down")
+    
+    async def scenario():
+        return await asyncio.gather(group.ado("key", failing), group.ado("key", failing), return_exceptions=True)
+    
+    errors = asyncio.run(scenario())
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    assert group.stats()["leaders"] == 1
+
+
+def test_finished_calls_run_again():
+    group = SingleFlight()
+    counter = iter(range(10))
+    
+    assert group.do("key", lambda: next(counter)) == (0, False)
+    assert group.do("key", lambda: next(counter)) == (1, False)
+    assert group.in_flight() == 0
+
+
+def test_cancelled_leader_hands_the_call_to_a_waiter():
+    group = SingleFlight()
+    runs = []
+    
+    async def call():
+        runs.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+    
+    async def scenario():
+        leader = asyncio.ensure_future(group.ado("key", call))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(group.ado("key", call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+    
+    assert asyncio.run(scenario()) == ("answer", False)
+    assert len(runs) == 2
+    assert group.in_flight() == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    group = SingleFlight()
+    
+    async def call():
+        await asyncio.sleep(0.1)
+        return "answer"
+    
+    async def scenario():
+        leader = asyncio.ensure_future(group.ado("key", call))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(group.ado("key", call))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+    
+    assert asyncio.run(scenario()) == ("answer", False)
+
+
+def test_sync_and_async_callers_share_a_call():
+    group = SingleFlight()
+    started = threading.Event()
+    
+    def slow():
+        started.set()
+        time.sleep(0.2)
+        return "answer"
+    
+    thread = threading.Thread(target=group.do, args=("key", slow))
+    thread.start()
+    started.wait()
+    
+    async def never_run():
+        raise AssertionError("the async caller should have joined the running call")
+    
+    assert asyncio.run(group.ado("key", never_run)) == ("answer", True)
+    thread.join()
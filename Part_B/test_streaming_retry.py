@@ -0,0 +1,65 @@
+"""
+Tests for streamed stage output when a model call is retried
+"""
+
+import asyncio
+
+import yaml
+
+from agent_orchestrator import DataScienceAgentOrchestrator
+from model_clients import ModelClientPool
+from utils import load_config
+
+
+def _orchestrator(tmp_path, monkeypatch, **fake_backend) -> DataScienceAgentOrchestrator:
+    monkeypatch.chdir(tmp_path)
+    config = load_config()
+    config['fake_backend'] = {"time_to_first_token": 0, "tokens_per_second": 0, **fake_backend}
+    config['call_policy'].update(max_retries=2, backoff_initial_seconds=0, backoff_jitter=0)
+    config['code_execution'] = {"enabled": False}
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return DataScienceAgentOrchestrator(model_name="fake/retry", config_path=str(path),
+                                        client_pool=ModelClientPool())
+
+
+def _stream(orchestrator, query):
+    async def collect():
+        return [event async for event in orchestrator.astream_data_science_pipeline(
+            query, agent_sequence=["data_analyst"], bypass_cache=True)]
+    return asyncio.run(collect())
+
+
+def _shown_text(events, agent):
+    """What a consumer following the events displays for an agent"""
+    text = ""
+    for event in events:
+        if event.get('agent') != agent:
+            continue
+        if event['type'] == "token":
+            text += event['text']
+        elif event['type'] == "attempt_restarted":
+            text = ""
+    return text
+
+
+def test_retry_after_partial_output_restarts_the_stream(tmp_path, monkeypatch):
+    orchestrator = _orchestrator(tmp_path, monkeypatch, failures=1, fail_after_tokens=5)
+    
+    events = _stream(orchestrator, "Summarize the iris dataset")
+    
+    types = [event['type'] for event in events if event.get('agent') == "data_analyst"]
+    restart = types.index("attempt_restarted")
+    assert types.count("attempt_restarted") == 1
+    assert types[:restart].count("token") == 5
+    output = events[-1]['results']['data_analyst']
+    assert _shown_text(events, "data_analyst") == output
+
+
+def test_no_restart_event_without_a_retry(tmp_path, monkeypatch):
+    orchestrator = _orchestrator(tmp_path, monkeypatch)
+    
+    events = _stream(orchestrator, "Summarize the wine dataset")
+    
+    assert all(event['type'] != "attempt_restarted" for event in events)
+    assert _shown_text(events, "data_analyst") == events[-1]['results']['data_analyst']
@@ -8,6 +8,28 @@ from typing import Dict, Any, List
 from datetime import datetime
 
 
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+
+
+def load_config(path: str = None) -> Dict[str, Any]:
+    """
+    Load the system configuration from config.yaml
+    
+    Returns an empty dict when the file is missing or PyYAML is not installed,
+    so callers can always fall back to their built-in defaults.
+    """
+    path = path or DEFAULT_CONFIG_PATH
+    if not os.path.exists(path):
+        return {}
+    try:
+        import yaml
+    except ImportError:
+        print("Warning: PyYAML not installed, using default configuration")
+        return {}
+    with open(path, 'r') as f:
+        return yaml.safe_load(f) or {}
+
+
 class AgentUtils:
     """Utility class for agent operations"""
     
@@ -79,27 +101,41 @@ Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
     @staticmethod
     def validate_csv_file(filepath: str) -> bool:
         """Validate that a CSV file exists and is readable"""
-        if not os.path.exists(filepath):
-            return False
-        try:
-            import pandas as pd
-            pd.read_csv(filepath, nrows=5)
-            return True
-        except:
-            return False
+        return AgentUtils.inspect_csv_file(filepath)["valid"]
+    
+    @staticmethod
+    def inspect_csv_file(filepath: str, full_scan: bool = False) -> Dict[str, Any]:
+        """
+        Detect a CSV file's encoding, delimiter, header and column types, and how to load it
+        
+        Reads bounded chunks (the whole file in chunks with full_scan); see
+        csv_inspector.inspect_csv for the report's fields.
+        """
+        from csv_inspector import inspect_csv
+        config = load_config().get('csv_inspection') or {}
+        return inspect_csv(
+            filepath,
+            chunk_bytes=int(config.get('chunk_kb', 1024) * 1024),
+            samples=config.get('samples', 4),
+            memory_budget_mb=config.get('memory_budget_mb', 1024),
+            full_scan=full_scan,
+        )
     
     @staticmethod
     def get_file_info(filepath: str) -> Dict[str, Any]:
-        """Get information about a file"""
+        """Get information about a file, including a fingerprint of its content"""
         info = {
             "exists": os.path.exists(filepath),
             "size": 0,
             "extension": "",
+            "fingerprint": None,
         }
         
         if info["exists"]:
+            from dataset_fingerprint import dataset_fingerprint
             info["size"] = os.path.getsize(filepath)
             info["extension"] = os.path.splitext(filepath)[1]
+            info["fingerprint"] = dataset_fingerprint(filepath)
         
         return info
 
@@ -108,30 +144,57 @@ class DatasetLoader:
     """Helper class to load common datasets"""
     
     @staticmethod
-    def load_sklearn_dataset(name: str):
-        """Load a sklearn dataset by name"""
+    def load_sklearn_dataset(name: str, cache: Any = None):
+        """
+        Load a sklearn dataset by name
+        
+        The data and target arrays are memory-mapped read-only from the
+        process-wide dataset cache (dataset_cache.py), so every process using
+        a dataset shares one copy and only the first call runs the loader.
+        """
         try:
             from sklearn import datasets
+            from sklearn.utils import Bunch
+            from dataset_cache import get_dataset_cache
             
             dataset_map = {
                 "iris": datasets.load_iris,
                 "wine": datasets.load_wine,
                 "breast_cancer": datasets.load_breast_cancer,
-                "boston": datasets.load_boston if hasattr(datasets, 'load_boston') else None,
+                # Removed from sklearn 1.2; resolved on use so it does not break the other loaders
+                "boston": lambda: datasets.load_boston(),
                 "digits": datasets.load_digits,
                 "diabetes": datasets.load_diabetes,
                 "california_housing": lambda: datasets.fetch_california_housing(return_X_y=False),
             }
             
             loader = dataset_map.get(name.lower())
-            if loader:
-                return loader()
-            else:
+            if not loader:
                 return None
+            
+            def build():
+                dataset = loader()
+                meta = {key: dataset[key] if key == "DESCR" else [str(value) for value in dataset[key]]
+                        for key in ("feature_names", "target_names", "DESCR") if key in dataset}
+                return {"data": dataset.data, "target": dataset.target}, meta
+            
+            arrays, meta = (cache or get_dataset_cache()).arrays(f"sklearn-{name.lower()}", build)
+            return Bunch(**arrays, **meta)
         except Exception as e:
             print(f"Error loading dataset: {e}")
             return None
     
+    @staticmethod
+    def load_sklearn_frame(name: str, cache: Any = None):
+        """Load a sklearn dataset as a DataFrame of its features and 'target', sharing the cached arrays"""
+        dataset = DatasetLoader.load_sklearn_dataset(name, cache)
+        if dataset is None:
+            return None
+        import pandas as pd
+        columns = {feature: dataset.data[:, i] for i, feature in enumerate(dataset.feature_names)}
+        columns["target"] = dataset.target
+        return pd.DataFrame(columns, copy=False)
+    
     @staticmethod
     def get_sample_code(dataset_name: str) -> str:
         """Get sample code to load a dataset"""
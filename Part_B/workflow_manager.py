@@ -3,19 +3,26 @@ Workflow Manager for Data Science Pipelines
 Provides predefined workflows and custom pipeline creation
 """
 
-from agent_orchestrator import DataScienceAgentOrchestrator
-from typing import List, Dict, Any, Optional
+from agent_orchestrator import DataScienceAgentOrchestrator, PipelineStageError
+from history_store import HistoryStore
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+import asyncio
 import os
 import json
+import time
 from datetime import datetime
 
 
+BatchJob = Union[Tuple[str, List[str]], Dict[str, Any]]
+
+
 class WorkflowManager:
     """Manages different data science workflows"""
     
     def __init__(self, orchestrator: DataScienceAgentOrchestrator):
         self.orchestrator = orchestrator
-        self.workflow_history = []
+        # Every workflow run, with its results or error
+        self.workflow_history = HistoryStore.from_config(orchestrator.config.get('history'), "workflows")
         self.results_dir = "./results"
         
         # Ensure results directory exists
@@ -25,6 +32,17 @@ class WorkflowManager:
         """
         Complete exploratory data analysis workflow
         """
+        query, agent_sequence = self._eda_request(dataset_path)
+        return self._run_workflow("exploratory_data_analysis", query, agent_sequence, dataset_path)
+    
+    async def aexploratory_data_analysis(self, dataset_path: str) -> Dict[str, Any]:
+        """Async version of exploratory_data_analysis"""
+        query, agent_sequence = self._eda_request(dataset_path)
+        return await self._arun_workflow("exploratory_data_analysis", query, agent_sequence, dataset_path)
+    
+    @staticmethod
+    def _eda_request(dataset_path: str):
+        """Query and agent sequence for the EDA workflow"""
         query = f"""
         Perform comprehensive exploratory data analysis on: {dataset_path}
         
@@ -38,10 +56,7 @@ class WorkflowManager:
         7. Feature engineering suggestions
         """
         
-        return self.orchestrator.run_data_science_pipeline(
-            query,
-            agent_sequence=['data_analyst', 'visualization_specialist']
-        )
+        return query, ['data_analyst', 'visualization_specialist']
     
     def ml_modeling_pipeline(self, dataset_path: str, task_type: str = "classification") -> Dict[str, Any]:
         """
@@ -50,6 +65,17 @@ class WorkflowManager:
             dataset_path: Path to dataset
             task_type: 'classification' or 'regression'
         """
+        query, agent_sequence = self._ml_modeling_request(dataset_path, task_type)
+        return self._run_workflow("ml_modeling_pipeline", query, agent_sequence, dataset_path)
+    
+    async def aml_modeling_pipeline(self, dataset_path: str, task_type: str = "classification") -> Dict[str, Any]:
+        """Async version of ml_modeling_pipeline"""
+        query, agent_sequence = self._ml_modeling_request(dataset_path, task_type)
+        return await self._arun_workflow("ml_modeling_pipeline", query, agent_sequence, dataset_path)
+    
+    @staticmethod
+    def _ml_modeling_request(dataset_path: str, task_type: str):
+        """Query and agent sequence for the ML modeling workflow"""
         query = f"""
         Build a machine learning model for {task_type} using: {dataset_path}
         
@@ -63,15 +89,23 @@ class WorkflowManager:
         7. Generate performance visualizations
         """
         
-        return self.orchestrator.run_data_science_pipeline(
-            query,
-            agent_sequence=['data_analyst', 'ml_engineer', 'visualization_specialist']
-        )
+        return query, ['data_analyst', 'ml_engineer', 'visualization_specialist']
     
     def time_series_analysis(self, dataset_path: str) -> Dict[str, Any]:
         """
         Time series analysis workflow
         """
+        query, agent_sequence = self._time_series_request(dataset_path)
+        return self._run_workflow("time_series_analysis", query, agent_sequence, dataset_path)
+    
+    async def atime_series_analysis(self, dataset_path: str) -> Dict[str, Any]:
+        """Async version of time_series_analysis"""
+        query, agent_sequence = self._time_series_request(dataset_path)
+        return await self._arun_workflow("time_series_analysis", query, agent_sequence, dataset_path)
+    
+    @staticmethod
+    def _time_series_request(dataset_path: str):
+        """Query and agent sequence for the time series workflow"""
         query = f"""
         Perform time series analysis on: {dataset_path}
         
@@ -83,15 +117,26 @@ class WorkflowManager:
         5. Performance evaluation
         """
         
-        return self.orchestrator.run_data_science_pipeline(
-            query,
-            agent_sequence=['data_engineer', 'visualization_specialist', 'ml_engineer']
-        )
+        return query, ['data_engineer', 'visualization_specialist', 'ml_engineer']
     
     def deploy_model(self, model_path: str, model_type: str = "sklearn") -> Dict[str, Any]:
         """
         Deploy a trained model
+        
+        The model is not a dataset, so no stage outputs are reused; its
+        fingerprint is recorded in workflow_history as model_fingerprint.
         """
+        query, agent_sequence = self._deployment_request(model_path, model_type)
+        return self._run_workflow("deploy_model", query, agent_sequence, model_path=model_path)
+    
+    async def adeploy_model(self, model_path: str, model_type: str = "sklearn") -> Dict[str, Any]:
+        """Async version of deploy_model"""
+        query, agent_sequence = self._deployment_request(model_path, model_type)
+        return await self._arun_workflow("deploy_model", query, agent_sequence, model_path=model_path)
+    
+    @staticmethod
+    def _deployment_request(model_path: str, model_type: str):
+        """Query and agent sequence for the deployment workflow"""
         query = f"""
         Deploy a {model_type} model from: {model_path}
         
@@ -103,16 +148,204 @@ class WorkflowManager:
         5. Generate deployment instructions
         """
         
-        return self.orchestrator.run_data_science_pipeline(
-            query,
-            agent_sequence=['deployment_engineer']
-        )
+        return query, ['deployment_engineer']
     
-    def custom_pipeline(self, query: str, agent_sequence: List[str]) -> Dict[str, Any]:
+    def custom_pipeline(self, query: str, agent_sequence: List[str], dataset_path: str = None,
+                        pipeline_id: str = None) -> Dict[str, Any]:
         """
         Run a custom pipeline with specified agent sequence
+        
+        With dataset_path, stage outputs from earlier runs are reused while the
+        dataset is unchanged. pipeline_id names the run's checkpoints for
+        resume_pipeline; a new id is generated by default.
+        """
+        return self._run_workflow("custom_pipeline", query, agent_sequence, dataset_path, pipeline_id)
+    
+    async def acustom_pipeline(self, query: str, agent_sequence: List[str], dataset_path: str = None,
+                               pipeline_id: str = None) -> Dict[str, Any]:
+        """Async version of custom_pipeline"""
+        return await self._arun_workflow("custom_pipeline", query, agent_sequence, dataset_path, pipeline_id)
+    
+    def dataset_fingerprint(self, dataset_path: str) -> Optional[str]:
+        """
+        Content fingerprint of a dataset file, directory or sklearn dataset name
+        
+        Pipelines key their stage memo on it; use it to key anything else
+        derived from the dataset.
+        """
+        return self.orchestrator.fingerprinter.fingerprint(dataset_path)
+    
+    def resume_pipeline(self, pipeline_id: str) -> Dict[str, Any]:
+        """
+        Resume a failed workflow, rerunning only the stages that did not finish
         """
-        return self.orchestrator.run_data_science_pipeline(query, agent_sequence)
+        return self.orchestrator.resume_pipeline(pipeline_id)
+    
+    async def aresume_pipeline(self, pipeline_id: str) -> Dict[str, Any]:
+        """Async version of resume_pipeline"""
+        return await self.orchestrator.aresume_pipeline(pipeline_id)
+    
+    def run_batch(self, jobs: Sequence[BatchJob], max_concurrency: int = None, timeout: float = None,
+                  output_name: str = "batch") -> Dict[str, Any]:
+        """
+        Run many pipelines with bounded concurrency
+        
+        This starts its own event loop, so it cannot be called while one is
+        running (Jupyter, or async code); await arun_batch there instead.
+        
+        Args:
+            jobs: (query, agent_sequence) tuples or dicts with 'query',
+                  'agent_sequence' and optionally 'dataset_path' keys
+            max_concurrency: Pipelines running at once. Defaults to
+                             settings.batch_max_concurrency in config.yaml
+            timeout: Seconds allowed per job. Defaults to
+                     settings.batch_job_timeout_seconds
+            output_name: Prefix of the aggregated results file
+        
+        Returns:
+            Summary with per-job status, results or error, pipeline_id (pass it
+            to resume_pipeline to finish a failed or timed-out job), the
+            dataset's fingerprint for jobs with a dataset_path, and the results
+            file path
+        
+        Raises:
+            RuntimeError: Called from a running event loop
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arun_batch(jobs, max_concurrency, timeout, output_name))
+        raise RuntimeError("run_batch() cannot be called from a running event loop; use 'await arun_batch(...)'")
+    
+    async def arun_batch(self, jobs: Sequence[BatchJob], max_concurrency: int = None, timeout: float = None,
+                         output_name: str = "batch") -> Dict[str, Any]:
+        """Async version of run_batch"""
+        settings = self.orchestrator.settings
+        max_concurrency = max_concurrency or settings.get('batch_max_concurrency', 4)
+        timeout = timeout if timeout is not None else settings.get('batch_job_timeout_seconds')
+        semaphore = asyncio.Semaphore(max_concurrency)
+        started = time.time()
+        
+        async def run_job(index, job):
+            query, agent_sequence, dataset_path = self._unpack_job(job)
+            # Known up front so a timed-out job's finished stages can still be resumed
+            pipeline_id = self.orchestrator.checkpoints.new_pipeline_id()
+            report = {"index": index, "query": query, "agent_sequence": agent_sequence, "pipeline_id": pipeline_id}
+            async with semaphore:
+                if dataset_path:
+                    report["dataset_path"] = dataset_path
+                    report["dataset_fingerprint"] = await asyncio.to_thread(self.dataset_fingerprint, dataset_path)
+                job_started = time.time()
+                try:
+                    report["results"] = await asyncio.wait_for(
+                        self.acustom_pipeline(query, agent_sequence, dataset_path, pipeline_id),
+                        timeout
+                    )
+                    report["status"] = "ok"
+                except asyncio.TimeoutError:
+                    report["status"] = "timeout"
+                    report["error"] = f"Timed out after {timeout}s"
+                except PipelineStageError as e:
+                    report["status"] = "error"
+                    report["error"] = str(e)
+                    report["results"] = e.results
+                except Exception as e:
+                    report["status"] = "error"
+                    report["error"] = f"{type(e).__name__}: {e}"
+                report["elapsed"] = time.time() - job_started
+            return report
+        
+        reports = await asyncio.gather(*(run_job(index, job) for index, job in enumerate(jobs)))
+        
+        summary = {
+            "total": len(reports),
+            "succeeded": sum(1 for report in reports if report["status"] == "ok"),
+            "failed": sum(1 for report in reports if report["status"] == "error"),
+            "timed_out": sum(1 for report in reports if report["status"] == "timeout"),
+            "max_concurrency": max_concurrency,
+            "elapsed": time.time() - started,
+            "jobs": list(reports),
+        }
+        summary["results_file"] = self.save_results(summary, output_name)
+        return summary
+    
+    @staticmethod
+    def _unpack_job(job: BatchJob):
+        """Query, agent sequence and dataset path of a batch job"""
+        if isinstance(job, dict):
+            return job['query'], job.get('agent_sequence'), job.get('dataset_path')
+        query, agent_sequence = job
+        return query, agent_sequence, None
+    
+    def _run_workflow(self, workflow: str, query: str, agent_sequence: List[str], dataset_path: str = None,
+                      pipeline_id: str = None, model_path: str = None) -> Dict[str, Any]:
+        """Run a workflow's pipeline and record it in workflow_history"""
+        entry = self._start_entry(workflow, query, agent_sequence, dataset_path, pipeline_id)
+        if model_path:
+            entry.update(model_path=model_path, model_fingerprint=self._artifact_fingerprint(model_path))
+        try:
+            results = self.orchestrator.run_data_science_pipeline(query, agent_sequence=agent_sequence,
+                                                                  pipeline_id=entry['pipeline_id'],
+                                                                  dataset_path=dataset_path)
+        except BaseException as e:
+            self._finish_entry(entry, error=e)
+            raise
+        self._finish_entry(entry, results)
+        return results
+    
+    async def _arun_workflow(self, workflow: str, query: str, agent_sequence: List[str], dataset_path: str = None,
+                             pipeline_id: str = None, model_path: str = None) -> Dict[str, Any]:
+        """Async version of _run_workflow"""
+        entry = self._start_entry(workflow, query, agent_sequence, dataset_path, pipeline_id)
+        if model_path:
+            entry.update(model_path=model_path,
+                         model_fingerprint=await asyncio.to_thread(self._artifact_fingerprint, model_path))
+        try:
+            results = await self.orchestrator.arun_data_science_pipeline(query, agent_sequence=agent_sequence,
+                                                                         pipeline_id=entry['pipeline_id'],
+                                                                         dataset_path=dataset_path)
+        except BaseException as e:
+            self._finish_entry(entry, error=e)
+            raise
+        self._finish_entry(entry, results)
+        return results
+    
+    def _start_entry(self, workflow: str, query: str, agent_sequence: List[str], dataset_path: str,
+                     pipeline_id: str) -> Dict[str, Any]:
+        return {
+            "workflow": workflow,
+            "timestamp": datetime.now().isoformat(),
+            "pipeline_id": pipeline_id or self.orchestrator.checkpoints.new_pipeline_id(),
+            "query": query,
+            "agent_sequence": agent_sequence,
+            "dataset_path": dataset_path,
+            "_started": time.time(),
+        }
+    
+    def _artifact_fingerprint(self, path: str) -> Optional[str]:
+        """Fingerprint of a model or other artifact for workflow_history; None if it cannot be read"""
+        try:
+            return self.dataset_fingerprint(path)
+        except OSError as e:
+            print(f"Warning: could not fingerprint {path}: {e}")
+            return None
+    
+    def _finish_entry(self, entry: Dict[str, Any], results: Dict[str, Any] = None, error: BaseException = None):
+        """Complete a workflow_history entry and append it"""
+        entry["elapsed"] = time.time() - entry.pop("_started")
+        if error is None:
+            entry.update(status="completed", results=results)
+        else:
+            entry.update(status="failed", error=f"{type(error).__name__}: {error}")
+        self.workflow_history.append(entry)
+    
+    def eda_jobs(self, dataset_paths: Sequence[str]) -> List[Dict[str, Any]]:
+        """Batch jobs running the EDA workflow over each dataset"""
+        jobs = []
+        for dataset_path in dataset_paths:
+            query, agent_sequence = self._eda_request(dataset_path)
+            jobs.append({"query": query, "agent_sequence": agent_sequence, "dataset_path": dataset_path})
+        return jobs
     
     def save_results(self, results: Dict[str, Any], workflow_name: str):
         """Save workflow results to disk"""